@@ -0,0 +1,30 @@
+"""Add gate event sequence
+
+Revision ID: 0b7d3e9a5c14
+Revises: f81b4d2c6a95
+Create Date: 2026-10-18 17:12:44.508137
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b7d3e9a5c14'
+down_revision: Union[str, Sequence[str], None] = 'f81b4d2c6a95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add the sequence numbering events for EVENT_BACKEND=postgres."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE SEQUENCE IF NOT EXISTS gate_event_seq')
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove the gate event sequence."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP SEQUENCE IF EXISTS gate_event_seq')
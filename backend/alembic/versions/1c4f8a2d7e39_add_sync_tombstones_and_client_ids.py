@@ -0,0 +1,57 @@
+"""Add sync tombstones and client ids
+
+Revision ID: 1c4f8a2d7e39
+Revises: 0b7d3e9a5c14
+Create Date: 2026-10-18 17:48:21.093614
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1c4f8a2d7e39'
+down_revision: Union[str, Sequence[str], None] = '0b7d3e9a5c14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add what /api/sync needs: updated_at indexes, tombstones and upload idempotency keys."""
+    op.create_index('ix_suppliers_updated_at_id', 'suppliers', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_vehicle_entries_updated_at_id', 'vehicle_entries', ['updated_at', 'id'], unique=False)
+    op.create_index('ix_lab_tests_updated_at_id', 'lab_tests', ['updated_at', 'id'], unique=False)
+
+    op.create_table(
+        'sync_tombstones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('entity', sa.String(length=50), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('deleted_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_sync_tombstones_deleted_at_id', 'sync_tombstones', ['deleted_at', 'id'], unique=False)
+
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.add_column(sa.Column('client_id', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_vehicle_entries_client_id', ['client_id'])
+    with op.batch_alter_table('lab_tests') as batch_op:
+        batch_op.add_column(sa.Column('client_id', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_lab_tests_client_id', ['client_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove sync tombstones, client ids and updated_at indexes."""
+    with op.batch_alter_table('lab_tests') as batch_op:
+        batch_op.drop_constraint('uq_lab_tests_client_id', type_='unique')
+        batch_op.drop_column('client_id')
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.drop_constraint('uq_vehicle_entries_client_id', type_='unique')
+        batch_op.drop_column('client_id')
+    op.drop_index('ix_sync_tombstones_deleted_at_id', table_name='sync_tombstones')
+    op.drop_table('sync_tombstones')
+    op.drop_index('ix_lab_tests_updated_at_id', table_name='lab_tests')
+    op.drop_index('ix_vehicle_entries_updated_at_id', table_name='vehicle_entries')
+    op.drop_index('ix_suppliers_updated_at_id', table_name='suppliers')
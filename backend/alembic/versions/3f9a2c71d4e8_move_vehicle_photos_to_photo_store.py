@@ -0,0 +1,135 @@
+"""Move vehicle photos into content-addressed photos table
+
+Revision ID: 3f9a2c71d4e8
+Revises: 87a18095c633
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+import hashlib
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a2c71d4e8'
+down_revision: Union[str, Sequence[str], None] = '87a18095c633'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Lightweight table definitions so the data move does not depend on the current models
+photos = sa.table(
+    'photos',
+    sa.column('sha256', sa.String),
+    sa.column('content_type', sa.String),
+    sa.column('size', sa.Integer),
+    sa.column('storage', sa.String),
+    sa.column('data', sa.LargeBinary),
+    sa.column('created_at', sa.DateTime),
+)
+vehicle_entries = sa.table(
+    'vehicle_entries',
+    sa.column('id', sa.Integer),
+    sa.column('supplier_bill_photo', sa.LargeBinary),
+    sa.column('vehicle_photo', sa.LargeBinary),
+    sa.column('supplier_bill_photo_sha256', sa.String),
+    sa.column('vehicle_photo_sha256', sa.String),
+)
+
+PHOTO_COLUMNS = (
+    ('supplier_bill_photo', 'supplier_bill_photo_sha256'),
+    ('vehicle_photo', 'vehicle_photo_sha256'),
+)
+
+def _content_type(data: bytes) -> str:
+    if data.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    return 'application/octet-stream'
+
+
+def upgrade() -> None:
+    """Upgrade schema - Create photos table and move photo bytes into it."""
+    op.create_table('photos',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('content_type', sa.String(length=100), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('storage', sa.String(length=20), nullable=False),
+    sa.Column('data', sa.LargeBinary(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.add_column(sa.Column('supplier_bill_photo_sha256', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('vehicle_photo_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key('fk_vehicle_entries_supplier_bill_photo', 'photos', ['supplier_bill_photo_sha256'], ['sha256'])
+        batch_op.create_foreign_key('fk_vehicle_entries_vehicle_photo', 'photos', ['vehicle_photo_sha256'], ['sha256'])
+
+    conn = op.get_bind()
+    seen = set()
+    for blob_column, ref_column in PHOTO_COLUMNS:
+        # Only ids first; each blob is then read on its own so memory stays at one photo at a time
+        ids = conn.execute(
+            sa.select(vehicle_entries.c.id).where(vehicle_entries.c[blob_column].isnot(None))
+        ).scalars().all()
+        for entry_id in ids:
+            data = conn.execute(
+                sa.select(vehicle_entries.c[blob_column]).where(vehicle_entries.c.id == entry_id)
+            ).scalar()
+            data = bytes(data)
+            sha256 = hashlib.sha256(data).hexdigest()
+            if sha256 not in seen:
+                exists = conn.execute(
+                    sa.select(photos.c.sha256).where(photos.c.sha256 == sha256)
+                ).first()
+                if not exists:
+                    conn.execute(photos.insert().values(
+                        sha256=sha256,
+                        content_type=_content_type(data),
+                        size=len(data),
+                        storage='database',
+                        data=data,
+                        created_at=datetime.utcnow(),
+                    ))
+                seen.add(sha256)
+            conn.execute(
+                vehicle_entries.update()
+                .where(vehicle_entries.c.id == entry_id)
+                .values({ref_column: sha256})
+            )
+
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.drop_column('supplier_bill_photo')
+        batch_op.drop_column('vehicle_photo')
+
+
+def downgrade() -> None:
+    """Downgrade schema - Copy photo bytes back onto vehicle_entries and drop photos table.
+
+    Only photos kept in the database are restored; filesystem-backed photos are left on disk.
+    """
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.add_column(sa.Column('supplier_bill_photo', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('vehicle_photo', sa.LargeBinary(), nullable=True))
+
+    conn = op.get_bind()
+    for blob_column, ref_column in PHOTO_COLUMNS:
+        conn.execute(
+            vehicle_entries.update()
+            .values({blob_column: (
+                sa.select(photos.c.data)
+                .where(photos.c.sha256 == vehicle_entries.c[ref_column])
+                .scalar_subquery()
+            )})
+            .where(vehicle_entries.c[ref_column].isnot(None))
+        )
+
+    with op.batch_alter_table('vehicle_entries') as batch_op:
+        batch_op.drop_constraint('fk_vehicle_entries_vehicle_photo', type_='foreignkey')
+        batch_op.drop_constraint('fk_vehicle_entries_supplier_bill_photo', type_='foreignkey')
+        batch_op.drop_column('vehicle_photo_sha256')
+        batch_op.drop_column('supplier_bill_photo_sha256')
+    op.drop_table('photos')
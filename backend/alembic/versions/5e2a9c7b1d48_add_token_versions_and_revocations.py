@@ -0,0 +1,41 @@
+"""Add token versions and revoked tokens
+
+Revision ID: 5e2a9c7b1d48
+Revises: 1c4f8a2d7e39
+Create Date: 2026-10-18 19:02:37.418265
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a9c7b1d48'
+down_revision: Union[str, Sequence[str], None] = '1c4f8a2d7e39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add users.token_version for compact-claims tokens and the revoked_tokens list."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table(
+        'revoked_tokens',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('jti'),
+    )
+    op.create_index(op.f('ix_revoked_tokens_expires_at'), 'revoked_tokens', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop revoked_tokens and users.token_version."""
+    op.drop_index(op.f('ix_revoked_tokens_expires_at'), table_name='revoked_tokens')
+    op.drop_table('revoked_tokens')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,40 @@
+"""Add rate limit windows
+
+Revision ID: 8b3f6d2e4a71
+Revises: 5e2a9c7b1d48
+Create Date: 2026-10-18 20:14:52.306117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b3f6d2e4a71'
+down_revision: Union[str, Sequence[str], None] = '5e2a9c7b1d48'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add rate_limit_windows for RATE_LIMIT_BACKEND=postgres."""
+    # Counters are worth nothing after a crash, so PostgreSQL skips the WAL for them
+    op.create_table(
+        'rate_limit_windows',
+        sa.Column('key', sa.String(length=200), nullable=False),
+        sa.Column('window_index', sa.BigInteger(), nullable=False),
+        sa.Column('current', sa.Integer(), nullable=False),
+        sa.Column('previous', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED'] if op.get_bind().dialect.name == 'postgresql' else [],
+    )
+    op.create_index(op.f('ix_rate_limit_windows_expires_at'), 'rate_limit_windows', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema - Drop rate_limit_windows."""
+    op.drop_index(op.f('ix_rate_limit_windows_expires_at'), table_name='rate_limit_windows')
+    op.drop_table('rate_limit_windows')
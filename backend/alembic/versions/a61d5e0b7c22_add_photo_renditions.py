@@ -0,0 +1,36 @@
+"""Add photo renditions
+
+Revision ID: a61d5e0b7c22
+Revises: 3f9a2c71d4e8
+Create Date: 2026-10-18 11:03:27.540916
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a61d5e0b7c22'
+down_revision: Union[str, Sequence[str], None] = '3f9a2c71d4e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add photo_renditions table."""
+    op.create_table('photo_renditions',
+    sa.Column('source_sha256', sa.String(length=64), nullable=False),
+    sa.Column('size', sa.String(length=20), nullable=False),
+    sa.Column('photo_sha256', sa.String(length=64), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['photo_sha256'], ['photos.sha256'], ),
+    sa.ForeignKeyConstraint(['source_sha256'], ['photos.sha256'], ),
+    sa.PrimaryKeyConstraint('source_sha256', 'size')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove photo_renditions table."""
+    op.drop_table('photo_renditions')
@@ -0,0 +1,34 @@
+"""Add keyset pagination indexes
+
+Revision ID: c4e8f19a2b73
+Revises: a61d5e0b7c22
+Create Date: 2026-10-18 13:26:05.773401
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8f19a2b73'
+down_revision: Union[str, Sequence[str], None] = 'a61d5e0b7c22'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add (timestamp, id) indexes for cursor pagination."""
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+    op.create_index('ix_suppliers_created_at_id', 'suppliers', ['created_at', 'id'], unique=False)
+    op.create_index('ix_vehicle_entries_arrival_time_id', 'vehicle_entries', ['arrival_time', 'id'], unique=False)
+    op.create_index('ix_lab_tests_created_at_id', 'lab_tests', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove cursor pagination indexes."""
+    op.drop_index('ix_lab_tests_created_at_id', table_name='lab_tests')
+    op.drop_index('ix_vehicle_entries_arrival_time_id', table_name='vehicle_entries')
+    op.drop_index('ix_suppliers_created_at_id', table_name='suppliers')
+    op.drop_index('ix_users_created_at_id', table_name='users')
@@ -0,0 +1,52 @@
+"""Add search and filter indexes
+
+Revision ID: d27b6a4f90e1
+Revises: c4e8f19a2b73
+Create Date: 2026-10-18 14:51:38.206117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd27b6a4f90e1'
+down_revision: Union[str, Sequence[str], None] = 'c4e8f19a2b73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add B-tree and trigram indexes behind the list filters."""
+    op.create_index('ix_vehicle_entries_supplier_id_arrival_time', 'vehicle_entries', ['supplier_id', 'arrival_time'], unique=False)
+    op.create_index(op.f('ix_vehicle_entries_bill_no'), 'vehicle_entries', ['bill_no'], unique=False)
+    op.create_index(op.f('ix_lab_tests_vehicle_entry_id'), 'lab_tests', ['vehicle_entry_id'], unique=False)
+    op.create_index(op.f('ix_lab_tests_test_date'), 'lab_tests', ['test_date'], unique=False)
+    op.create_index(op.f('ix_lab_tests_moisture'), 'lab_tests', ['moisture'], unique=False)
+    op.create_index(op.f('ix_lab_tests_protein_percent'), 'lab_tests', ['protein_percent'], unique=False)
+    op.create_index(op.f('ix_lab_tests_falling_number'), 'lab_tests', ['falling_number'], unique=False)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # Prefix search on vehicle numbers: upper(vehicle_number) LIKE 'MH12%'
+        op.execute('CREATE INDEX ix_vehicle_entries_vehicle_number_upper ON vehicle_entries (upper(vehicle_number) varchar_pattern_ops)')
+        # Substring search: vehicle_number / bill_no ILIKE '%...%'
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute('CREATE INDEX ix_vehicle_entries_vehicle_number_trgm ON vehicle_entries USING gin (vehicle_number gin_trgm_ops)')
+        op.execute('CREATE INDEX ix_vehicle_entries_bill_no_trgm ON vehicle_entries USING gin (bill_no gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove search and filter indexes."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_vehicle_entries_bill_no_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_vehicle_entries_vehicle_number_trgm')
+        op.execute('DROP INDEX IF EXISTS ix_vehicle_entries_vehicle_number_upper')
+    op.drop_index(op.f('ix_lab_tests_falling_number'), table_name='lab_tests')
+    op.drop_index(op.f('ix_lab_tests_protein_percent'), table_name='lab_tests')
+    op.drop_index(op.f('ix_lab_tests_moisture'), table_name='lab_tests')
+    op.drop_index(op.f('ix_lab_tests_test_date'), table_name='lab_tests')
+    op.drop_index(op.f('ix_lab_tests_vehicle_entry_id'), table_name='lab_tests')
+    op.drop_index(op.f('ix_vehicle_entries_bill_no'), table_name='vehicle_entries')
+    op.drop_index('ix_vehicle_entries_supplier_id_arrival_time', table_name='vehicle_entries')
@@ -0,0 +1,49 @@
+"""Add supplier quality rollups
+
+Revision ID: e5c13a8f7b20
+Revises: d27b6a4f90e1
+Create Date: 2026-10-18 15:12:44.318207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c13a8f7b20'
+down_revision: Union[str, Sequence[str], None] = 'd27b6a4f90e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add supplier_quality_rollups table.
+
+    Existing lab tests are rolled up by POST /api/analytics/rebuild after deploying.
+    """
+    op.create_table('supplier_quality_rollups',
+    sa.Column('supplier_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=10), nullable=False),
+    sa.Column('period_start', sa.Date(), nullable=False),
+    sa.Column('parameter', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('mean', sa.Float(), nullable=True),
+    sa.Column('min', sa.Float(), nullable=True),
+    sa.Column('max', sa.Float(), nullable=True),
+    sa.Column('p10', sa.Float(), nullable=True),
+    sa.Column('p50', sa.Float(), nullable=True),
+    sa.Column('p90', sa.Float(), nullable=True),
+    sa.Column('out_of_spec_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ),
+    sa.PrimaryKeyConstraint('supplier_id', 'period', 'period_start', 'parameter')
+    )
+    op.create_index('ix_supplier_quality_rollups_period_start', 'supplier_quality_rollups', ['period', 'period_start'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove supplier_quality_rollups table."""
+    op.drop_index('ix_supplier_quality_rollups_period_start', table_name='supplier_quality_rollups')
+    op.drop_table('supplier_quality_rollups')
@@ -0,0 +1,61 @@
+"""Add lab test grading
+
+Revision ID: f81b4d2c6a95
+Revises: e5c13a8f7b20
+Create Date: 2026-10-18 16:40:09.731552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f81b4d2c6a95'
+down_revision: Union[str, Sequence[str], None] = 'e5c13a8f7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema - Add grading columns and spec tables.
+
+    Existing lab tests are graded by POST /api/grading/regrade after deploying.
+    """
+    with op.batch_alter_table('lab_tests') as batch_op:
+        batch_op.add_column(sa.Column('grade', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('deduction_percent', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('is_rejected', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('rejection_reasons', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('graded_at', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_lab_tests_grade', ['grade'], unique=False)
+    op.create_table('grade_specs',
+    sa.Column('grade', sa.String(length=20), nullable=False),
+    sa.Column('parameter', sa.String(length=50), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('min_value', sa.Float(), nullable=True),
+    sa.Column('max_value', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('grade', 'parameter')
+    )
+    op.create_table('deduction_specs',
+    sa.Column('parameter', sa.String(length=50), nullable=False),
+    sa.Column('direction', sa.String(length=10), nullable=False),
+    sa.Column('tolerance', sa.Float(), nullable=False),
+    sa.Column('rate', sa.Float(), nullable=False),
+    sa.Column('reject_limit', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('parameter')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema - Remove grading columns and spec tables."""
+    op.drop_table('deduction_specs')
+    op.drop_table('grade_specs')
+    with op.batch_alter_table('lab_tests') as batch_op:
+        batch_op.drop_index('ix_lab_tests_grade')
+        batch_op.drop_column('graded_at')
+        batch_op.drop_column('rejection_reasons')
+        batch_op.drop_column('is_rejected')
+        batch_op.drop_column('deduction_percent')
+        batch_op.drop_column('grade')
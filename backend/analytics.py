@@ -0,0 +1,175 @@
+import math
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import models
+
+PERIODS = ("day", "week")
+
+# Lab parameters rolled up per supplier. A result outside the grading specs' acceptance
+# limits (grading.Specs.limits) counts towards the rollup's out-of-spec rate.
+PARAMETERS = (
+    "moisture", "test_weight", "protein_percent", "wet_gluten", "dry_gluten",
+    "falling_number", "total_impurities", "total_dockage",
+)
+Limits = Dict[str, Tuple[Optional[float], Optional[float]]]
+
+Bucket = Tuple[int, str, date]
+
+def period_start(period: str, day: date) -> date:
+    """First day of the period containing `day`; weeks start on Monday."""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+def period_end(period: str, start: date) -> date:
+    return start + timedelta(days=7 if period == "week" else 1)
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Linear-interpolated percentile of an already sorted list."""
+    position = (len(ordered) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def out_of_spec(limits: Limits, parameter: str, value: float) -> bool:
+    # A parameter the specs leave unlimited is never out of spec
+    low, high = limits.get(parameter, (None, None))
+    return (low is not None and value < low) or (high is not None and value > high)
+
+def summarize(parameter: str, values: List[float], limits: Limits) -> dict:
+    ordered = sorted(values)
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "min": ordered[0],
+        "max": ordered[-1],
+        "p10": percentile(ordered, 0.10),
+        "p50": percentile(ordered, 0.50),
+        "p90": percentile(ordered, 0.90),
+        "out_of_spec_count": sum(1 for value in ordered if out_of_spec(limits, parameter, value)),
+    }
+
+def buckets_for(supplier_id: int, tested_at: datetime) -> List[Bucket]:
+    return [(supplier_id, period, period_start(period, tested_at.date())) for period in PERIODS]
+
+def refresh_buckets(db: Session, buckets: Iterable[Bucket], replace: bool = True):
+    """Recompute the rollup rows of the given (supplier, period, start) buckets from raw lab tests.
+
+    Only the touched buckets are rebuilt, so the cost follows the tests in those days and weeks,
+    not the size of lab_tests. Runs in the caller's transaction; the caller commits.
+    """
+    # Imported here because grading imports this module
+    import grading
+
+    buckets: Set[Bucket] = set(buckets)
+    if not buckets:
+        return
+    limits = grading.load_specs(db).limits
+    supplier_ids = {supplier_id for supplier_id, _, _ in buckets}
+    since = min(start for _, _, start in buckets)
+    until = max(period_end(period, start) for _, period, start in buckets)
+
+    rows = db.execute(
+        select(models.VehicleEntry.supplier_id, models.LabTest.test_date, *[getattr(models.LabTest, p) for p in PARAMETERS])
+        .join(models.LabTest.vehicle_entry)
+        .where(
+            models.VehicleEntry.supplier_id.in_(supplier_ids),
+            models.LabTest.test_date >= datetime.combine(since, datetime.min.time()),
+            models.LabTest.test_date < datetime.combine(until, datetime.min.time()),
+        )
+    )
+    values: Dict[Tuple[Bucket, str], List[float]] = defaultdict(list)
+    for supplier_id, tested_at, *results in rows:
+        for bucket in buckets_for(supplier_id, tested_at):
+            if bucket not in buckets:
+                continue
+            for parameter, value in zip(PARAMETERS, results):
+                if value is not None:
+                    values[bucket, parameter].append(value)
+
+    rollup = models.SupplierQualityRollup
+    if replace:
+        for supplier_id, period, start in buckets:
+            db.execute(delete(rollup).where(
+                rollup.supplier_id == supplier_id, rollup.period == period, rollup.period_start == start,
+            ))
+    now = datetime.utcnow()
+    new_rows = [
+        {
+            "supplier_id": supplier_id, "period": period, "period_start": start, "parameter": parameter,
+            "updated_at": now, **summarize(parameter, samples, limits),
+        }
+        for ((supplier_id, period, start), parameter), samples in values.items()
+    ]
+    if new_rows:
+        db.execute(insert(rollup), new_rows)
+
+def refresh_for_lab_tests(db: Session, tests: Iterable[Tuple[int, Optional[datetime]]]):
+    """Refresh the buckets touched by newly inserted (vehicle_entry_id, test_date) pairs."""
+    tests = [(vehicle_id, tested_at) for vehicle_id, tested_at in tests if tested_at is not None]
+    if not tests:
+        return
+    suppliers = dict(db.execute(
+        select(models.VehicleEntry.id, models.VehicleEntry.supplier_id)
+        .where(models.VehicleEntry.id.in_({vehicle_id for vehicle_id, _ in tests}))
+    ).all())
+    refresh_buckets(db, {
+        bucket
+        for vehicle_id, tested_at in tests
+        if vehicle_id in suppliers
+        for bucket in buckets_for(suppliers[vehicle_id], tested_at)
+    })
+
+def refresh_after_insert(db: Session, tests: Iterable[Tuple[int, Optional[datetime]]]):
+    """Refresh and commit the rollups for lab tests that were just committed.
+
+    Two requests refreshing the same bucket can both insert its rows; the loser retries once,
+    by which time it sees the winner's tests as well.
+    """
+    tests = list(tests)
+    for attempt in range(2):
+        try:
+            refresh_for_lab_tests(db, tests)
+            db.commit()
+            return
+        except IntegrityError:
+            db.rollback()
+            if attempt:
+                raise
+
+def rebuild(db: Session) -> int:
+    """Recompute every rollup from scratch, e.g. after deploying the table onto existing data."""
+    db.execute(delete(models.SupplierQualityRollup))
+    tests = db.execute(
+        select(models.VehicleEntry.supplier_id, models.LabTest.test_date)
+        .join(models.LabTest.vehicle_entry)
+        .where(models.LabTest.test_date.is_not(None))
+    )
+    buckets = {bucket for supplier_id, tested_at in tests for bucket in buckets_for(supplier_id, tested_at)}
+    refresh_buckets(db, buckets, replace=False)
+    db.commit()
+    return db.query(models.SupplierQualityRollup).count()
+
+def rollups_statement(period: str, supplier_id: Optional[int] = None, parameter: Optional[str] = None,
+                      date_from: Optional[date] = None, date_to: Optional[date] = None):
+    rollup = models.SupplierQualityRollup
+    stmt = (
+        select(rollup, models.Supplier.supplier_name)
+        .join(models.Supplier, models.Supplier.id == rollup.supplier_id)
+        .where(rollup.period == period)
+    )
+    if supplier_id is not None:
+        stmt = stmt.where(rollup.supplier_id == supplier_id)
+    if parameter:
+        stmt = stmt.where(rollup.parameter == parameter)
+    if date_from:
+        stmt = stmt.where(rollup.period_start >= period_start(period, date_from))
+    if date_to:
+        stmt = stmt.where(rollup.period_start <= date_to)
+    return stmt.order_by(rollup.period_start.desc(), models.Supplier.supplier_name, rollup.parameter)
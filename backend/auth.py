@@ -1,77 +1,278 @@
 
-from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 import secrets
 import models
-import schemas
-from database import get_db
+from cache import TTLCache
+from database import get_async_db
 
 # Use a fixed secret key for development. In production, set JWT_SECRET_KEY environment variable
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24
 
+# bcrypt work factor for new hashes; existing hashes are upgraded on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so a small pool hashes in parallel without touching the request threadpool.
+# Beyond PASSWORD_HASH_WORKERS running and PASSWORD_HASH_QUEUE_DEPTH waiting, requests get a 503.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_QUEUE_DEPTH = int(os.getenv("PASSWORD_HASH_QUEUE_DEPTH", "16"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = 1
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Authenticated users by username, so protected requests skip the users lookup.
+# update_user/delete_user invalidate entries; the TTL bounds staleness for other changes.
+user_cache = TTLCache(
+    "users",
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+
+# Verified token claims by SHA-256 of the token, so repeated requests skip the signature check.
+# Entries never outlive the token's own exp.
+token_cache = TTLCache(
+    "tokens",
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "300")),
+)
+# token_version by user id; claims tokens are valid only while their ver still matches
+token_version_cache = TTLCache(
+    "token_versions",
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+# How often each worker reloads revocations made by the others
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "30"))
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_password_slots = threading.BoundedSemaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE_DEPTH)
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a bcrypt hash."""
     return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt."""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
     return hashed.decode('utf-8')
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """True when a hash was made with a different work factor than BCRYPT_ROUNDS."""
+    try:
+        return int(hashed_password.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+async def _run_password_work(func, *args):
+    if not _password_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many concurrent sign-ins, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_slots.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password on the bounded bcrypt pool, for use in request handlers."""
+    return await _run_password_work(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash on the bounded bcrypt pool, for use in request handlers."""
+    return await _run_password_work(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    # jti names this token on the revocation list
+    to_encode.update({"exp": expire, "iat": now, "jti": secrets.token_urlsafe(12)})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(models.User).filter(models.User.username == username).first()
+# User columns whose change retires tokens already issued: the claims carry them, or they prove identity
+TOKEN_CLAIM_FIELDS = ("username", "role", "is_active", "hashed_password")
+
+def create_user_token(user: models.User, expires_delta: Optional[timedelta] = None) -> str:
+    """An access token carrying compact claims, so authorization needs no users lookup.
+
+    The claims stay trustworthy because `ver` must match the user's token_version, which is
+    bumped whenever the role, active flag, username or password changes.
+    """
+    return create_access_token({
+        "sub": user.username,
+        "uid": user.id,
+        "role": user.role,
+        "act": bool(user.is_active),
+        "ver": user.token_version or 0,
+    }, expires_delta)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await db.scalar(select(models.User).where(models.User.username == username))
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
+    if password_needs_rehash(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(password)
+        await db.commit()
     return user
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_error(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = schemas.TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
+
+class RevocationList:
+    """Unexpired revoked token ids, mirrored from revoked_tokens.
+
+    Revocations made in this process apply at once; those made by other workers are picked up
+    on the next refresh, at most REVOCATION_REFRESH_SECONDS later.
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        self._loaded_at = float("-inf")
+
+    def __contains__(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+    def add(self, jti: str, expires_at: float):
+        self._revoked[jti] = expires_at
+
+    async def refresh(self, db: AsyncSession, force: bool = False):
+        if not force and time.monotonic() - self._loaded_at < REVOCATION_REFRESH_SECONDS:
+            return
+        self._loaded_at = time.monotonic()
+        rows = await db.execute(
+            select(models.RevokedToken.jti, models.RevokedToken.expires_at)
+            .where(models.RevokedToken.expires_at > datetime.utcnow())
+        )
+        self._revoked = {jti: expires_at.replace(tzinfo=timezone.utc).timestamp() for jti, expires_at in rows}
+
+revocations = RevocationList()
+
+async def verify_token(token: Optional[str], db: AsyncSession) -> dict:
+    """The claims of a valid, unexpired, unrevoked token, or a 401.
+
+    Verified claims are cached by the token's SHA-256 digest, never past the token's exp,
+    so a tablet sending the same token all shift pays for the signature check once.
+    """
+    if not token:
+        raise _credentials_error()
+    await revocations.refresh(db)
+    digest = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(digest)
+    if claims is None:
+        try:
+            claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise _credentials_error()
+        if claims.get("sub") is None:
+            raise _credentials_error()
+        remaining = claims["exp"] - time.time() if "exp" in claims else token_cache.ttl
+        token_cache.set(digest, claims, ttl=min(token_cache.ttl, remaining))
+    elif "exp" in claims and claims["exp"] <= time.time():
+        raise _credentials_error()
+    if claims.get("jti") in revocations:
+        raise _credentials_error("Token has been revoked")
+    return claims
+
+async def _load_user(db: AsyncSession, username: str) -> models.User:
+    user = user_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = await db.scalar(select(models.User).where(models.User.username == username))
+        if user is None:
+            raise _credentials_error()
+        # Detach the fully loaded row so later commits in this session can't expire the cached copy
+        db.expunge(user)
+        user_cache.set(username, user)
+    return user
+
+async def user_from_token(token: Optional[str], db: AsyncSession) -> models.User:
+    """Resolve a bearer token to its user, or raise 401. Shared by headers and the event stream's ?token=."""
+    claims = await verify_token(token, db)
+    user = await _load_user(db, claims["sub"])
+    if "ver" in claims and claims["ver"] != (user.token_version or 0):
+        raise _credentials_error("Token has been revoked")
     return user
 
-async def get_current_active_user(current_user: models.User = Depends(get_current_user)):
+class Principal:
+    """The caller as the token's compact claims describe it; enough for every authorization check."""
+    __slots__ = ("id", "username", "role", "is_active")
+
+    def __init__(self, id: int, username: str, role: str, is_active: bool):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.is_active = is_active
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(user.id, user.username, user.role, user.is_active)
+
+async def principal_from_token(token: Optional[str], db: AsyncSession) -> Principal:
+    claims = await verify_token(token, db)
+    if "uid" not in claims:
+        # Tokens issued before compact claims carry only the username
+        return Principal.from_user(await user_from_token(token, db))
+    version = token_version_cache.get(claims["uid"])
+    if version is None:
+        version = await db.scalar(select(models.User.token_version).where(models.User.id == claims["uid"]))
+        if version is None:
+            raise _credentials_error()
+        token_version_cache.set(claims["uid"], version)
+    if claims["ver"] != version:
+        raise _credentials_error("Token has been revoked")
+    return Principal(claims["uid"], claims["sub"], claims["role"], claims["act"])
+
+async def revoke_token(db: AsyncSession, token: str):
+    """Put a token on the revocation list until it expires, and prune entries that have."""
+    claims = await verify_token(token, db)
+    expires_at = datetime.utcfromtimestamp(claims["exp"])
+    now = datetime.utcnow()
+    await db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+    db.add(models.RevokedToken(jti=claims["jti"], expires_at=expires_at, revoked_at=now))
+    await db.commit()
+    revocations.add(claims["jti"], claims["exp"])
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await user_from_token(token, db)
+
+async def get_current_principal(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    return await principal_from_token(token, db)
+
+def invalidate_user(*usernames: str, user_id: Optional[int] = None):
+    """Drop cached users after their username, role, password or active flag change."""
+    for username in usernames:
+        user_cache.delete(username)
+    if user_id is not None:
+        token_version_cache.delete(user_id)
+
+async def get_current_active_user(current_user: Principal = Depends(get_current_principal)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
-async def get_current_admin_user(current_user: models.User = Depends(get_current_active_user)):
+async def get_current_admin_user(current_user: Principal = Depends(get_current_active_user)):
     if current_user.role != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+# The app modules are imported inside functions: database.py reads DATABASE_URL when it is first
+# imported, and the command line may point it at a throwaway database first.
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+# Fraction by which a scenario's p95 may grow over the baseline before it counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+def _jpeg(rng: random.Random, width: int = 1600, height: int = 1200) -> bytes:
+    """A phone-sized JPEG with enough detail that it doesn't compress to nothing."""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw.rectangle((x, y, x + rng.randrange(20, 200), y + rng.randrange(20, 200)), fill=tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=85)
+    return buffer.getvalue()
+
+def seed(db, suppliers: int = 200, vehicles: int = 20000, lab_tests: int = 15000, photos: int = 20, random_seed: int = 1) -> dict:
+    """Fill an empty database with a season's worth of data and return ids the scenarios use.
+
+    The same arguments always produce the same rows, so runs against different versions compare.
+    """
+    from sqlalchemy import insert, select
+
+    import analytics
+    import auth
+    import grading
+    import images
+    import models
+    import photos as photo_store
+
+    rng = random.Random(random_seed)
+    now = datetime.utcnow().replace(microsecond=0)
+
+    db.add(models.User(
+        username=BENCH_USERNAME, email="bench@gateentry.com", full_name="Benchmark",
+        hashed_password=auth.get_password_hash(BENCH_PASSWORD), role="admin", is_active=True,
+    ))
+    db.execute(insert(models.Supplier), [
+        {"supplier_name": f"Supplier {n:04d}", "state": "Maharashtra", "city": rng.choice(["Pune", "Nashik", "Latur", "Jalna"]),
+         "phone": f"98{n:08d}", "contact_person": f"Contact {n}"}
+        for n in range(suppliers)
+    ])
+    supplier_ids = db.scalars(select(models.Supplier.id)).all()
+
+    photo_pairs = []
+    for _ in range(photos):
+        pair = []
+        for _ in range(2):
+            photo = photo_store.store_photo(db, _jpeg(rng))
+            pair.append(photo.sha256)
+        photo_pairs.append(pair)
+    db.commit()
+    for sha256 in {sha256 for pair in photo_pairs for sha256 in pair}:
+        images.generate_renditions(sha256)
+
+    vehicle_rows = []
+    for n in range(vehicles):
+        bill_photo, truck_photo = photo_pairs[n % len(photo_pairs)] if photo_pairs else (None, None)
+        arrival = now - timedelta(minutes=(vehicles - n) * 5)
+        vehicle_rows.append({
+            "vehicle_number": f"MH{rng.randrange(10, 50)}{rng.choice('ABCDEFGH')}{rng.choice('ABCDEFGH')}{rng.randrange(10000):04d}",
+            "supplier_id": rng.choice(supplier_ids), "bill_no": f"INV-{n:06d}", "driver_name": f"Driver {n % 500}",
+            "arrival_time": arrival, "created_at": arrival,
+            "supplier_bill_photo_sha256": bill_photo, "vehicle_photo_sha256": truck_photo,
+        })
+    db.execute(insert(models.VehicleEntry), vehicle_rows)
+    vehicle_ids = db.scalars(select(models.VehicleEntry.id).order_by(models.VehicleEntry.id)).all()
+
+    test_rows = []
+    for vehicle_id, vehicle in zip(vehicle_ids[:lab_tests], vehicle_rows):
+        tested = vehicle["arrival_time"] + timedelta(minutes=rng.randrange(10, 90))
+        test_rows.append({
+            "vehicle_entry_id": vehicle_id, "test_date": tested, "created_at": tested,
+            "moisture": round(rng.gauss(11.5, 1.0), 2), "test_weight": round(rng.gauss(77, 1.5), 2),
+            "protein_percent": round(rng.gauss(11.8, 0.8), 2), "wet_gluten": round(rng.gauss(28, 2), 2),
+            "dry_gluten": round(rng.gauss(9.5, 0.7), 2), "falling_number": int(rng.gauss(320, 40)),
+            **{part: round(abs(rng.gauss(0.2, 0.15)), 2) for parts in grading.TOTALS.values() for part in parts},
+            "total_impurities": None, "total_dockage": None, "tested_by": "Lab",
+        })
+    grading.grade_records(test_rows, grading.load_specs(db))
+    db.execute(insert(models.LabTest), test_rows)
+    db.commit()
+    analytics.rebuild(db)
+
+    lab_test_ids = db.scalars(select(models.LabTest.id)).all()
+    return {
+        "supplier_ids": list(supplier_ids),
+        "vehicle_ids": list(vehicle_ids),
+        "lab_test_ids": list(lab_test_ids),
+        "photo_vehicle_ids": list(vehicle_ids[:len(photo_pairs)]),
+        "counts": {"suppliers": suppliers, "vehicles": vehicles, "lab_tests": lab_tests, "photos": len(photo_pairs) * 2},
+    }
+
+class Context:
+    def __init__(self, client, ids: dict, rng: random.Random):
+        self.client = client
+        self.ids = ids
+        self.rng = rng
+        self.headers: Dict[str, str] = {}
+
+    def pick(self, key: str) -> int:
+        return self.rng.choice(self.ids[key])
+
+def _create_vehicle(ctx: Context, n: int):
+    return ctx.client.post("/api/vehicles", headers=ctx.headers, data={
+        "vehicle_number": f"MH12BN{n:04d}", "supplier_id": str(ctx.pick("supplier_ids")), "bill_no": f"BENCH-{n}",
+    })
+
+# name -> request for the n-th iteration. Each returns the httpx response coroutine.
+SCENARIOS: Dict[str, Callable] = {
+    "login": lambda ctx, n: ctx.client.post("/api/auth/login", json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD}),
+    "suppliers.list": lambda ctx, n: ctx.client.get("/api/suppliers", headers=ctx.headers),
+    "vehicles.list": lambda ctx, n: ctx.client.get("/api/vehicles", params={"cursor": "", "limit": 50}, headers=ctx.headers),
+    "vehicles.search": lambda ctx, n: ctx.client.get("/api/vehicles", params={"search": f"MH{10 + n % 40}", "limit": 50}, headers=ctx.headers),
+    "vehicles.detail": lambda ctx, n: ctx.client.get(f"/api/vehicles/{ctx.pick('vehicle_ids')}", headers=ctx.headers),
+    "lab_tests.list": lambda ctx, n: ctx.client.get("/api/lab-tests", params={"cursor": "", "limit": 50}, headers=ctx.headers),
+    "lab_tests.list_sideloaded": lambda ctx, n: ctx.client.get(
+        "/api/lab-tests", params={"cursor": "", "limit": 50, "shape": "sideloaded"}, headers=ctx.headers,
+    ),
+    "lab_tests.detail": lambda ctx, n: ctx.client.get(f"/api/lab-tests/{ctx.pick('lab_test_ids')}", headers=ctx.headers),
+    "photos.thumb": lambda ctx, n: ctx.client.get(
+        f"/api/vehicles/{ctx.pick('photo_vehicle_ids')}/vehicle_photo", params={"size": "thumb"}, headers=ctx.headers,
+    ),
+    "photos.original": lambda ctx, n: ctx.client.get(f"/api/vehicles/{ctx.pick('photo_vehicle_ids')}/vehicle_photo", headers=ctx.headers),
+    "dashboard.summary": lambda ctx, n: ctx.client.get("/api/dashboard/summary", headers=ctx.headers),
+    "vehicles.create": _create_vehicle,
+    "lab_tests.create": lambda ctx, n: ctx.client.post("/api/lab-tests", headers=ctx.headers, json={
+        "vehicle_entry_id": ctx.pick("vehicle_ids"), "moisture": 11.2, "protein_percent": 12.1, "falling_number": 310,
+    }),
+    "grading.regrade": lambda ctx, n: ctx.client.post("/api/grading/regrade", headers=ctx.headers),
+}
+
+# Scenarios too slow to run at full volume: name -> (fraction of the requests, concurrency cap)
+SCALED_DOWN = {
+    # Dominated by bcrypt
+    "login": (10, None),
+    # Each request re-grades every lab test; concurrent runs would only queue on the write lock
+    "grading.regrade": (50, 1),
+}
+
+def summarize(latencies: List[float], errors: int, elapsed: float, concurrency: int) -> dict:
+    import analytics
+
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)),
+        "p50_ms": ms(analytics.percentile(ordered, 0.50)),
+        "p95_ms": ms(analytics.percentile(ordered, 0.95)),
+        "p99_ms": ms(analytics.percentile(ordered, 0.99)),
+        "max_ms": ms(ordered[-1]),
+    }
+
+async def run_scenario(ctx: Context, name: str, requests: int, concurrency: int, warmup: int = 5) -> dict:
+    request = SCENARIOS[name]
+    for n in range(warmup):
+        await request(ctx, -1 - n)
+
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for n in counter:
+            start = time.perf_counter()
+            response = await request(ctx, n)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start, concurrency)
+
+async def run(ids: dict, scenarios: List[str], requests: int, concurrency: int, random_seed: int = 1) -> Dict[str, dict]:
+    """Drive the app in-process through httpx's ASGI transport; no server or network is involved."""
+    import httpx
+
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ctx = Context(client, ids, random.Random(random_seed))
+            response = await client.post("/api/auth/login", json={"username": BENCH_USERNAME, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            ctx.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+            for name in scenarios:
+                count, workers = requests, concurrency
+                if name in SCALED_DOWN:
+                    fraction, cap = SCALED_DOWN[name]
+                    count, workers = max(1, requests // fraction), min(concurrency, cap or concurrency)
+                results[name] = await run_scenario(ctx, name, count, workers)
+    return results
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Scenarios whose p95 grew by more than `tolerance` over the baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before and before["p95_ms"] and result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {result['p95_ms']} ms")
+    return regressions
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def print_table(results: Dict[str, dict], baseline: Optional[Dict[str, dict]] = None):
+    print(f"{'scenario':28} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}{'  p95 vs baseline' if baseline else ''}")
+    for name, result in results.items():
+        line = f"{name:28} {result['throughput_rps']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} {result['errors']:>7}"
+        before = (baseline or {}).get(name)
+        if before and before["p95_ms"]:
+            line += f"  {(result['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Seed a throwaway database and benchmark the API in-process")
+    parser.add_argument("--database-url", help="defaults to a new SQLite file in the temp directory; the database must be empty")
+    parser.add_argument("--suppliers", type=int, default=200)
+    parser.add_argument("--vehicles", type=int, default=20000)
+    parser.add_argument("--lab-tests", type=int, default=15000)
+    parser.add_argument("--photos", type=int, default=20, help="distinct photo pairs shared by the vehicles")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="run only these; repeatable")
+    parser.add_argument("--output", help="write the results as JSON, e.g. to keep as the next baseline")
+    parser.add_argument("--baseline", help="JSON from an earlier --output to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed p95 growth over the baseline")
+    args = parser.parse_args(argv)
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        fd, path = tempfile.mkstemp(prefix="gateentry-bench-", suffix=".db")
+        os.close(fd)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    # Events stay in-process so the run needs nothing beyond the database
+    os.environ.setdefault("EVENT_BACKEND", "local")
+    # The login scenario measures bcrypt and token issue, not the per-IP limit every request would hit
+    os.environ.setdefault("LOGIN_IP_LIMIT", "0")
+
+    import models  # noqa: F401 - registers the tables on Base.metadata
+    from database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        ids = seed(db, args.suppliers, args.vehicles, args.lab_tests, args.photos)
+    print(f"Seeded {ids['counts']} in {time.perf_counter() - started:.1f}s")
+
+    scenarios = args.scenario or list(SCENARIOS)
+    results = asyncio.run(run(ids, scenarios, args.requests, args.concurrency))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline_report = json.load(f)
+        baseline = baseline_report["scenarios"]
+        meta = baseline_report["meta"]
+        if (meta["data"], meta["requests"], meta["concurrency"]) != (ids["counts"], args.requests, args.concurrency):
+            print("Warning: the baseline was recorded with different data volumes, requests or concurrency")
+    print_table(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "revision": _git_revision(),
+                "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+                "data": ids["counts"],
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+            "scenarios": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Hashable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from database import ASYNC_DATABASE_URL, engine
+
+logger = logging.getLogger(__name__)
+
+# "local" keeps each worker's caches to itself. "postgres" still keeps entries per worker, but sends
+# every delete and clear to the other workers with NOTIFY, so an invalidation anywhere applies everywhere.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "local")
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire `ttl` seconds after they are stored."""
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        caches[name] = self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        self.discard(key)
+        invalidations.publish(self.name, key)
+
+    def clear(self):
+        self.discard()
+        invalidations.publish(self.name, None)
+
+    def discard(self, key: Hashable = _MISSING):
+        """Drop `key`, or every entry, in this process only."""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+# Every TTLCache registers itself here so /api/metrics/cache can report on all of them
+caches: Dict[str, TTLCache] = {}
+
+class LocalInvalidation:
+    """Invalidations stay in this process. Suits a single worker and the tests."""
+
+    def publish(self, cache: str, key: Optional[Hashable]):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class PostgresInvalidation:
+    """Fans cache deletes and clears out to every worker with LISTEN/NOTIFY."""
+    channel = "cache_invalidations"
+
+    def __init__(self, async_url: str):
+        # asyncpg takes a plain postgresql:// DSN
+        self.dsn = make_url(async_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        # Tells this worker's own notifications apart from the others'
+        self.instance = uuid.uuid4().hex
+        self._connection = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-notify")
+
+    def _notify(self, payload: str):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": self.channel, "payload": payload})
+        except Exception:
+            logger.exception("Failed to publish cache invalidation %s", payload)
+
+    def publish(self, cache: str, key: Optional[Hashable]):
+        payload = json.dumps({"instance": self.instance, "cache": cache, "key": key, "all": key is None})
+        self._executor.submit(self._notify, payload)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        target = caches.get(message["cache"])
+        if message["instance"] == self.instance or target is None:
+            return
+        if message["all"]:
+            target.discard()
+        else:
+            key = message["key"]
+            target.discard(tuple(key) if isinstance(key, list) else key)
+
+    async def start(self):
+        import asyncpg
+
+        self._connection = await asyncpg.connect(self.dsn)
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+def _make_invalidation(name: str):
+    if name == "local":
+        return LocalInvalidation()
+    if name == "postgres":
+        return PostgresInvalidation(ASYNC_DATABASE_URL)
+    raise RuntimeError(f"Unknown CACHE_BACKEND: {name}")
+
+invalidations = _make_invalidation(CACHE_BACKEND)
@@ -0,0 +1,142 @@
+import os
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; clients then get gzip
+    brotli = None
+
+# Responses smaller than this are sent as they are; compressing them costs more than it saves
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+# Moderate levels: most of the size reduction for a fraction of the CPU of the maximum levels
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Photos, PDF bills, XLSX and archives are already compressed; the event stream must reach the
+# client unbuffered. Matched as prefixes of the Content-Type header.
+EXCLUDED_CONTENT_TYPES = (
+    "text/event-stream",
+    "image/",
+    "audio/",
+    "video/",
+    "application/pdf",
+    "application/zip",
+    "application/gzip",
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+)
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+class GzipEncoder:
+    content_encoding = "gzip"
+
+    def __init__(self, level: int = GZIP_LEVEL):
+        # wbits 31: a gzip header and trailer around the deflate stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        # Flush per chunk so streamed exports reach the client as they are produced
+        return self._compressor.compress(body) + self._compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+class BrotliEncoder:
+    content_encoding = "br"
+
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, *, more_body: bool) -> bytes:
+        if more_body:
+            return self._compressor.process(body) + self._compressor.flush()
+        return self._compressor.process(body) + self._compressor.finish()
+
+class CompressionMiddleware:
+    """Compresses HTTP responses with Brotli when the client accepts it and the package is installed, else gzip.
+
+    Responses that are small, already encoded or of an excluded content type pass through
+    unchanged. A streamed body is compressed chunk by chunk as it is sent.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = Headers(scope=scope).get("Accept-Encoding", "")
+        if brotli is not None and _accepts(accept_encoding, "br"):
+            encoder_class = BrotliEncoder
+        elif _accepts(accept_encoding, "gzip"):
+            encoder_class = GzipEncoder
+        else:
+            encoder_class = None
+        await CompressingResponder(encoder_class, self.minimum_size, send)(self.app, scope, receive)
+
+class CompressingResponder:
+    """The send side of one response: holds back the start message until the first body chunk shows whether to compress."""
+
+    def __init__(self, encoder_class: Optional[type], minimum_size: int, send: Send):
+        self.encoder_class = encoder_class
+        self.minimum_size = minimum_size
+        self.send = send
+        self.start_message: Message = {}
+        # None until the first body chunk; then the encoder, or False to pass the response through
+        self.encoder = None
+
+    async def __call__(self, app: ASGIApp, scope: Scope, receive: Receive):
+        await app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            headers = MutableHeaders(scope=self.start_message)
+            self.encoder = self._encoder_for(headers, body, more_body)
+            if self.encoder:
+                body = self.encoder.compress(body, more_body=more_body)
+                headers["Content-Encoding"] = self.encoder.content_encoding
+                # The encoded bytes differ from the identity ones, so a strong validator no longer matches them
+                etag = headers.get("ETag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = "W/" + etag
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+        elif self.encoder:
+            body = self.encoder.compress(body, more_body=more_body)
+
+        if self.encoder:
+            message = {"type": "http.response.body", "body": body, "more_body": more_body}
+        await self.send(message)
+
+    def _encoder_for(self, headers: MutableHeaders, body: bytes, more_body: bool):
+        if "content-encoding" in headers or headers.get("content-type", "").startswith(EXCLUDED_CONTENT_TYPES):
+            return False
+        # Byte ranges refer to the identity body; compressing one would corrupt the reassembled file
+        if self.start_message["status"] == 206 or "content-range" in headers:
+            return False
+        # Whether a response is compressed depends on the request's Accept-Encoding, so caches must key on it
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoder_class is None or (not more_body and len(body) < self.minimum_size):
+            return False
+        return self.encoder_class()
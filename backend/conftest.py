@@ -0,0 +1,105 @@
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+# Point the app at a throwaway SQLite file before database.py builds its engine
+_db_fd, _db_path = tempfile.mkstemp(suffix=".db")
+os.close(_db_fd)
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_path}"
+os.environ["BCRYPT_ROUNDS"] = "4"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from database import engine, async_engine, SessionLocal, Base
+from cache import caches
+import models
+import auth
+import main
+
+def pytest_sessionfinish(session, exitstatus):
+    # aiosqlite runs each connection on a non-daemon thread; pooled ones left open keep the process from exiting
+    asyncio.run(async_engine.dispose())
+
+@pytest.fixture
+def db():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    for cache in caches.values():
+        cache.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def client(db):
+    # One portal for the whole test so the async engine's pooled connections stay on one event loop
+    with TestClient(main.app) as client:
+        yield client
+
+@pytest.fixture
+def admin_headers(db):
+    db.add(models.User(
+        username="admin",
+        email="admin@gateentry.com",
+        full_name="System Administrator",
+        hashed_password=auth.get_password_hash("admin123"),
+        role="admin",
+        is_active=True
+    ))
+    db.commit()
+    token = auth.create_access_token(data={"sub": "admin"})
+    return {"Authorization": f"Bearer {token}"}
+
+@contextmanager
+def count_statements():
+    """Collect every SQL statement the sync and async engines execute inside the block."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", before_cursor_execute)
+
+def seed_vehicle(db):
+    """One supplier with one vehicle entry, for tests that add lab tests through the API."""
+    supplier = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    vehicle = models.VehicleEntry(vehicle_number="MH12AB1234", supplier=supplier, bill_no="INV-1")
+    db.add(vehicle)
+    db.commit()
+    return supplier, vehicle
+
+def seed_filter_data(db):
+    """Two suppliers and three tested vehicles with distinct numbers, bills, dates and results."""
+    abc = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    xyz = models.Supplier(supplier_name="XYZ Suppliers", state="Karnataka", city="Bangalore")
+    rows = [
+        ("MH12AB1234", abc, "INV-100", datetime(2025, 10, 1, 8), 11.0, 12.5, 350),
+        ("MH14CD5678", abc, "INV-101", datetime(2025, 10, 2, 8), 13.5, 10.0, 250),
+        ("KA01EF9012", xyz, "BILL_7", datetime(2025, 10, 3, 8), 12.0, 11.5, 300),
+    ]
+    for number, supplier, bill_no, arrival, moisture, protein, falling_number in rows:
+        vehicle = models.VehicleEntry(vehicle_number=number, supplier=supplier, bill_no=bill_no, arrival_time=arrival)
+        db.add(models.LabTest(vehicle_entry=vehicle, moisture=moisture, protein_percent=protein, falling_number=falling_number))
+    db.commit()
+    return abc, xyz
+
+def seed_unshared_lab_tests(db, count):
+    """Give every lab test its own vehicle and supplier, the worst case for lazy loading."""
+    for i in range(count):
+        supplier = models.Supplier(supplier_name=f"Supplier {i}", state="Maharashtra", city="Pune")
+        vehicle = models.VehicleEntry(vehicle_number=f"MH12AB{i:04d}", supplier=supplier, bill_no=f"B{i}")
+        db.add(models.LabTest(vehicle_entry=vehicle, moisture=11.5, protein_percent=12.0))
+    db.commit()
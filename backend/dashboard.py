@@ -0,0 +1,82 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import pagination
+import queries
+from cache import TTLCache
+
+# The dashboard tolerates slightly stale numbers, so every client polling it shares one query per TTL
+DASHBOARD_CACHE_TTL_SECONDS = float(os.getenv("DASHBOARD_CACHE_TTL_SECONDS", "30"))
+# Average quality figures cover lab tests from the last DASHBOARD_QUALITY_DAYS days
+DASHBOARD_QUALITY_DAYS = int(os.getenv("DASHBOARD_QUALITY_DAYS", "30"))
+DASHBOARD_RECENT_LIMIT = 5
+
+summary_cache = TTLCache("dashboard", maxsize=1, ttl=DASHBOARD_CACHE_TTL_SECONDS)
+
+QUALITY_FIELDS = ("moisture", "protein_percent", "falling_number", "total_impurities", "total_dockage")
+
+def _count(model, *criteria):
+    return select(func.count()).select_from(model).where(*criteria).scalar_subquery()
+
+def summary_statement(now: datetime):
+    """All dashboard counters and averages as scalar subqueries of a single SELECT."""
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    tested = exists().where(models.LabTest.vehicle_entry_id == models.VehicleEntry.id)
+    quality_since = models.LabTest.test_date >= now - timedelta(days=DASHBOARD_QUALITY_DAYS)
+    averages = [
+        select(func.avg(getattr(models.LabTest, field))).where(quality_since).scalar_subquery().label(field)
+        for field in QUALITY_FIELDS
+    ]
+    return select(
+        _count(models.Supplier).label("suppliers"),
+        _count(models.VehicleEntry).label("vehicle_entries"),
+        _count(models.LabTest).label("lab_tests"),
+        _count(models.VehicleEntry, models.VehicleEntry.arrival_time >= today).label("arrivals_today"),
+        _count(models.VehicleEntry, ~tested).label("pending_lab_tests"),
+        _count(models.LabTest, quality_since).label("quality_sample_size"),
+        *averages,
+    )
+
+def recent_arrivals_statement():
+    tested = exists().where(models.LabTest.vehicle_entry_id == models.VehicleEntry.id)
+    return (
+        select(
+            models.VehicleEntry.id,
+            models.VehicleEntry.vehicle_number,
+            models.Supplier.supplier_name,
+            models.VehicleEntry.arrival_time,
+            tested.label("lab_tested"),
+        )
+        .join(models.VehicleEntry.supplier)
+        .order_by(*pagination.descending(queries.VEHICLE_ENTRY_ORDER))
+        .limit(DASHBOARD_RECENT_LIMIT)
+    )
+
+async def get_summary(db: AsyncSession) -> dict:
+    summary = summary_cache.get("summary")
+    if summary is not None:
+        return summary
+
+    now = datetime.utcnow()
+    row = (await db.execute(summary_statement(now))).one()._mapping
+    recent = (await db.execute(recent_arrivals_statement())).all()
+    summary = {
+        "suppliers": row["suppliers"],
+        "vehicle_entries": row["vehicle_entries"],
+        "lab_tests": row["lab_tests"],
+        "arrivals_today": row["arrivals_today"],
+        "pending_lab_tests": row["pending_lab_tests"],
+        "quality": {
+            "days": DASHBOARD_QUALITY_DAYS,
+            "sample_size": row["quality_sample_size"],
+            **{field: row[field] for field in QUALITY_FIELDS},
+        },
+        "recent_arrivals": [dict(arrival._mapping) for arrival in recent],
+        "generated_at": now,
+    }
+    summary_cache.set("summary", summary)
+    return summary
@@ -1,17 +1,179 @@
+import logging
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://localhost/gateentry")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_recycle=300)
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, "1" if default else "0").strip().lower() in ("1", "true", "yes", "on")
+
+# Each engine (sync and async) of each worker gets its own pool
+ENGINES_PER_WORKER = 2
+
+def pool_limits(max_connections: int, workers: int) -> tuple:
+    """(pool_size, max_overflow) for one engine, so all workers' pools together stay within `max_connections`.
+
+    Capped at 10 + 20, which a single process never needs to exceed.
+    """
+    per_engine = max_connections // (max(workers, 1) * ENGINES_PER_WORKER)
+    pool_size = min(max(per_engine // 2, 1), 10)
+    return pool_size, min(max(per_engine - pool_size, 0), 20)
+
+# Connections all workers together may open; PostgreSQL's default max_connections is 100,
+# and the rest is left for migrations, scripts and psql
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+# gunicorn.conf.py exports its worker count here before forking
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+_pool_size, _max_overflow = pool_limits(DB_MAX_CONNECTIONS, WEB_CONCURRENCY)
+# Connection pool sizing per engine, derived from the budget above unless set explicitly
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(_pool_size)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", str(_max_overflow)))
+# Seconds a request waits for a free connection before failing with 503
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "300"))
+# pre_ping costs a SELECT 1 per checkout; DB_POOL_RECYCLE alone covers idle-timeout disconnects
+DB_POOL_PRE_PING = _env_flag("DB_POOL_PRE_PING", True)
+# Behind PgBouncer in transaction mode: no client-side pool and no server-side prepared statements
+DB_PGBOUNCER = _env_flag("DB_PGBOUNCER", False)
+
+if not DB_PGBOUNCER and WEB_CONCURRENCY * ENGINES_PER_WORKER * (DB_POOL_SIZE + DB_MAX_OVERFLOW) > DB_MAX_CONNECTIONS:
+    logger.warning(
+        "%d workers with pools of %d + %d connections per engine can open more than DB_MAX_CONNECTIONS=%d",
+        WEB_CONCURRENCY, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_MAX_CONNECTIONS,
+    )
+
+def async_database_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver: asyncpg for PostgreSQL, aiosqlite for SQLite."""
+    url = make_url(url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+        if "sslmode" in url.query:
+            # asyncpg spells libpq's sslmode as ssl
+            url = url.update_query_dict({"ssl": url.query["sslmode"]}).difference_update_query(["sslmode"])
+    elif url.get_backend_name() == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    return url.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+
+class PoolStats:
+    """Counters for connection checkouts: how many, how long they waited, how many timed out."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds_total = 0.0
+            self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "wait_seconds_avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+            }
+
+class _TimedPoolMixin:
+    """Times every checkout, including waits for a free slot and opening new connections."""
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, timed_out=True)
+            logger.warning("Connection pool exhausted: %s", self.status())
+            raise
+        self.stats.record(time.perf_counter() - start)
+        return record
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    stats = PoolStats()
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = PoolStats()
+
+def engine_options(url: str, pool_class) -> dict:
+    """create_engine() keyword arguments for `url` from the DB_POOL_* / DB_PGBOUNCER settings."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection; keep SQLAlchemy's default pool for it
+        return {}
+    if DB_PGBOUNCER:
+        options = {"poolclass": NullPool}
+        if url.get_driver_name() == "asyncpg":
+            # Transaction-mode PgBouncer can hand each statement a different server connection
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    return {
+        "poolclass": pool_class,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+# Sync engine: photo upload/streaming handlers, the image workers, Alembic and CLI scripts
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Async engine: every other request handler, so DB waits never block the event loop
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
+def pool_status(pool) -> dict:
+    """Current occupancy of a connection pool plus its checkout counters."""
+    if not isinstance(pool, QueuePool):
+        return {"pool": type(pool).__name__}
+    status = {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "timeout_seconds": pool.timeout(),
+    }
+    if isinstance(pool, _TimedPoolMixin):
+        status.update(pool.stats.snapshot())
+    return status
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
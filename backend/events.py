@@ -0,0 +1,264 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+
+from database import ASYNC_DATABASE_URL, engine
+
+logger = logging.getLogger(__name__)
+
+# "local" delivers events within this process; "postgres" fans them out to every worker via LISTEN/NOTIFY
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "local")
+# Recent events kept per process for clients resuming with ?since=
+EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", "1000"))
+# Undelivered events per subscriber before a slow client is disconnected; it resumes from its last seq
+EVENT_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("EVENT_SUBSCRIBER_QUEUE_SIZE", "256"))
+EVENT_KEEPALIVE_SECONDS = float(os.getenv("EVENT_KEEPALIVE_SECONDS", "15"))
+# How long an event arriving ahead of a missing seq is held back before the gap is given up on.
+# Gaps come from workers whose NOTIFYs cross in flight, and from publishes that failed after taking a seq.
+EVENT_GAP_TIMEOUT_SECONDS = float(os.getenv("EVENT_GAP_TIMEOUT_SECONDS", "2"))
+
+VEHICLE_ENTRY_CREATED = "vehicle_entry.created"
+LAB_TEST_CREATED = "lab_test.created"
+SUPPLIER_UPDATED = "supplier.updated"
+# Sent instead of a backlog when the requested sequence number is no longer buffered
+RESET = "reset"
+
+class Subscription:
+    """One connected client: a bounded queue filled from any thread, drained on the client's event loop."""
+
+    def __init__(self, types: Optional[Set[str]]):
+        self.types = types
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def wants(self, event: dict) -> bool:
+        return self.types is None or event["type"] in self.types
+
+    def _put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The reader notices on its next get and closes; the client resumes from its last seq
+            self.overflowed = True
+
+    def deliver(self, event: dict):
+        if self.wants(event):
+            self.loop.call_soon_threadsafe(self._put, event)
+
+class EventBroker:
+    """Buffers recent events and hands each new one to every subscriber in this process, in seq order.
+
+    Events can arrive out of order when several workers publish at once. One that arrives ahead
+    of a missing seq waits up to EVENT_GAP_TIMEOUT_SECONDS for the gap to fill; after that the
+    missing seqs are skipped, and an event turning up later still is dropped.
+    """
+
+    def __init__(self, backend, buffer_size: int = EVENT_BUFFER_SIZE, gap_timeout: float = EVENT_GAP_TIMEOUT_SECONDS):
+        self.backend = backend
+        self.gap_timeout = gap_timeout
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        # Events waiting for a lower seq, by seq
+        self._pending: Dict[int, dict] = {}
+        self._gap_timer: Optional[threading.Timer] = None
+        # The newest seq dispatched; everything up to it has been delivered or skipped
+        self.last_seq = 0
+        backend.broker = self
+
+    def publish(self, type: str, data):
+        """Publish an event; safe to call from request handlers on the event loop or the threadpool."""
+        self.backend.publish(type, jsonable_encoder(data))
+
+    def dispatch(self, event: dict):
+        """Called by the backend once an event has its sequence number, from any thread."""
+        with self._lock:
+            if event["seq"] <= self.last_seq or event["seq"] in self._pending:
+                logger.warning("Dropping event %s, which arrived after its seq was passed", event["seq"])
+                return
+            self._pending[event["seq"]] = event
+            self._drain()
+
+    def _drain(self):
+        # Called with the lock held. Delivering under it keeps every subscriber's queue in seq order.
+        while self.last_seq + 1 in self._pending:
+            event = self._pending.pop(self.last_seq + 1)
+            self._buffer.append(event)
+            self.last_seq = event["seq"]
+            for subscription in self._subscribers:
+                subscription.deliver(event)
+        if self._gap_timer is not None:
+            self._gap_timer.cancel()
+            self._gap_timer = None
+        if self._pending:
+            self._gap_timer = threading.Timer(self.gap_timeout, self._skip_gap)
+            self._gap_timer.daemon = True
+            self._gap_timer.start()
+
+    def _skip_gap(self):
+        with self._lock:
+            if self._pending:
+                first = min(self._pending)
+                logger.warning("Skipping events %s..%s that never arrived", self.last_seq + 1, first - 1)
+                self.last_seq = first - 1
+                self._drain()
+
+    def subscribe(self, since: Optional[int] = None, types: Optional[Iterable[str]] = None):
+        """Register a subscriber and return it with the buffered events after `since`.
+
+        The backlog is None when events after `since` have already left the buffer (or the
+        sequence is from before a restart); the client should then reload its lists.
+        """
+        subscription = Subscription(set(types) if types else None)
+        with self._lock:
+            self._subscribers.add(subscription)
+            backlog: Optional[List[dict]] = []
+            if since is not None:
+                oldest = self._buffer[0]["seq"] if self._buffer else self.last_seq + 1
+                if since > self.last_seq or since < oldest - 1:
+                    backlog = None
+                else:
+                    backlog = [event for event in self._buffer if event["seq"] > since and subscription.wants(event)]
+        return subscription, backlog
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    async def stream(self, since: Optional[int] = None, types: Optional[Iterable[str]] = None) -> AsyncIterator[Optional[dict]]:
+        """Yield the backlog, then live events, as they arrive. Yields None when idle for the keepalive interval."""
+        subscription, backlog = self.subscribe(since, types)
+        try:
+            last = since or 0
+            if backlog is None:
+                yield {"seq": self.last_seq, "type": RESET, "data": None}
+                last = self.last_seq
+            for event in backlog or ():
+                last = event["seq"]
+                yield event
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if subscription.overflowed:
+                    return
+                # Events already sent from the backlog can also arrive through the queue; live ones come in seq order
+                if event["seq"] > last:
+                    last = event["seq"]
+                    yield event
+        finally:
+            self.unsubscribe(subscription)
+
+    async def start(self):
+        await self.backend.start()
+
+    async def stop(self):
+        with self._lock:
+            if self._gap_timer is not None:
+                self._gap_timer.cancel()
+                self._gap_timer = None
+        await self.backend.stop()
+
+class LocalEventBackend:
+    """Numbers and delivers events inside one process. Suits a single worker and the tests."""
+    broker: EventBroker
+
+    def __init__(self):
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, type: str, data):
+        with self._lock:
+            self._seq += 1
+            event = {"seq": self._seq, "type": type, "data": data, "at": datetime.utcnow().isoformat()}
+            self.broker.dispatch(event)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class PostgresEventBackend:
+    """Numbers events with a PostgreSQL sequence and delivers them to every worker with LISTEN/NOTIFY.
+
+    Each worker numbers its events in its own transaction, so notifications from different
+    workers can arrive out of seq order; the broker puts them back in order.
+    """
+    broker: EventBroker
+    channel = "gate_events"
+    # NOTIFY payloads are capped at 8000 bytes; larger events are sent as their id only
+    max_payload = 7900
+
+    def __init__(self, async_url: str):
+        # asyncpg takes a plain postgresql:// DSN
+        self.dsn = make_url(async_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._connection = None
+        # NOTIFY runs off the event loop, one at a time so this worker's events keep their order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="event-notify")
+
+    def _notify(self, type: str, data):
+        payload = json.dumps(data)
+        if len(payload) > self.max_payload:
+            payload = json.dumps({"id": data.get("id"), "truncated": True})
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    text(
+                        "SELECT pg_notify(:channel, json_build_object("
+                        "'seq', nextval('gate_event_seq'), 'type', :type, 'at', :at, 'data', CAST(:data AS json))::text)"
+                    ),
+                    {"channel": self.channel, "type": type, "at": datetime.utcnow().isoformat(), "data": payload},
+                )
+        except Exception:
+            logger.exception("Failed to publish %s event", type)
+
+    def publish(self, type: str, data):
+        self._executor.submit(self._notify, type, data)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.broker.dispatch(json.loads(payload))
+
+    async def start(self):
+        import asyncpg
+
+        self._connection = await asyncpg.connect(self.dsn)
+        self.broker.last_seq = await self._connection.fetchval(
+            "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM gate_event_seq"
+        )
+        await self._connection.add_listener(self.channel, self._on_notify)
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+def _make_backend(name: str):
+    if name == "local":
+        return LocalEventBackend()
+    if name == "postgres":
+        return PostgresEventBackend(ASYNC_DATABASE_URL)
+    raise RuntimeError(f"Unknown EVENT_BACKEND: {name}")
+
+broker = EventBroker(_make_backend(EVENT_BACKEND))
+
+def publish(type: str, data):
+    broker.publish(type, data)
+
+def sse_message(event: Optional[dict]) -> str:
+    if event is None:
+        return ": keepalive\n\n"
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,162 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date, datetime
+from typing import Iterator, List, Tuple
+
+import orjson
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy import select
+
+import models
+import pagination
+import queries
+import schemas
+from database import SessionLocal
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_YIELD_PER = int(os.getenv("EXPORT_YIELD_PER", "2000"))
+# Rows encoded before a chunk is handed to the response
+EXPORT_ROWS_PER_CHUNK = 500
+EXPORT_CHUNK_SIZE = 256 * 1024
+# Excel's row limit, header included; longer exports continue on another sheet
+XLSX_MAX_ROWS = 1_048_576
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+_LAB_RESULT_FIELDS = [name for name in schemas.LabTestBase.model_fields if name != "vehicle_entry_id"]
+
+# (header, column) per exported column; suppliers and vehicles are joined in, never lazy loaded
+VEHICLE_ENTRY_COLUMNS = [
+    ("id", models.VehicleEntry.id),
+    ("vehicle_number", models.VehicleEntry.vehicle_number),
+    ("supplier_id", models.VehicleEntry.supplier_id),
+    ("supplier_name", models.Supplier.supplier_name),
+    ("bill_no", models.VehicleEntry.bill_no),
+    ("driver_name", models.VehicleEntry.driver_name),
+    ("driver_phone", models.VehicleEntry.driver_phone),
+    ("arrival_time", models.VehicleEntry.arrival_time),
+    ("notes", models.VehicleEntry.notes),
+    ("created_at", models.VehicleEntry.created_at),
+]
+
+LAB_TEST_COLUMNS = [
+    ("id", models.LabTest.id),
+    ("vehicle_entry_id", models.LabTest.vehicle_entry_id),
+    ("vehicle_number", models.VehicleEntry.vehicle_number),
+    ("bill_no", models.VehicleEntry.bill_no),
+    ("arrival_time", models.VehicleEntry.arrival_time),
+    ("supplier_id", models.Supplier.id),
+    ("supplier_name", models.Supplier.supplier_name),
+    *[(name, getattr(models.LabTest, name)) for name in _LAB_RESULT_FIELDS],
+    ("grade", models.LabTest.grade),
+    ("deduction_percent", models.LabTest.deduction_percent),
+    ("is_rejected", models.LabTest.is_rejected),
+    ("rejection_reasons", models.LabTest.rejection_reasons),
+    ("created_at", models.LabTest.created_at),
+]
+
+def vehicle_entries_statement(filters: schemas.VehicleEntryFilters):
+    stmt = select(*[column for _, column in VEHICLE_ENTRY_COLUMNS]).join(models.VehicleEntry.supplier)
+    stmt = queries.filter_vehicle_entries(stmt, filters)
+    return stmt.order_by(*pagination.descending(queries.VEHICLE_ENTRY_ORDER))
+
+def lab_tests_statement(filters: schemas.LabTestFilters):
+    stmt = (
+        select(*[column for _, column in LAB_TEST_COLUMNS])
+        .join(models.LabTest.vehicle_entry)
+        .join(models.VehicleEntry.supplier)
+    )
+    stmt = queries.filter_lab_tests(stmt, filters)
+    return stmt.order_by(*pagination.descending(queries.LAB_TEST_ORDER))
+
+def iter_rows(stmt) -> Iterator[Tuple]:
+    """Stream result rows through a server-side cursor, EXPORT_YIELD_PER rows at a time.
+
+    The generator owns its session so the connection is returned as soon as the export
+    finishes or the client disconnects.
+    """
+    with SessionLocal() as db:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_YIELD_PER))
+        try:
+            for row in result:
+                yield tuple(row)
+        finally:
+            result.close()
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def write_csv(headers: List[str], rows: Iterator[Tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The BOM lets Excel open the file as UTF-8
+    buffer.write("\ufeff")
+    writer.writerow(headers)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % EXPORT_ROWS_PER_CHUNK == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def write_ndjson(headers: List[str], rows: Iterator[Tuple]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        # orjson writes dates and datetimes in ISO 8601 itself, several times faster than json.dumps
+        lines.append(orjson.dumps(dict(zip(headers, row))))
+        if len(lines) == EXPORT_ROWS_PER_CHUNK:
+            yield b"\n".join(lines) + b"\n"
+            lines = []
+    if lines:
+        yield b"\n".join(lines) + b"\n"
+
+def write_xlsx(headers: List[str], rows: Iterator[Tuple]) -> Iterator[bytes]:
+    """Build the workbook in openpyxl's write-only mode, which keeps rows on disk, then stream the file.
+
+    XLSX is a zip archive whose index is written last, so nothing can be sent before every row is read.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = None
+    sheet_rows = XLSX_MAX_ROWS
+    for row in rows:
+        if sheet_rows == XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet(f"Sheet{len(workbook.worksheets) + 1}")
+            sheet.append(headers)
+            sheet_rows = 1
+        sheet.append(row)
+        sheet_rows += 1
+    if sheet is None:
+        workbook.create_sheet("Sheet1").append(headers)
+
+    with tempfile.TemporaryFile() as f:
+        workbook.save(f)
+        f.seek(0)
+        while chunk := f.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+
+WRITERS = {
+    "csv": write_csv,
+    "ndjson": write_ndjson,
+    "xlsx": write_xlsx,
+}
+
+def export_response(name: str, columns, stmt, format: str) -> StreamingResponse:
+    headers = [header for header, _ in columns]
+    filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        WRITERS[format](headers, iter_rows(stmt)),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
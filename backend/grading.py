@@ -0,0 +1,261 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, select, update
+from sqlalchemy.orm import Session
+
+import analytics
+import models
+from cache import TTLCache
+
+REGRADE_CHUNK_SIZE = int(os.getenv("REGRADE_CHUNK_SIZE", "20000"))
+# Rows per regrade UPDATE and transaction. Each is stamped just before it runs, so it commits
+# well inside sync's SYNC_SETTLE_SECONDS of its updated_at and no client's watermark passes it.
+REGRADE_COMMIT_SIZE = int(os.getenv("REGRADE_COMMIT_SIZE", "1000"))
+
+REJECTED = "REJECTED"
+OFF_GRADE = "OFF-GRADE"
+
+# Totals are the sum of their components whenever any component was measured
+TOTALS = {
+    "total_impurities": ("chaff_husk", "straws_sticks", "other_foreign_matter", "mudballs", "stones", "dust_sand"),
+    "total_dockage": ("shriveled_wheat", "insect_damage", "blackened_wheat", "sprouted_grains", "other_grain_damage"),
+}
+MEASUREMENTS = (
+    "moisture", "test_weight", "protein_percent", "wet_gluten", "dry_gluten", "falling_number",
+    *[part for parts in TOTALS.values() for part in parts], *TOTALS,
+)
+RESULT_FIELDS = ("total_impurities", "total_dockage", "grade", "deduction_percent", "is_rejected", "rejection_reasons")
+
+# Used until an admin saves specs of their own through PUT /api/grading/specs
+DEFAULT_GRADE_SPECS = [
+    # (grade, rank, parameter, min_value, max_value)
+    ("A", 1, "moisture", None, 11.0),
+    ("A", 1, "test_weight", 78.0, None),
+    ("A", 1, "protein_percent", 12.0, None),
+    ("A", 1, "falling_number", 300, None),
+    ("A", 1, "total_impurities", None, 1.0),
+    ("A", 1, "total_dockage", None, 2.0),
+    ("B", 2, "moisture", None, 12.0),
+    ("B", 2, "test_weight", 76.0, None),
+    ("B", 2, "protein_percent", 11.0, None),
+    ("B", 2, "falling_number", 250, None),
+    ("B", 2, "total_impurities", None, 2.0),
+    ("B", 2, "total_dockage", None, 4.0),
+    ("C", 3, "moisture", None, 14.0),
+    ("C", 3, "protein_percent", 10.0, None),
+    ("C", 3, "falling_number", 200, None),
+    ("C", 3, "total_impurities", None, 4.0),
+    ("C", 3, "total_dockage", None, 6.0),
+]
+DEFAULT_DEDUCTION_SPECS = [
+    # (parameter, direction, tolerance, rate in % of price per unit, reject_limit)
+    ("moisture", "above", 12.0, 1.0, 16.0),
+    ("test_weight", "below", 76.0, 0.5, 70.0),
+    ("falling_number", "below", 250, 0.05, 150),
+    ("total_impurities", "above", 1.0, 1.0, 6.0),
+    ("total_dockage", "above", 2.0, 0.5, 10.0),
+]
+
+specs_cache = TTLCache("grading_specs", maxsize=1, ttl=float(os.getenv("GRADING_SPECS_CACHE_TTL_SECONDS", "300")))
+
+class Specs:
+    def __init__(self, grade_specs, deduction_specs):
+        grades: Dict[str, Tuple[int, List]] = {}
+        for grade, rank, parameter, min_value, max_value in grade_specs:
+            grades.setdefault(grade, (rank, []))[1].append((parameter, min_value, max_value))
+        # Best grade first, so each test gets the first grade whose limits it meets
+        self.grades = [(grade, limits) for grade, (rank, limits) in sorted(grades.items(), key=lambda item: item[1][0])]
+        self.grade_specs = list(grade_specs)
+        self.deduction_specs = list(deduction_specs)
+        self.limits = self._acceptance_limits()
+
+    def _acceptance_limits(self) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+        """(min, max) per parameter; a result outside them counts as out of spec in the quality rollups.
+
+        That is where deductions start, or for a parameter without a deduction, the limit of
+        the lowest grade that sets one: past it the test can only be OFF-GRADE.
+        """
+        limits = {}
+        for _, grade_limits in self.grades:
+            for parameter, min_value, max_value in grade_limits:
+                limits[parameter] = (min_value, max_value)
+        for parameter, direction, tolerance, _, _ in self.deduction_specs:
+            limits[parameter] = (None, tolerance) if direction == "above" else (tolerance, None)
+        return limits
+
+    def as_dict(self) -> dict:
+        return {
+            "grades": [
+                dict(zip(("grade", "rank", "parameter", "min_value", "max_value"), spec)) for spec in self.grade_specs
+            ],
+            "deductions": [
+                dict(zip(("parameter", "direction", "tolerance", "rate", "reject_limit"), spec)) for spec in self.deduction_specs
+            ],
+        }
+
+def load_specs(db: Session) -> Specs:
+    specs = specs_cache.get("specs")
+    if specs is not None:
+        return specs
+    grade_specs = db.execute(select(
+        models.GradeSpec.grade, models.GradeSpec.rank, models.GradeSpec.parameter,
+        models.GradeSpec.min_value, models.GradeSpec.max_value,
+    ).order_by(models.GradeSpec.rank, models.GradeSpec.parameter)).all()
+    deduction_specs = db.execute(select(
+        models.DeductionSpec.parameter, models.DeductionSpec.direction, models.DeductionSpec.tolerance,
+        models.DeductionSpec.rate, models.DeductionSpec.reject_limit,
+    ).order_by(models.DeductionSpec.parameter)).all()
+    specs = Specs(
+        [tuple(row) for row in grade_specs] or DEFAULT_GRADE_SPECS,
+        [tuple(row) for row in deduction_specs] or DEFAULT_DEDUCTION_SPECS,
+    )
+    specs_cache.set("specs", specs)
+    return specs
+
+def save_specs(db: Session, grade_specs: List[tuple], deduction_specs: List[tuple]) -> Specs:
+    """Replace the stored specs. Existing tests keep their grades until they are regraded.
+
+    The quality rollups are rebuilt, since their out-of-spec counts follow the specs.
+    """
+    db.execute(delete(models.GradeSpec))
+    db.execute(delete(models.DeductionSpec))
+    db.add_all(models.GradeSpec(grade=g, rank=r, parameter=p, min_value=lo, max_value=hi) for g, r, p, lo, hi in grade_specs)
+    db.add_all(
+        models.DeductionSpec(parameter=p, direction=d, tolerance=t, rate=rate, reject_limit=limit)
+        for p, d, t, rate, limit in deduction_specs
+    )
+    db.commit()
+    specs_cache.clear()
+    analytics.rebuild(db)
+    return load_specs(db)
+
+def evaluate(columns: Dict[str, np.ndarray], specs: Specs) -> Dict[str, np.ndarray]:
+    """Grade a batch of tests given one float array per measurement, NaN where it was not measured.
+
+    Every rule is a comparison over whole arrays, so a season costs a few passes per rule instead of
+    a Python loop per test. A missing measurement never fails a grade limit or adds a deduction.
+    """
+    columns = dict(columns)
+    size = len(columns["moisture"])
+    for total, parts in TOTALS.items():
+        values = np.column_stack([columns[part] for part in parts])
+        measured = ~np.isnan(values).all(axis=1)
+        columns[total] = np.where(measured, np.round(np.nansum(values, axis=1), 2), columns[total])
+
+    deduction = np.zeros(size)
+    rejected = np.zeros(size, dtype=bool)
+    reasons = np.full(size, "", dtype=object)
+    for parameter, direction, tolerance, rate, reject_limit in specs.deduction_specs:
+        values = columns[parameter]
+        excess = values - tolerance if direction == "above" else tolerance - values
+        deduction += np.nan_to_num(np.clip(excess, 0, None)) * rate
+        if reject_limit is not None:
+            beyond = values > reject_limit if direction == "above" else values < reject_limit
+            rejected |= beyond
+            reasons[beyond] = reasons[beyond] + f"{parameter}, "
+
+    grades = np.full(size, OFF_GRADE, dtype=object)
+    graded = np.zeros(size, dtype=bool)
+    for grade, limits in specs.grades:
+        meets = np.ones(size, dtype=bool)
+        for parameter, min_value, max_value in limits:
+            values = columns[parameter]
+            # NaN compares False, so an unmeasured parameter passes
+            if min_value is not None:
+                meets &= ~(values < min_value)
+            if max_value is not None:
+                meets &= ~(values > max_value)
+        grades[meets & ~graded] = grade
+        graded |= meets
+    grades[rejected] = REJECTED
+
+    return {
+        "total_impurities": columns["total_impurities"],
+        "total_dockage": columns["total_dockage"],
+        "grade": grades,
+        "deduction_percent": np.round(deduction, 2),
+        "is_rejected": rejected,
+        "rejection_reasons": np.array([reason.rstrip(", ") or None for reason in reasons], dtype=object),
+    }
+
+def _to_python(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+def _arrays(records: List[dict]) -> Dict[str, np.ndarray]:
+    return {name: np.array([record.get(name) for record in records], dtype=float) for name in MEASUREMENTS}
+
+def grade_records(records: List[dict], specs: Specs) -> List[dict]:
+    """Write totals, grade, deduction and rejection into lab test value dicts, in place."""
+    if not records:
+        return records
+    results = evaluate(_arrays(records), specs)
+    now = datetime.utcnow()
+    for index, record in enumerate(records):
+        for field in RESULT_FIELDS:
+            record[field] = _to_python(results[field][index])
+        record["graded_at"] = now
+    return records
+
+def grade_lab_test(lab_test: models.LabTest, specs: Specs):
+    values = {name: getattr(lab_test, name) for name in MEASUREMENTS}
+    [graded] = grade_records([values], specs)
+    for field in (*RESULT_FIELDS, "graded_at"):
+        setattr(lab_test, field, graded[field])
+
+def regrade(db: Session, tested_from: Optional[datetime] = None, tested_to: Optional[datetime] = None) -> int:
+    """Re-grade every lab test in the date range against the current specs with bulk UPDATEs.
+
+    Grades are computed a chunk at a time and written in short transactions of
+    REGRADE_COMMIT_SIZE rows; an interrupted regrade can simply be run again.
+    Supplier quality rollups are refreshed for tests whose totals changed.
+    """
+    specs = load_specs(db)
+    stmt = select(models.LabTest.id, models.LabTest.vehicle_entry_id, models.LabTest.test_date,
+                  *[getattr(models.LabTest, name) for name in MEASUREMENTS])
+    if tested_from:
+        stmt = stmt.where(models.LabTest.test_date >= tested_from)
+    if tested_to:
+        stmt = stmt.where(models.LabTest.test_date <= tested_to)
+
+    rows = db.execute(stmt.order_by(models.LabTest.id)).all()
+    table = models.LabTest.__table__
+    # Core UPDATE ... WHERE id = ? sent as one executemany per transaction
+    update_stmt = (
+        update(table)
+        .where(table.c.id == bindparam("lab_test_id"))
+        .values({field: bindparam(field) for field in (*RESULT_FIELDS, "graded_at", "updated_at")})
+    )
+    changed_totals = []
+    for start in range(0, len(rows), REGRADE_CHUNK_SIZE):
+        chunk = rows[start:start + REGRADE_CHUNK_SIZE]
+        matrix = np.array([row[3:] for row in chunk], dtype=float).reshape(len(chunk), len(MEASUREMENTS))
+        columns = {name: matrix[:, index] for index, name in enumerate(MEASUREMENTS)}
+        results = evaluate(columns, specs)
+
+        moved = np.zeros(len(chunk), dtype=bool)
+        for total in TOTALS:
+            before, after = columns[total], results[total]
+            moved |= ~((before == after) | (np.isnan(before) & np.isnan(after)))
+        changed_totals.extend((chunk[i].vehicle_entry_id, chunk[i].test_date) for i in np.flatnonzero(moved))
+
+        result_lists = {field: results[field].tolist() for field in RESULT_FIELDS}
+        for batch in range(0, len(chunk), REGRADE_COMMIT_SIZE):
+            now = datetime.utcnow()
+            updates = [
+                {
+                    "lab_test_id": chunk[i].id, "graded_at": now, "updated_at": now,
+                    **{field: _to_python(result_lists[field][i]) for field in RESULT_FIELDS},
+                }
+                for i in range(batch, min(batch + REGRADE_COMMIT_SIZE, len(chunk)))
+            ]
+            db.execute(update_stmt, updates)
+            db.commit()
+    analytics.refresh_after_insert(db, changed_totals)
+    return len(rows)
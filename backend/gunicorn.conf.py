@@ -0,0 +1,44 @@
+"""Production server settings: `cd backend && gunicorn main:app` picks this file up.
+
+One uvicorn worker per core. The master runs `alembic upgrade head` once before forking, so
+workers only check the schema. With several workers on PostgreSQL, events, login rate limits
+and cache invalidations default to their shared PostgreSQL backends.
+
+The worker count is exported as WEB_CONCURRENCY, and each worker sizes its two connection pools
+so that all of them together stay within DB_MAX_CONNECTIONS (80).
+"""
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+# database.py divides DB_MAX_CONNECTIONS between the workers by this count
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn_worker.UvicornWorker"
+# Workers import the app themselves, so no engine or connection is ever shared across a fork
+preload_app = False
+
+# A worker that misses heartbeats this long is restarted; a SIGTERM'd one gets graceful_timeout to finish
+timeout = int(os.getenv("WORKER_TIMEOUT_SECONDS", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT_SECONDS", "30"))
+keepalive = int(os.getenv("KEEPALIVE_SECONDS", "5"))
+# Restart each worker after this many requests, staggered, so slow leaks can't accumulate
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+# Proxies whose X-Forwarded-For is trusted; the login rate limit keys on the client IP it yields
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+RUN_MIGRATIONS = os.getenv("RUN_MIGRATIONS", "1").strip().lower() in ("1", "true", "yes", "on")
+
+if workers > 1 and os.getenv("DATABASE_URL", "postgresql://localhost/gateentry").startswith("postgres"):
+    # Set before the workers fork so they inherit it; an explicit setting still wins
+    for name in ("EVENT_BACKEND", "RATE_LIMIT_BACKEND", "CACHE_BACKEND"):
+        os.environ.setdefault(name, "postgres")
+
+def on_starting(server):
+    if RUN_MIGRATIONS:
+        # In a subprocess, so the master never opens a database connection its workers could inherit
+        server.log.info("Running alembic upgrade head")
+        subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+
+from database import async_engine
+
+logger = logging.getLogger(__name__)
+
+# How long a starting worker waits for the database, e.g. when both come up together
+STARTUP_DB_TIMEOUT_SECONDS = float(os.getenv("STARTUP_DB_TIMEOUT_SECONDS", "30"))
+# A readiness probe whose database ping takes longer than this reports the worker unavailable
+READINESS_DB_TIMEOUT_SECONDS = float(os.getenv("READINESS_DB_TIMEOUT_SECONDS", "2"))
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+class State:
+    """Where this worker is in its lifecycle; only a started, non-draining worker is ready."""
+
+    def __init__(self):
+        self.started = False
+        self.draining = False
+        # The newest migration in alembic/versions, read once at startup
+        self.schema_head: Optional[str] = None
+
+state = State()
+
+def alembic_head() -> Optional[str]:
+    return ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_current_head()
+
+def _revision(conn) -> Optional[str]:
+    # A database built without Alembic has no version table; it is not held against readiness
+    if not inspect(conn).has_table("alembic_version"):
+        return None
+    return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+async def schema_revision() -> Optional[str]:
+    async with async_engine.connect() as conn:
+        return await conn.run_sync(_revision)
+
+async def wait_for_database():
+    """Retry until the database answers, with backoff, for up to STARTUP_DB_TIMEOUT_SECONDS."""
+    deadline = asyncio.get_running_loop().time() + STARTUP_DB_TIMEOUT_SECONDS
+    delay = 0.5
+    while True:
+        try:
+            async with async_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            return
+        except Exception as error:
+            if asyncio.get_running_loop().time() + delay > deadline:
+                raise
+            logger.warning("Database not reachable yet (%s), retrying in %.1fs", error, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+
+async def startup():
+    """Wait for the database and check its schema. Schema changes are Alembic's alone."""
+    state.draining = False
+    await wait_for_database()
+    state.schema_head = alembic_head()
+    revision = await schema_revision()
+    if revision is not None and revision != state.schema_head:
+        logger.error("Database schema is at %s but the code expects %s; run `alembic upgrade head`", revision, state.schema_head)
+    state.started = True
+
+def shutdown():
+    state.draining = True
+
+async def readiness() -> dict:
+    """Whether this worker should get traffic: started, not shutting down, database reachable and migrated."""
+    checks = {"started": state.started and not state.draining}
+    try:
+        revision = await asyncio.wait_for(schema_revision(), READINESS_DB_TIMEOUT_SECONDS)
+        checks["database"] = True
+        checks["schema"] = revision is None or revision == state.schema_head
+    except Exception:
+        logger.exception("Readiness check could not reach the database")
+        checks["database"] = False
+    return {"ready": all(checks.values()), "checks": checks}
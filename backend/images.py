@@ -0,0 +1,102 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+import models
+import photos
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Longest side in pixels and JPEG quality for each rendition, largest first so each
+# smaller rendition is resized from the previous one instead of from the full upload
+RENDITIONS = {
+    "original": (2560, 85),
+    "preview": (1280, 80),
+    "thumb": (320, 70),
+}
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-pipeline")
+_pending: Dict[str, Future] = {}
+_pending_lock = threading.Lock()
+
+def render(data: bytes) -> Dict[str, bytes]:
+    """Decode an upload once and encode every rendition as JPEG."""
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        renditions = {}
+        for name, (max_side, quality) in RENDITIONS.items():
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            renditions[name] = buffer.getvalue()
+        return renditions
+
+def generate_renditions(sha256: str):
+    """Store the renditions of one photo. Runs on the worker pool with its own session."""
+    with SessionLocal() as db:
+        photo = photos.get_photo(db, sha256)
+        if photo is None or not photo.content_type.startswith("image/"):
+            return
+        existing = {
+            size for (size,) in db.query(models.PhotoRendition.size).filter(models.PhotoRendition.source_sha256 == sha256)
+        }
+        if existing.issuperset(RENDITIONS):
+            return
+
+        try:
+            renditions = render(photos.read_photo(photo))
+        except (UnidentifiedImageError, OSError):
+            logger.warning("Could not decode photo %s for renditions", sha256)
+            return
+
+        for size, data in renditions.items():
+            if size in existing:
+                continue
+            # Phone JPEGs are often already well compressed; keep the upload when re-encoding doesn't help.
+            # The upload is recorded as its own rendition so the photo counts as done.
+            if size == "original" and len(data) >= photo.size:
+                rendition = photo
+            else:
+                rendition = photos.store_photo(db, data)
+            db.add(models.PhotoRendition(source_sha256=sha256, size=size, photo_sha256=rendition.sha256))
+        db.commit()
+
+def _run(sha256: str):
+    try:
+        generate_renditions(sha256)
+    except Exception:
+        logger.exception("Rendition generation failed for photo %s", sha256)
+
+def _done(sha256: str, future: Future):
+    with _pending_lock:
+        if _pending.get(sha256) is future:
+            del _pending[sha256]
+
+def schedule_renditions(*sha256s: Optional[str]) -> List[Future]:
+    """Queue rendition generation for freshly stored photos without blocking the request.
+
+    A photo that is already queued or in progress shares the existing job.
+    """
+    futures = []
+    for sha256 in dict.fromkeys(sha256s):
+        if not sha256:
+            continue
+        with _pending_lock:
+            future = _pending.get(sha256)
+            is_new = future is None
+            if is_new:
+                future = _executor.submit(_run, sha256)
+                _pending[sha256] = future
+        if is_new:
+            future.add_done_callback(lambda f, sha256=sha256: _done(sha256, f))
+        futures.append(future)
+    return futures
@@ -0,0 +1,34 @@
+import argparse
+import sys
+from database import SessionLocal
+import imports
+
+def import_data(kind, path, format=None, batch_size=imports.IMPORT_BATCH_SIZE):
+    db = SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            report = imports.import_file(db, kind, f, format or imports.detect_format(path), batch_size)
+        print(f"Inserted {report['inserted']} {kind}, {report['failed']} rows failed")
+        for error in report["errors"]:
+            print(f"  row {error['row']}: {'; '.join(error['errors'])}")
+        if report["errors_truncated"]:
+            print(f"  ... only the first {len(report['errors'])} row errors are shown")
+        if report["file_error"]:
+            print(f"  {report['file_error']}")
+        return report
+    except Exception as e:
+        print(f"Error importing {kind}: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import suppliers, vehicle entries or lab tests from CSV or NDJSON")
+    parser.add_argument("kind", choices=sorted(imports.IMPORTERS))
+    parser.add_argument("path", help="CSV file with a header row, or NDJSON with one object per line")
+    parser.add_argument("--format", choices=imports.FORMATS, help="defaults to the file extension (.ndjson/.jsonl, otherwise CSV)")
+    parser.add_argument("--batch-size", type=int, default=imports.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+    report = import_data(args.kind, args.path, args.format, args.batch_size)
+    sys.exit(1 if report["failed"] or report["file_error"] else 0)
@@ -0,0 +1,191 @@
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+import analytics
+import grading
+import models
+import schemas
+
+# Rows per INSERT ... VALUES batch and per transaction
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+# Row errors returned in one report; the failed count still covers every row
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+class Importer:
+    """How one resource is validated and inserted in bulk."""
+
+    def __init__(self, model, schema: type[BaseModel], now_fields=(), foreign_key: Optional[Tuple[str, object]] = None,
+                 prepare=None, after_insert=None):
+        self.model = model
+        self.schema = schema
+        # Columns that default to the import time when a row leaves them blank
+        self.now_fields = now_fields
+        # (field, referenced id column) checked once per batch instead of failing the whole INSERT
+        self.foreign_key = foreign_key
+        # Called with (db, values) to fill in derived columns before each batch is inserted
+        self.prepare = prepare
+        # Called with (db, inserted values) after each committed batch
+        self.after_insert = after_insert
+
+def _grade_lab_tests(db: Session, rows: List[dict]):
+    grading.grade_records(rows, grading.load_specs(db))
+
+def _refresh_quality_rollups(db: Session, rows: List[dict]):
+    analytics.refresh_after_insert(db, [(values["vehicle_entry_id"], values["test_date"]) for values in rows])
+
+IMPORTERS = {
+    "suppliers": Importer(models.Supplier, schemas.SupplierCreate),
+    "vehicles": Importer(
+        models.VehicleEntry, schemas.VehicleEntryCreate,
+        now_fields=("arrival_time",), foreign_key=("supplier_id", models.Supplier.id),
+    ),
+    "lab-tests": Importer(
+        models.LabTest, schemas.LabTestCreate,
+        now_fields=("test_date",), foreign_key=("vehicle_entry_id", models.VehicleEntry.id),
+        prepare=_grade_lab_tests, after_insert=_refresh_quality_rollups,
+    ),
+}
+
+class FileError(Exception):
+    """The upload stops being readable part way through: bad encoding or broken CSV structure."""
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return "csv"
+
+def iter_records(fileobj: BinaryIO, format: str) -> Iterator[Tuple[dict, Optional[str]]]:
+    """Yield (record, parse error) per data row of a CSV or NDJSON byte stream without reading it all.
+
+    Raises FileError when the rest of the stream cannot be read.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    try:
+        yield from _iter_text_records(text, format)
+    except UnicodeDecodeError:
+        raise FileError("the file is not UTF-8 text")
+    except csv.Error as e:
+        raise FileError(f"malformed CSV ({e})")
+    finally:
+        # Leave the underlying upload open for its owner to close
+        text.detach()
+
+def _iter_text_records(text, format: str) -> Iterator[Tuple[dict, Optional[str]]]:
+    if format == "csv":
+        for record in csv.DictReader(text):
+            # Blank CSV cells mean "not provided", like a missing JSON key
+            yield {key: value for key, value in record.items() if key and value not in ("", None)}, None
+    elif format == "ndjson":
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {}, f"Invalid JSON: {e.msg}"
+                continue
+            if not isinstance(record, dict):
+                yield {}, "Each line must be a JSON object"
+                continue
+            yield record, None
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {format}")
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()]
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        self.file_error: Optional[str] = None
+
+    def fail(self, row: int, messages: List[str]):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "errors": messages})
+
+    def as_dict(self) -> dict:
+        return {
+            "inserted": self.inserted,
+            "failed": self.failed,
+            # Foreign key failures are found per batch, after later rows' parse errors
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.failed > len(self.errors),
+            "file_error": self.file_error,
+        }
+
+def _flush_batch(db: Session, importer: Importer, batch: List[Tuple[int, dict]], report: ImportReport):
+    if importer.foreign_key:
+        field, column = importer.foreign_key
+        ids = {values[field] for _, values in batch}
+        existing = set(db.scalars(select(column).where(column.in_(ids))))
+        missing = [(row, values) for row, values in batch if values[field] not in existing]
+        for row, values in missing:
+            report.fail(row, [f"{field}: {values[field]} does not exist"])
+        batch = [(row, values) for row, values in batch if values[field] in existing]
+    if batch and importer.prepare:
+        importer.prepare(db, [values for _, values in batch])
+    if batch:
+        # Stamped just before the INSERT, so each batch commits right after its updated_at and
+        # sync's watermark cannot pass it
+        now = datetime.utcnow()
+        for _, values in batch:
+            values["created_at"] = values["updated_at"] = now
+        # One executemany per batch; SQLAlchemy sends it as multi-row INSERT ... VALUES
+        db.execute(insert(importer.model), [values for _, values in batch])
+    db.commit()
+    report.inserted += len(batch)
+    if batch and importer.after_insert:
+        importer.after_insert(db, [values for _, values in batch])
+
+def import_records(db: Session, kind: str, records, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Validate records with the resource's Create schema and insert the valid ones in batches.
+
+    `records` yields (record, parse error) pairs, as iter_records does. Each batch is its own
+    transaction, so rows in earlier batches stay inserted if a later one fails. When the file
+    cannot be read to the end, the rows read so far are imported and `file_error` says where it stopped.
+    """
+    importer = IMPORTERS[kind]
+    report = ImportReport()
+    batch: List[Tuple[int, dict]] = []
+    now = datetime.utcnow()
+    row = 0
+    try:
+        for row, (record, parse_error) in enumerate(records, start=1):
+            if parse_error:
+                report.fail(row, [parse_error])
+                continue
+            try:
+                values = importer.schema.model_validate(record).model_dump()
+            except ValidationError as e:
+                report.fail(row, _validation_messages(e))
+                continue
+            for field in importer.now_fields:
+                if values[field] is None:
+                    values[field] = now
+            batch.append((row, values))
+            if len(batch) >= batch_size:
+                _flush_batch(db, importer, batch, report)
+                batch = []
+    except FileError as e:
+        report.file_error = f"Stopped reading after row {row}: {e}. Later rows were not imported"
+    if batch:
+        _flush_batch(db, importer, batch, report)
+    return report.as_dict()
+
+def import_file(db: Session, kind: str, fileobj: BinaryIO, format: str, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    return import_records(db, kind, iter_records(fileobj, format), batch_size)
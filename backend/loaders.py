@@ -0,0 +1,120 @@
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+import queries
+from database import get_async_db
+
+# Ids one batch request may ask for
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", "500"))
+# Ids per IN (...) list; larger batches are split to stay within bind parameter limits
+IN_CHUNK_SIZE = 500
+
+class DataLoader:
+    """Coalesces load() calls made in the same event loop tick into one `batch_load(keys)` call.
+
+    Results are cached per key for the loader's lifetime, which is one request, so a row that
+    many others refer to is fetched once. `batch_load` returns {key: value}; missing keys load as None.
+    """
+
+    def __init__(self, batch_load: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]):
+        self.batch_load = batch_load
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self, key: Hashable) -> "asyncio.Future[Optional[Any]]":
+        future = self._futures.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._futures[key] = loop.create_future()
+            if not self._queue:
+                # Dispatch once the callers that are ready now have all had their turn
+                loop.call_soon(self._schedule)
+            self._queue.append(key)
+        return future
+
+    async def load_many(self, keys: List[Hashable]) -> List[Optional[Any]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def prime(self, key: Hashable, value: Any):
+        """Seed the cache with a row that arrived some other way, e.g. joined to another one."""
+        if key not in self._futures:
+            future = self._futures[key] = asyncio.get_running_loop().create_future()
+            future.set_result(value)
+
+    def _schedule(self):
+        # Held so the task can't be garbage collected before it runs
+        self._task = asyncio.get_running_loop().create_task(self._dispatch())
+
+    async def _dispatch(self):
+        keys, self._queue = self._queue, []
+        try:
+            found = await self.batch_load(keys)
+        except Exception as error:
+            for key in keys:
+                # Forget the failure so a later load can try again
+                self._futures.pop(key).set_exception(error)
+            return
+        for key in keys:
+            self._futures[key].set_result(found.get(key))
+
+class Loaders:
+    """The loaders for one request, sharing its session.
+
+    Vehicle entries and lab tests are loaded with their related rows joined, as the list
+    endpoints do; those rows are primed into the other loaders so looking them up costs nothing.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        # An AsyncSession runs one statement at a time; loaders dispatching in the same tick take turns
+        self._lock = asyncio.Lock()
+        self.suppliers = DataLoader(self._batch(queries.suppliers, models.Supplier))
+        self.vehicle_entries = DataLoader(self._batch(queries.vehicle_entries, models.VehicleEntry, self._prime_vehicle_entry))
+        self.lab_tests = DataLoader(self._batch(queries.lab_tests, models.LabTest, self._prime_lab_test))
+
+    def _batch(self, query, model, prime=None):
+        async def batch_load(ids: List[int]) -> dict:
+            rows = []
+            async with self._lock:
+                for start in range(0, len(ids), IN_CHUNK_SIZE):
+                    chunk = ids[start:start + IN_CHUNK_SIZE]
+                    rows += (await self.db.scalars(query().where(model.id.in_(chunk)))).unique().all()
+            for row in rows:
+                if prime:
+                    prime(row)
+            return {row.id: row for row in rows}
+        return batch_load
+
+    def _prime_vehicle_entry(self, vehicle: models.VehicleEntry):
+        if vehicle.supplier is not None:
+            self.suppliers.prime(vehicle.supplier.id, vehicle.supplier)
+
+    def _prime_lab_test(self, lab_test: models.LabTest):
+        self.vehicle_entries.prime(lab_test.vehicle_entry.id, lab_test.vehicle_entry)
+        self._prime_vehicle_entry(lab_test.vehicle_entry)
+
+async def get_loaders(db: AsyncSession = Depends(get_async_db)) -> Loaders:
+    """FastAPI caches dependencies per request, so every Depends(get_loaders) in one request shares these."""
+    return Loaders(db)
+
+def check_ids(ids: List[int]) -> List[int]:
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    return ids
+
+def parse_ids(ids: str) -> List[int]:
+    """The ids of a `?ids=1,2,3` query parameter."""
+    try:
+        return check_ids([int(part) for part in ids.split(",") if part.strip()])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+
+async def found(loader: DataLoader, ids: List[int]) -> list:
+    """The rows with `ids`, in the order asked for, skipping ids that don't exist."""
+    return [row for row in await loader.load_many(ids) if row is not None]
@@ -1,19 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form
+from collections import Counter
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, HTTPException, UploadFile, File, Form, Header, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import exc, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Optional
-import base64
-from datetime import datetime, timedelta
+from typing import List, Literal, Optional, Union
+import os
+import time
+from datetime import date, datetime, timedelta
 
-from database import engine, get_db, Base
+from database import engine, async_engine, AsyncSessionLocal, get_db, get_async_db, pool_status
+from cache import caches, invalidations
 import models
 import schemas
 import auth
+import photos
+import images
+import queries
+import pagination
+import imports
+import exports
+import dashboard
+import analytics
+import grading
+import events
+import sync
+import serialization
+import metrics
+import ratelimit
+import health
+import loaders
+from compression import CompressionMiddleware
 
-Base.metadata.create_all(bind=engine)
+# The schema is managed by Alembic only (`alembic upgrade head`); gunicorn.conf.py runs it before forking workers
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await health.startup()
+    await events.broker.start()
+    await invalidations.start()
+    yield
+    health.shutdown()
+    await invalidations.stop()
+    await events.broker.stop()
 
-app = FastAPI(title="Gate Entry & Lab Testing API")
+# FastAPI validates response models into plain dicts and lists and then renders them with the
+# response class; orjson renders the large list pages several times faster than json.dumps
+app = FastAPI(title="Gate Entry & Lab Testing API", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,22 +56,39 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+# Added last so it is outermost and its timings include compression
+app.add_middleware(metrics.InstrumentationMiddleware)
+metrics.instrument_engine(engine)
+metrics.instrument_engine(async_engine.sync_engine)
+
+# Optional bearer token for /metrics, for scrapers on an untrusted network
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+@app.exception_handler(exc.TimeoutError)
+async def pool_timeout_handler(request: Request, error: exc.TimeoutError):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT seconds; shed load instead of a 500
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
 
 @app.get("/")
 def read_root():
     return {"message": "Gate Entry & Lab Testing API", "status": "running"}
 
 @app.post("/api/auth/register", response_model=schemas.User)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User.id).where(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_user_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user_email = await db.scalar(select(models.User.id).where(models.User.email == user.email))
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -46,44 +97,81 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
         role="user"
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 @app.post("/api/auth/login", response_model=schemas.Token)
-def login(login_data: schemas.LoginRequest, db: Session = Depends(get_db)):
-    user = auth.authenticate_user(db, login_data.username, login_data.password)
+async def login(request: Request, login_data: schemas.LoginRequest, db: AsyncSession = Depends(get_async_db)):
+    await ratelimit.guard_login(request.client.host if request.client else "unknown", login_data.username)
+    user = await auth.authenticate_user(db, login_data.username, login_data.password)
     if not user:
+        await ratelimit.login_failed(login_data.username)
         raise HTTPException(
             status_code=401,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = auth.create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    access_token = auth.create_user_token(user, expires_delta=access_token_expires)
+    await ratelimit.login_succeeded(login_data.username)
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@app.post("/api/auth/refresh", response_model=schemas.Token)
+async def refresh_token(
+    token: str = Depends(auth.oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    user = await db.get(models.User, current_user.id)
+    access_token = auth.create_user_token(user, expires_delta=timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES))
+    # Rotation: the token just exchanged stops working
+    await auth.revoke_token(db, token)
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.post("/api/auth/logout")
+async def logout(
+    token: str = Depends(auth.oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    await auth.revoke_token(db, token)
+    return {"message": "Logged out"}
+
+@app.post("/api/auth/logout-all")
+async def logout_all(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_principal)
+):
+    await db.execute(
+        update(models.User).where(models.User.id == current_user.id)
+        .values(token_version=models.User.token_version + 1)
+    )
+    await db.commit()
+    auth.invalidate_user(current_user.username, user_id=current_user.id)
+    return {"message": "Logged out on all devices"}
+
 @app.get("/api/auth/me", response_model=schemas.User)
-async def read_users_me(current_user: models.User = Depends(auth.get_current_active_user)):
+async def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 @app.post("/api/users", response_model=schemas.User)
 async def create_user(
     user: schemas.UserCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    db_user = db.query(models.User).filter(models.User.username == user.username).first()
+    db_user = await db.scalar(select(models.User.id).where(models.User.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_user_email = db.query(models.User).filter(models.User.email == user.email).first()
+    db_user_email = await db.scalar(select(models.User.id).where(models.User.email == user.email))
     if db_user_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.get_password_hash_async(user.password)
     db_user = models.User(
         username=user.username,
         email=user.email,
@@ -92,27 +180,30 @@ async def create_user(
         role=user.role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-@app.get("/api/users", response_model=List[schemas.User])
+@app.get("/api/users", response_model=Union[List[schemas.User], schemas.Page[schemas.User]])
 async def get_users(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    users = db.query(models.User).offset(skip).limit(limit).all()
-    return users
+    query = queries.users()
+    if cursor is not None:
+        return await pagination.paginate(db, query, queries.USER_ORDER, cursor, limit)
+    return await pagination.offset_page(db, query, queries.USER_ORDER, skip, limit)
 
 @app.get("/api/users/{user_id}", response_model=schemas.User)
 async def get_user(
     user_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    user = await db.scalar(queries.users().where(models.User.id == user_id))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -121,106 +212,179 @@ async def get_user(
 async def update_user(
     user_id: int, 
     user_update: schemas.UserUpdate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     update_data = user_update.dict(exclude_unset=True)
     if "password" in update_data:
-        update_data["hashed_password"] = auth.get_password_hash(update_data.pop("password"))
+        update_data["hashed_password"] = await auth.get_password_hash_async(update_data.pop("password"))
     
+    previous_username = db_user.username
+    # Tokens already issued carry the old role and active flag in their claims; retire them
+    if any(getattr(db_user, key) != value for key, value in update_data.items() if key in auth.TOKEN_CLAIM_FIELDS):
+        db_user.token_version = (db_user.token_version or 0) + 1
     for key, value in update_data.items():
         setattr(db_user, key, value)
     
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    auth.invalidate_user(previous_username, db_user.username, user_id=db_user.id)
+    await db.refresh(db_user)
     return db_user
 
 @app.delete("/api/users/{user_id}")
 async def delete_user(
     user_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_admin_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
 ):
-    db_user = db.query(models.User).filter(models.User.id == user_id).first()
+    db_user = await db.get(models.User, user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found")
     
     if db_user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
-    db.delete(db_user)
-    db.commit()
+    await db.delete(db_user)
+    await db.commit()
+    auth.invalidate_user(db_user.username, user_id=db_user.id)
     return {"message": "User deleted successfully"}
 
+@app.get("/api/metrics/cache")
+async def get_cache_metrics(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return {name: cache.stats() for name, cache in caches.items()}
+
+@app.get("/api/metrics/db-pool")
+async def get_db_pool_metrics(current_user: auth.Principal = Depends(auth.get_current_admin_user)):
+    return {"sync": pool_status(engine.pool), "async": pool_status(async_engine.pool)}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_prometheus_metrics(authorization: Optional[str] = Header(None)):
+    if METRICS_TOKEN and authorization != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    # No dependencies: a worker that can answer at all is alive
+    return {"status": "alive"}
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    result = await health.readiness()
+    return JSONResponse(result, status_code=200 if result["ready"] else 503)
+
+@app.get("/api/dashboard/summary", response_model=schemas.DashboardSummary)
+async def get_dashboard_summary(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await dashboard.get_summary(db)
+
+@app.get("/api/sync", response_model=schemas.SyncChanges)
+async def get_sync_changes(
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await sync.changes(db, since)
+
+@app.post("/api/sync/upload", response_model=schemas.SyncUploadResult)
+async def upload_sync_entries(
+    payload: schemas.SyncUpload,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await sync.upload(db, payload)
+
 @app.post("/api/suppliers", response_model=schemas.Supplier)
-def create_supplier(
+async def create_supplier(
     supplier: schemas.SupplierCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     db_supplier = models.Supplier(**supplier.dict())
     db.add(db_supplier)
-    db.commit()
-    db.refresh(db_supplier)
+    await db.commit()
+    await db.refresh(db_supplier)
     return db_supplier
 
-@app.get("/api/suppliers", response_model=List[schemas.Supplier])
-def get_suppliers(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+@app.get("/api/suppliers", response_model=Union[List[schemas.Supplier], schemas.Page[schemas.Supplier]])
+async def get_suppliers(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    suppliers = db.query(models.Supplier).offset(skip).limit(limit).all()
-    return suppliers
+    if ids is not None:
+        # Exactly these suppliers, in the order given; paging does not apply
+        return await loaders.found(batch.suppliers, loaders.parse_ids(ids))
+    query = queries.suppliers()
+    if cursor is not None:
+        return await pagination.paginate(db, query, queries.SUPPLIER_ORDER, cursor, limit)
+    return await pagination.offset_page(db, query, queries.SUPPLIER_ORDER, skip, limit)
+
+@app.post("/api/suppliers/batch-get", response_model=List[schemas.Supplier])
+async def batch_get_suppliers(
+    payload: schemas.BatchGet,
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await loaders.found(batch.suppliers, loaders.check_ids(payload.ids))
 
 @app.get("/api/suppliers/{supplier_id}", response_model=schemas.Supplier)
-def get_supplier(
+async def get_supplier(
     supplier_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    supplier = await db.scalar(queries.suppliers().where(models.Supplier.id == supplier_id))
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     return supplier
 
 @app.put("/api/suppliers/{supplier_id}", response_model=schemas.Supplier)
-def update_supplier(
+async def update_supplier(
     supplier_id: int, 
     supplier: schemas.SupplierUpdate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    db_supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    db_supplier = await db.get(models.Supplier, supplier_id)
     if not db_supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
     for key, value in supplier.dict().items():
         setattr(db_supplier, key, value)
     
-    db.commit()
-    db.refresh(db_supplier)
+    await db.commit()
+    await db.refresh(db_supplier)
+    events.publish(events.SUPPLIER_UPDATED, schemas.Supplier.model_validate(db_supplier))
     return db_supplier
 
 @app.delete("/api/suppliers/{supplier_id}")
-def delete_supplier(
+async def delete_supplier(
     supplier_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    db_supplier = db.query(models.Supplier).filter(models.Supplier.id == supplier_id).first()
+    db_supplier = await db.get(models.Supplier, supplier_id)
     if not db_supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
     
-    db.delete(db_supplier)
-    db.commit()
+    await db.delete(db_supplier)
+    await sync.record_deletion(db, "suppliers", supplier_id)
+    await db.commit()
     return {"message": "Supplier deleted successfully"}
 
+# Photo upload and download handlers stay sync: hashing, file and chunked BLOB I/O are
+# blocking, so FastAPI runs them on its threadpool with a sync session
 @app.post("/api/vehicles", response_model=schemas.VehicleEntry)
 def create_vehicle_entry(
     vehicle_number: str = Form(...),
@@ -230,10 +394,10 @@ def create_vehicle_entry(
     driver_phone: Optional[str] = Form(None),
     arrival_time: Optional[str] = Form(None),
     notes: Optional[str] = Form(None),
-    supplier_bill_photo: Optional[str] = Form(None),
-    vehicle_photo: Optional[str] = Form(None),
+    supplier_bill_photo: Union[UploadFile, str, None] = File(None),
+    vehicle_photo: Union[UploadFile, str, None] = File(None),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
     arrival_dt = None
     if arrival_time:
@@ -252,40 +416,69 @@ def create_vehicle_entry(
         notes=notes
     )
     
-    if supplier_bill_photo:
-        try:
-            db_vehicle.supplier_bill_photo = base64.b64decode(supplier_bill_photo.split(',')[1] if ',' in supplier_bill_photo else supplier_bill_photo)
-        except:
-            pass
+    bill_photo = photos.store_upload(db, supplier_bill_photo)
+    if bill_photo:
+        db_vehicle.supplier_bill_photo_sha256 = bill_photo.sha256
     
-    if vehicle_photo:
-        try:
-            db_vehicle.vehicle_photo = base64.b64decode(vehicle_photo.split(',')[1] if ',' in vehicle_photo else vehicle_photo)
-        except:
-            pass
+    truck_photo = photos.store_upload(db, vehicle_photo)
+    if truck_photo:
+        db_vehicle.vehicle_photo_sha256 = truck_photo.sha256
     
     db.add(db_vehicle)
     db.commit()
     db.refresh(db_vehicle)
+    images.schedule_renditions(db_vehicle.supplier_bill_photo_sha256, db_vehicle.vehicle_photo_sha256)
+    events.publish(events.VEHICLE_ENTRY_CREATED, schemas.VehicleEntryWithSupplier.model_validate(db_vehicle))
     return db_vehicle
 
-@app.get("/api/vehicles", response_model=List[schemas.VehicleEntryWithSupplier])
-def get_vehicle_entries(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+@app.get("/api/vehicles", response_model=Union[List[schemas.VehicleEntryWithSupplier], schemas.Page[schemas.VehicleEntryWithSupplier]])
+async def get_vehicle_entries(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[str] = None,
+    shape: Literal[serialization.SHAPES] = "nested",
+    filters: schemas.VehicleEntryFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    query = queries.filter_vehicle_entries(queries.vehicle_entries(), filters)
+    if ids is not None:
+        # Exactly these entries, in the order given; filters and paging do not apply
+        result = await loaders.found(batch.vehicle_entries, loaders.parse_ids(ids))
+    elif cursor is not None:
+        result = await pagination.paginate(db, query, queries.VEHICLE_ENTRY_ORDER, cursor, limit)
+    else:
+        result = await pagination.offset_page(db, query, queries.VEHICLE_ENTRY_ORDER, skip, limit)
+    if shape == "sideloaded":
+        return serialization.sideload_vehicle_entries(result)
+    return result
+
+@app.get("/api/vehicles/export")
+async def export_vehicle_entries(
+    format: Literal["csv", "ndjson", "xlsx"] = "csv",
+    filters: schemas.VehicleEntryFilters = Depends(),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    vehicles = db.query(models.VehicleEntry).offset(skip).limit(limit).all()
-    return vehicles
+    stmt = exports.vehicle_entries_statement(filters)
+    return exports.export_response("vehicle-entries", exports.VEHICLE_ENTRY_COLUMNS, stmt, format)
+
+@app.post("/api/vehicles/batch-get", response_model=List[schemas.VehicleEntryWithSupplier])
+async def batch_get_vehicle_entries(
+    payload: schemas.BatchGet,
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await loaders.found(batch.vehicle_entries, loaders.check_ids(payload.ids))
 
 @app.get("/api/vehicles/{vehicle_id}", response_model=schemas.VehicleEntryWithSupplier)
-def get_vehicle_entry(
+async def get_vehicle_entry(
     vehicle_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    vehicle = db.query(models.VehicleEntry).filter(models.VehicleEntry.id == vehicle_id).first()
+    vehicle = await db.scalar(queries.vehicle_entries().where(models.VehicleEntry.id == vehicle_id))
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle entry not found")
     return vehicle
@@ -293,62 +486,265 @@ def get_vehicle_entry(
 @app.get("/api/vehicles/{vehicle_id}/bill_photo")
 def get_bill_photo(
     vehicle_id: int, 
+    request: Request,
+    size: Literal["thumb", "preview", "original"] = "original",
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    vehicle = db.query(models.VehicleEntry).filter(models.VehicleEntry.id == vehicle_id).first()
-    if not vehicle or not vehicle.supplier_bill_photo:
+    sha256 = db.query(models.VehicleEntry.supplier_bill_photo_sha256).filter(models.VehicleEntry.id == vehicle_id).scalar()
+    photo, cache_control = photos.get_rendition(db, sha256, size)
+    if not photo:
         raise HTTPException(status_code=404, detail="Bill photo not found")
-    return Response(content=vehicle.supplier_bill_photo, media_type="image/jpeg")
+    return photos.photo_response(request, photo, cache_control)
 
 @app.get("/api/vehicles/{vehicle_id}/vehicle_photo")
 def get_vehicle_photo(
     vehicle_id: int, 
+    request: Request,
+    size: Literal["thumb", "preview", "original"] = "original",
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    vehicle = db.query(models.VehicleEntry).filter(models.VehicleEntry.id == vehicle_id).first()
-    if not vehicle or not vehicle.vehicle_photo:
+    sha256 = db.query(models.VehicleEntry.vehicle_photo_sha256).filter(models.VehicleEntry.id == vehicle_id).scalar()
+    photo, cache_control = photos.get_rendition(db, sha256, size)
+    if not photo:
         raise HTTPException(status_code=404, detail="Vehicle photo not found")
-    return Response(content=vehicle.vehicle_photo, media_type="image/jpeg")
+    return photos.photo_response(request, photo, cache_control)
 
 @app.post("/api/lab-tests", response_model=schemas.LabTest)
-def create_lab_test(
+async def create_lab_test(
     lab_test: schemas.LabTestCreate, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    vehicle = db.query(models.VehicleEntry).filter(models.VehicleEntry.id == lab_test.vehicle_entry_id).first()
+    vehicle = await db.scalar(select(models.VehicleEntry.id).where(models.VehicleEntry.id == lab_test.vehicle_entry_id))
     if not vehicle:
         raise HTTPException(status_code=404, detail="Vehicle entry not found")
     
     db_lab_test = models.LabTest(**lab_test.dict())
+    if db_lab_test.test_date is None:
+        db_lab_test.test_date = datetime.utcnow()
+    grading.grade_lab_test(db_lab_test, await db.run_sync(grading.load_specs))
     db.add(db_lab_test)
-    db.commit()
-    db.refresh(db_lab_test)
+    await db.commit()
+    await db.refresh(db_lab_test)
+    await db.run_sync(analytics.refresh_after_insert, [(db_lab_test.vehicle_entry_id, db_lab_test.test_date)])
+    created = await db.scalar(queries.lab_tests().where(models.LabTest.id == db_lab_test.id))
+    events.publish(events.LAB_TEST_CREATED, schemas.LabTestWithVehicle.model_validate(created))
     return db_lab_test
 
-@app.get("/api/lab-tests", response_model=List[schemas.LabTestWithVehicle])
-def get_lab_tests(
-    skip: int = 0, 
-    limit: int = 100, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+@app.get("/api/lab-tests", response_model=Union[List[schemas.LabTestWithVehicle], schemas.Page[schemas.LabTestWithVehicle]])
+async def get_lab_tests(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=pagination.MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    ids: Optional[str] = None,
+    shape: Literal[serialization.SHAPES] = "nested",
+    filters: schemas.LabTestFilters = Depends(),
+    db: AsyncSession = Depends(get_async_db),
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    lab_tests = db.query(models.LabTest).offset(skip).limit(limit).all()
-    return lab_tests
+    query = queries.filter_lab_tests(queries.lab_tests(), filters)
+    if ids is not None:
+        # Exactly these tests, in the order given; filters and paging do not apply
+        result = await loaders.found(batch.lab_tests, loaders.parse_ids(ids))
+    elif cursor is not None:
+        result = await pagination.paginate(db, query, queries.LAB_TEST_ORDER, cursor, limit)
+    else:
+        result = await pagination.offset_page(db, query, queries.LAB_TEST_ORDER, skip, limit)
+    if shape == "sideloaded":
+        return serialization.sideload_lab_tests(result)
+    return result
+
+@app.get("/api/lab-tests/export")
+async def export_lab_tests(
+    format: Literal["csv", "ndjson", "xlsx"] = "csv",
+    filters: schemas.LabTestFilters = Depends(),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    stmt = exports.lab_tests_statement(filters)
+    return exports.export_response("lab-tests", exports.LAB_TEST_COLUMNS, stmt, format)
+
+@app.post("/api/lab-tests/batch-get", response_model=List[schemas.LabTestWithVehicle])
+async def batch_get_lab_tests(
+    payload: schemas.BatchGet,
+    batch: loaders.Loaders = Depends(loaders.get_loaders),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    return await loaders.found(batch.lab_tests, loaders.check_ids(payload.ids))
 
 @app.get("/api/lab-tests/{lab_test_id}", response_model=schemas.LabTestWithVehicle)
-def get_lab_test(
+async def get_lab_test(
     lab_test_id: int, 
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_active_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
 ):
-    lab_test = db.query(models.LabTest).filter(models.LabTest.id == lab_test_id).first()
+    lab_test = await db.scalar(queries.lab_tests().where(models.LabTest.id == lab_test_id))
     if not lab_test:
         raise HTTPException(status_code=404, detail="Lab test not found")
     return lab_test
 
+def _import_upload(kind: str, file: UploadFile, format: Optional[str], db: Session) -> dict:
+    return imports.import_file(db, kind, file.file, format or imports.detect_format(file.filename, file.content_type))
+
+# Bulk imports are sync like the photo handlers: parsing and validating the upload is blocking work
+@app.post("/api/suppliers/import", response_model=schemas.ImportResult)
+def import_suppliers(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    return _import_upload("suppliers", file, format, db)
+
+@app.post("/api/vehicles/import", response_model=schemas.ImportResult)
+def import_vehicle_entries(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    return _import_upload("vehicles", file, format, db)
+
+@app.post("/api/lab-tests/import", response_model=schemas.ImportResult)
+def import_lab_tests(
+    file: UploadFile = File(...),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    return _import_upload("lab-tests", file, format, db)
+
+@app.get("/api/grading/specs", response_model=schemas.GradingSpecs)
+async def get_grading_specs(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    specs = await db.run_sync(grading.load_specs)
+    return specs.as_dict()
+
+@app.put("/api/grading/specs", response_model=schemas.GradingSpecs)
+async def update_grading_specs(
+    specs: schemas.GradingSpecs,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    grade_specs = [(s.grade, s.rank, s.parameter, s.min_value, s.max_value) for s in specs.grades]
+    deduction_specs = [(s.parameter, s.direction, s.tolerance, s.rate, s.reject_limit) for s in specs.deductions]
+    for parameter in {spec[2] for spec in grade_specs} | {spec[0] for spec in deduction_specs}:
+        if parameter not in grading.MEASUREMENTS:
+            raise HTTPException(status_code=400, detail=f"Unknown lab test parameter: {parameter}")
+    # Each grade limits a parameter once, and each parameter has one deduction rule
+    for (grade, parameter), count in Counter((spec[0], spec[2]) for spec in grade_specs).items():
+        if count > 1:
+            raise HTTPException(status_code=400, detail=f"Grade {grade} lists {parameter} more than once")
+    for parameter, count in Counter(spec[0] for spec in deduction_specs).items():
+        if count > 1:
+            raise HTTPException(status_code=400, detail=f"Deductions list {parameter} more than once")
+    saved = await db.run_sync(grading.save_specs, grade_specs, deduction_specs)
+    return saved.as_dict()
+
+@app.post("/api/grading/regrade", response_model=schemas.RegradeResult)
+def regrade_lab_tests(
+    tested_from: Optional[datetime] = None,
+    tested_to: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    start = time.perf_counter()
+    regraded = grading.regrade(db, tested_from, tested_to)
+    return {"regraded": regraded, "seconds": round(time.perf_counter() - start, 3)}
+
+@app.get("/api/analytics/supplier-quality", response_model=List[schemas.SupplierQualityRollup])
+async def get_supplier_quality(
+    period: Literal["day", "week"] = "week",
+    supplier_id: Optional[int] = None,
+    parameter: Optional[Literal[analytics.PARAMETERS]] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: auth.Principal = Depends(auth.get_current_active_user)
+):
+    stmt = analytics.rollups_statement(period, supplier_id, parameter, date_from, date_to)
+    rows = (await db.execute(stmt)).all()
+    return [
+        {
+            **{column.key: getattr(rollup, column.key) for column in models.SupplierQualityRollup.__table__.columns},
+            "supplier_name": supplier_name,
+            "out_of_spec_rate": rollup.out_of_spec_count / rollup.count,
+        }
+        for rollup, supplier_name in rows
+    ]
+
+@app.post("/api/analytics/rebuild")
+def rebuild_analytics(
+    db: Session = Depends(get_db),
+    current_user: auth.Principal = Depends(auth.get_current_admin_user)
+):
+    return {"rollups": analytics.rebuild(db)}
+
+# Event stream clients authenticate with a short-lived session so a long-lived
+# connection does not hold a pooled database connection for its whole lifetime
+async def _event_stream_user(token: Optional[str]) -> auth.Principal:
+    async with AsyncSessionLocal() as db:
+        user = await auth.principal_from_token(token, db)
+    if not user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return user
+
+def _event_types(types: Optional[str]) -> Optional[List[str]]:
+    return [name.strip() for name in types.split(",") if name.strip()] if types else None
+
+@app.get("/api/events")
+async def stream_events(
+    since: Optional[int] = None,
+    types: Optional[str] = Query(None, description="Comma-separated event types, e.g. lab_test.created"),
+    token: Optional[str] = Query(None, description="Bearer token, for EventSource clients that cannot set headers"),
+    authorization: Optional[str] = Header(None),
+    last_event_id: Optional[int] = Header(None),
+):
+    """Server-Sent Events feed. Reconnecting EventSource clients resume from Last-Event-ID."""
+    if authorization and authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+    await _event_stream_user(token)
+    since = last_event_id if last_event_id is not None else since
+
+    async def body():
+        async for event in events.broker.stream(since, _event_types(types)):
+            yield events.sse_message(event)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/api/events/ws")
+async def stream_events_ws(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    since: Optional[int] = None,
+    types: Optional[str] = None,
+):
+    try:
+        await _event_stream_user(token)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+    await websocket.accept()
+    try:
+        async for event in events.broker.stream(since, _event_types(types)):
+            if event is None:
+                await websocket.send_json({"type": "keepalive"})
+            else:
+                await websocket.send_json(event)
+        # The client fell too far behind; it reconnects with the last seq it saw
+        await websocket.close(code=1013)
+    except WebSocketDisconnect:
+        pass
+
 if __name__ == "__main__":
+    # Development only; production runs `gunicorn main:app` with gunicorn.conf.py
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,227 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from cache import caches
+from database import async_engine, engine, pool_status
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this many seconds are logged with their SQL. Unset (the default) disables
+# the log, and with it the per-statement capture it needs.
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS")) if os.getenv("SLOW_REQUEST_SECONDS") else None
+SLOW_REQUEST_MAX_STATEMENTS = int(os.getenv("SLOW_REQUEST_MAX_STATEMENTS", "50"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items]
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [count per bucket..., sum, count]
+        self._values: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._values.items())
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+class Gauge:
+    """A gauge read from `collect()` at scrape time, returning {labels tuple: value}."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.collect = collect
+        registry.append(self)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in self.collect().items()]
+        return lines
+
+# Every metric registers itself here, like TTLCache does in cache.caches
+registry: list = []
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "Time from request to the last body byte.", ("method", "route"))
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "Time spent in SQL statements per request.", ("method", "route"))
+REQUEST_STATEMENTS = Histogram(
+    "http_request_db_statements", "SQL statements executed per request.", ("method", "route"), buckets=STATEMENT_BUCKETS,
+)
+_in_progress = {"value": 0}
+IN_PROGRESS = Gauge("http_requests_in_progress", "Requests being handled.", (), lambda: {(): _in_progress["value"]})
+
+def _pool_values(key: str):
+    pools = {"sync": engine.pool, "async": async_engine.pool}
+    return lambda: {
+        (name,): status[key] for name, status in ((name, pool_status(pool)) for name, pool in pools.items()) if key in status
+    }
+
+Gauge("db_pool_checked_out", "Connections in use.", ("engine",), _pool_values("checked_out"))
+Gauge("db_pool_overflow", "Connections open beyond the pool size.", ("engine",), _pool_values("overflow"))
+Gauge("db_pool_checkouts", "Connection checkouts since start.", ("engine",), _pool_values("checkouts"))
+Gauge("db_pool_timeouts", "Checkouts that gave up after DB_POOL_TIMEOUT.", ("engine",), _pool_values("timeouts"))
+Gauge("db_pool_wait_seconds_max", "Longest wait for a connection.", ("engine",), _pool_values("wait_seconds_max"))
+Gauge("cache_hits", "Cache hits since start.", ("cache",), lambda: {(name,): cache.hits for name, cache in caches.items()})
+Gauge("cache_misses", "Cache misses since start.", ("cache",), lambda: {(name,): cache.misses for name, cache in caches.items()})
+Gauge("cache_size", "Entries held.", ("cache",), lambda: {(name,): len(cache) for name, cache in caches.items()})
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "sql")
+
+    def __init__(self, capture_sql: bool):
+        self.statements = 0
+        self.db_seconds = 0.0
+        # (seconds, statement) per statement, kept only when the slow-request log is on
+        self.sql: Optional[List[Tuple[float, str]]] = [] if capture_sql else None
+
+_current: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.statements += 1
+    stats.db_seconds += elapsed
+    if stats.sql is not None and len(stats.sql) < SLOW_REQUEST_MAX_STATEMENTS:
+        stats.sql.append((elapsed, statement))
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine):
+    """Count the statements and SQL time of `engine` against the request that runs them."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def _route(scope: Scope) -> str:
+    # The route template keeps one series per endpoint, not one per vehicle id
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class InstrumentationMiddleware:
+    """Times each request until its last body byte and records its SQL statement count and time.
+
+    Metrics are kept per process; with several workers, scrape each one or aggregate in Prometheus.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(capture_sql=SLOW_REQUEST_SECONDS is not None)
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status = 500
+        _in_progress["value"] += 1
+
+        async def send_with_timing(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # DB time so far; streamed responses can run more SQL after the headers are sent
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f"db;dur={stats.db_seconds * 1000:.1f}, app;dur={(time.perf_counter() - start) * 1000:.1f}")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _in_progress["value"] -= 1
+            _current.reset(token)
+            self.record(scope, status, time.perf_counter() - start, stats)
+
+    def record(self, scope: Scope, status: int, elapsed: float, stats: RequestStats):
+        method, route = scope["method"], _route(scope)
+        REQUESTS.inc(method, route, str(status))
+        REQUEST_SECONDS.observe(elapsed, method, route)
+        REQUEST_DB_SECONDS.observe(stats.db_seconds, method, route)
+        REQUEST_STATEMENTS.observe(stats.statements, method, route)
+        if SLOW_REQUEST_SECONDS is not None and elapsed >= SLOW_REQUEST_SECONDS:
+            slowest = sorted(stats.sql or (), reverse=True)[:10]
+            logger.warning(
+                "Slow request %s %s (%s) %d in %.3fs: %d statements, %.3fs in SQL%s",
+                method, scope["path"], route, status, elapsed, stats.statements, stats.db_seconds,
+                "".join(f"\n  {seconds * 1000:.1f}ms {' '.join(statement.split())}" for seconds, statement in slowest),
+            )
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, LargeBinary, Float, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, Integer, String, Text, Date, DateTime, ForeignKey, LargeBinary, Float, Boolean, Index
+from sqlalchemy.orm import relationship, deferred
 from datetime import datetime
 from database import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(100), unique=True, nullable=False, index=True)
@@ -13,11 +14,35 @@ class User(Base):
     hashed_password = Column(String(255), nullable=False)
     role = Column(String(50), default="user")
     is_active = Column(Boolean, default=True)
+    # Bumped when role, active flag, username or password change; tokens carrying an older one are rejected
+    token_version = Column(Integer, nullable=False, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class Photo(Base):
+    __tablename__ = "photos"
+    
+    sha256 = Column(String(64), primary_key=True)
+    content_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    storage = Column(String(20), nullable=False, default="database")
+    data = deferred(Column(LargeBinary))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PhotoRendition(Base):
+    __tablename__ = "photo_renditions"
+    
+    source_sha256 = Column(String(64), ForeignKey("photos.sha256"), primary_key=True)
+    size = Column(String(20), primary_key=True)
+    photo_sha256 = Column(String(64), ForeignKey("photos.sha256"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class Supplier(Base):
     __tablename__ = "suppliers"
+    __table_args__ = (
+        Index("ix_suppliers_created_at_id", "created_at", "id"),
+        Index("ix_suppliers_updated_at_id", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     supplier_name = Column(String(255), nullable=False)
@@ -33,17 +58,25 @@ class Supplier(Base):
 
 class VehicleEntry(Base):
     __tablename__ = "vehicle_entries"
+    # PostgreSQL also gets upper(vehicle_number) pattern and pg_trgm GIN indexes from the migrations
+    __table_args__ = (
+        Index("ix_vehicle_entries_arrival_time_id", "arrival_time", "id"),
+        Index("ix_vehicle_entries_supplier_id_arrival_time", "supplier_id", "arrival_time"),
+        Index("ix_vehicle_entries_updated_at_id", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     vehicle_number = Column(String(50), nullable=False)
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
-    bill_no = Column(String(100), nullable=False)
+    bill_no = Column(String(100), nullable=False, index=True)
     driver_name = Column(String(255))
     driver_phone = Column(String(20))
     arrival_time = Column(DateTime, default=datetime.utcnow)
-    supplier_bill_photo = Column(LargeBinary)
-    vehicle_photo = Column(LargeBinary)
+    supplier_bill_photo_sha256 = Column(String(64), ForeignKey("photos.sha256"))
+    vehicle_photo_sha256 = Column(String(64), ForeignKey("photos.sha256"))
     notes = Column(Text)
+    # Idempotency key of entries recorded offline and uploaded through /api/sync/upload
+    client_id = Column(String(64), unique=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -52,17 +85,21 @@ class VehicleEntry(Base):
 
 class LabTest(Base):
     __tablename__ = "lab_tests"
+    __table_args__ = (
+        Index("ix_lab_tests_created_at_id", "created_at", "id"),
+        Index("ix_lab_tests_updated_at_id", "updated_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    vehicle_entry_id = Column(Integer, ForeignKey("vehicle_entries.id"), nullable=False)
-    test_date = Column(DateTime, default=datetime.utcnow)
+    vehicle_entry_id = Column(Integer, ForeignKey("vehicle_entries.id"), nullable=False, index=True)
+    test_date = Column(DateTime, default=datetime.utcnow, index=True)
     
-    moisture = Column(Float)
+    moisture = Column(Float, index=True)
     test_weight = Column(Float)
-    protein_percent = Column(Float)
+    protein_percent = Column(Float, index=True)
     wet_gluten = Column(Float)
     dry_gluten = Column(Float)
-    falling_number = Column(Integer)
+    falling_number = Column(Integer, index=True)
     
     chaff_husk = Column(Float)
     straws_sticks = Column(Float)
@@ -79,10 +116,89 @@ class LabTest(Base):
     other_grain_damage = Column(Float)
     total_dockage = Column(Float)
     
+    # Filled in by grading.py from the grade and deduction specs
+    grade = Column(String(20), index=True)
+    deduction_percent = Column(Float)
+    is_rejected = Column(Boolean, default=False)
+    rejection_reasons = Column(Text)
+    graded_at = Column(DateTime)
+    
     remarks = Column(Text)
     tested_by = Column(String(255))
+    client_id = Column(String(64), unique=True)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     vehicle_entry = relationship("VehicleEntry", back_populates="lab_tests")
+
+class SupplierQualityRollup(Base):
+    """Per-supplier statistics of one lab parameter over a day or a week, maintained by analytics.py."""
+    __tablename__ = "supplier_quality_rollups"
+    __table_args__ = (
+        Index("ix_supplier_quality_rollups_period_start", "period", "period_start"),
+    )
+    
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), primary_key=True)
+    period = Column(String(10), primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    parameter = Column(String(50), primary_key=True)
+    
+    count = Column(Integer, nullable=False)
+    mean = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+    p10 = Column(Float)
+    p50 = Column(Float)
+    p90 = Column(Float)
+    out_of_spec_count = Column(Integer, nullable=False, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class GradeSpec(Base):
+    """Limits a lab test must meet on one parameter to earn a grade; lower rank is a better grade."""
+    __tablename__ = "grade_specs"
+    
+    grade = Column(String(20), primary_key=True)
+    parameter = Column(String(50), primary_key=True)
+    rank = Column(Integer, nullable=False)
+    min_value = Column(Float)
+    max_value = Column(Float)
+
+class DeductionSpec(Base):
+    """Price deduction per unit a parameter goes beyond its tolerance, and the limit that rejects the load."""
+    __tablename__ = "deduction_specs"
+    
+    parameter = Column(String(50), primary_key=True)
+    direction = Column(String(10), nullable=False, default="above")
+    tolerance = Column(Float, nullable=False)
+    rate = Column(Float, nullable=False)
+    reject_limit = Column(Float)
+
+class SyncTombstone(Base):
+    """A deleted row, kept so offline clients syncing with /api/sync remove it too."""
+    __tablename__ = "sync_tombstones"
+    __table_args__ = (Index("ix_sync_tombstones_deleted_at_id", "deleted_at", "id"),)
+    
+    id = Column(Integer, primary_key=True)
+    entity = Column(String(50), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class RevokedToken(Base):
+    """A signed-out access token, rejected until it would have expired anyway."""
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class RateLimitWindow(Base):
+    """Login attempt counts shared between workers when RATE_LIMIT_BACKEND=postgres."""
+    __tablename__ = "rate_limit_windows"
+    
+    key = Column(String(200), primary_key=True)
+    window_index = Column(BigInteger, nullable=False)
+    current = Column(Integer, nullable=False, default=0)
+    previous = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,63 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import HTTPException
+from sqlalchemy import Select, and_, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Largest page a list endpoint returns, with cursor or skip/limit paging
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "1000"))
+
+def descending(columns: Sequence):
+    # Timestamps are nullable. NULLS FIRST is PostgreSQL's own order for DESC, so its
+    # (timestamp, id) indexes still serve the sort, and SQLite is made to agree.
+    return [column.desc().nulls_first() for column in columns]
+
+def _after(columns: Sequence, values: list):
+    """Rows that come after `values` in descending order; only the leading timestamp may be NULL."""
+    timestamp, *rest = columns
+    if values[0] is None:
+        return or_(timestamp.is_not(None), and_(timestamp.is_(None), tuple_(*rest) < tuple_(*values[1:])))
+    return and_(timestamp.is_not(None), tuple_(*columns) < tuple_(*values))
+
+def encode_cursor(values: Sequence) -> str:
+    payload = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [
+            None if value is None and index == 0
+            else datetime.fromisoformat(value) if column.type.python_type is datetime
+            else column.type.python_type(value)
+            for index, (column, value) in enumerate(zip(columns, values))
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(db: AsyncSession, query: Select, columns: Sequence, cursor: Optional[str], limit: int) -> dict:
+    """Return one page of `query`, newest first, as {"items": [...], "next_cursor": ...}.
+
+    Rows are ordered on `columns` (a timestamp followed by the primary key) and later pages
+    seek past the last row seen with a row-value comparison, so any page costs one index range scan.
+    Rows without a timestamp come first. An empty cursor asks for the first page.
+    """
+    if cursor:
+        query = query.filter(_after(columns, decode_cursor(cursor, columns)))
+    rows = (await db.scalars(query.order_by(*descending(columns)).limit(limit + 1))).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return {"items": rows, "next_cursor": next_cursor}
+
+async def offset_page(db: AsyncSession, query: Select, columns: Sequence, skip: int, limit: int) -> list:
+    """The legacy skip/limit listing, in the same stable order as cursor pages."""
+    return (await db.scalars(query.order_by(*descending(columns)).offset(skip).limit(limit))).all()
@@ -0,0 +1,294 @@
+import base64
+import binascii
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+from database import SessionLocal
+
+# "database" keeps photo bytes in the photos table, "filesystem" writes them under PHOTO_STORAGE_DIR
+PHOTO_STORAGE_BACKEND = os.getenv("PHOTO_STORAGE_BACKEND", "database")
+PHOTO_STORAGE_DIR = os.getenv("PHOTO_STORAGE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "photo_store"))
+PHOTO_CHUNK_SIZE = 256 * 1024
+PHOTO_CACHE_CONTROL = "private, max-age=86400"
+# For the upload served in place of a rendition the pipeline hasn't stored yet, so clients pick up the rendition
+PENDING_RENDITION_CACHE_CONTROL = "private, no-cache"
+MAX_PHOTO_BYTES = int(os.getenv("MAX_PHOTO_BYTES", str(15 * 1024 * 1024)))
+ALLOWED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "image/webp", "image/heic", "application/pdf"}
+
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
+
+def detect_content_type(data: bytes) -> str:
+    """Guess the media type of an uploaded photo from its leading bytes."""
+    for signature, content_type in _SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return "image/heic"
+    return "application/octet-stream"
+
+class DatabasePhotoBackend:
+    """Keeps photo bytes in the deferred photos.data column."""
+    name = "database"
+
+    def write(self, photo: models.Photo, fileobj: BinaryIO):
+        # The DB driver needs the value in memory; MAX_PHOTO_BYTES bounds this single copy
+        photo.data = fileobj.read()
+
+    def read(self, photo: models.Photo) -> bytes:
+        return photo.data
+
+    def iter_range(self, photo: models.Photo, start: int, end: int) -> Iterator[bytes]:
+        """Read bytes start..end (inclusive) with one substr() query per chunk.
+
+        Each chunk uses its own short session so a slow client never holds a pooled connection.
+        """
+        offset = start
+        while offset <= end:
+            length = min(PHOTO_CHUNK_SIZE, end - offset + 1)
+            with SessionLocal() as db:
+                chunk = db.query(func.substr(models.Photo.data, offset + 1, length)).filter(
+                    models.Photo.sha256 == photo.sha256
+                ).scalar()
+            yield bytes(chunk)
+            offset += length
+
+class FilesystemPhotoBackend:
+    """Writes photo bytes to <root>/<ab>/<cd>/<sha256>, so identical uploads share one file."""
+    name = "filesystem"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256[2:4], sha256)
+
+    def write(self, photo: models.Photo, fileobj: BinaryIO):
+        path = self.path(photo.sha256)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(fileobj, f, PHOTO_CHUNK_SIZE)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def read(self, photo: models.Photo) -> bytes:
+        with open(self.path(photo.sha256), "rb") as f:
+            return f.read()
+
+    def iter_range(self, photo: models.Photo, start: int, end: int) -> Iterator[bytes]:
+        with open(self.path(photo.sha256), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(PHOTO_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+_backends = {
+    DatabasePhotoBackend.name: DatabasePhotoBackend(),
+    FilesystemPhotoBackend.name: FilesystemPhotoBackend(PHOTO_STORAGE_DIR),
+}
+
+if PHOTO_STORAGE_BACKEND not in _backends:
+    raise RuntimeError(f"Unknown PHOTO_STORAGE_BACKEND: {PHOTO_STORAGE_BACKEND}")
+
+def get_backend(name: str = PHOTO_STORAGE_BACKEND):
+    return _backends[name]
+
+def _scan(fileobj: BinaryIO):
+    """Hash, measure and sniff a photo in PHOTO_CHUNK_SIZE reads, rejecting oversized or non-image uploads."""
+    digest = hashlib.sha256()
+    size = 0
+    content_type = None
+    while True:
+        chunk = fileobj.read(PHOTO_CHUNK_SIZE)
+        if not chunk:
+            break
+        if content_type is None:
+            content_type = detect_content_type(chunk)
+            if content_type not in ALLOWED_CONTENT_TYPES:
+                raise HTTPException(status_code=415, detail="Photo must be a JPEG, PNG, GIF, WebP, HEIC or PDF file")
+        size += len(chunk)
+        if size > MAX_PHOTO_BYTES:
+            raise HTTPException(status_code=413, detail=f"Photo exceeds the {MAX_PHOTO_BYTES // (1024 * 1024)} MB limit")
+        digest.update(chunk)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Photo is empty")
+    return digest.hexdigest(), size, content_type
+
+def store_photo_file(db: Session, fileobj: BinaryIO) -> models.Photo:
+    """Store a photo from a seekable file under its SHA-256 digest, reusing the existing row for duplicates.
+
+    The file is read in chunks: once to hash and validate it, and again only if the photo is new.
+    The new row is flushed but not committed.
+    """
+    sha256, size, content_type = _scan(fileobj)
+    photo = db.get(models.Photo, sha256)
+    if photo is not None:
+        return photo
+
+    backend = get_backend()
+    photo = models.Photo(
+        sha256=sha256,
+        content_type=content_type,
+        size=size,
+        storage=backend.name,
+    )
+    fileobj.seek(0)
+    backend.write(photo, fileobj)
+    db.add(photo)
+    # Sessions don't autoflush, so flush now for a second copy in the same request to find this row
+    db.flush()
+    return photo
+
+def store_photo(db: Session, data: bytes) -> models.Photo:
+    return store_photo_file(db, io.BytesIO(data))
+
+def decode_base64_photo(value: str) -> bytes:
+    """Decode a base64 photo or data URL sent by older clients as a form string."""
+    _, _, payload = value.rpartition(",")
+    if len(payload) > (MAX_PHOTO_BYTES + 2) // 3 * 4:
+        raise HTTPException(status_code=413, detail=f"Photo exceeds the {MAX_PHOTO_BYTES // (1024 * 1024)} MB limit")
+    try:
+        return base64.b64decode(payload, validate=True)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Photo is not valid base64 data")
+
+def store_upload(db: Session, upload) -> Optional[models.Photo]:
+    """Store a photo form field: a multipart file, or a base64 string from older clients."""
+    if upload is None or upload == "":
+        return None
+    if isinstance(upload, str):
+        return store_photo(db, decode_base64_photo(upload))
+    # Starlette spools multipart files to disk past 1 MB, so this never holds the whole upload twice
+    return store_photo_file(db, upload.file)
+
+def get_photo(db: Session, sha256: Optional[str]) -> Optional[models.Photo]:
+    """Load photo metadata only; the bytes stay in storage until read_photo is called."""
+    if not sha256:
+        return None
+    return db.get(models.Photo, sha256)
+
+def get_rendition(db: Session, sha256: Optional[str], size: str) -> Tuple[Optional[models.Photo], str]:
+    """The photo to serve for a rendition made by the image pipeline, and its Cache-Control.
+
+    Until the rendition exists the uploaded photo is served. For a thumbnail or preview it is
+    marked for revalidation, so the client swaps in the smaller rendition once it is stored.
+    PDFs and other files that never get renditions are served as uploaded.
+    """
+    if not sha256:
+        return None, PHOTO_CACHE_CONTROL
+    rendition = (
+        db.query(models.Photo)
+        .join(models.PhotoRendition, models.PhotoRendition.photo_sha256 == models.Photo.sha256)
+        .filter(models.PhotoRendition.source_sha256 == sha256, models.PhotoRendition.size == size)
+        .first()
+    )
+    if rendition is not None:
+        return rendition, PHOTO_CACHE_CONTROL
+    photo = db.get(models.Photo, sha256)
+    if photo is not None and size != "original" and photo.content_type.startswith("image/"):
+        return photo, PENDING_RENDITION_CACHE_CONTROL
+    return photo, PHOTO_CACHE_CONTROL
+
+def read_photo(photo: models.Photo) -> bytes:
+    return get_backend(photo.storage).read(photo)
+
+def iter_photo(photo: models.Photo, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    if end is None:
+        end = photo.size - 1
+    return get_backend(photo.storage).iter_range(photo, start, end)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_range(header: str, size: int):
+    """Parse a single-range Range header into (start, end), or None to send the whole photo.
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        # Malformed and multi-range requests are answered with the full body
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+def photo_response(request: Request, photo: models.Photo, cache_control: str = PHOTO_CACHE_CONTROL) -> Response:
+    """Serve a photo with a strong ETag, answering revalidation and Range requests.
+
+    Only photo metadata is needed to answer 304 and 416; the bytes are streamed in chunks.
+    """
+    etag = f'"{photo.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+        "X-Content-Type-Options": "nosniff",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, photo.size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{photo.size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{photo.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                iter_photo(photo, start, end), status_code=206, media_type=photo.content_type, headers=headers
+            )
+
+    headers["Content-Length"] = str(photo.size)
+    return StreamingResponse(iter_photo(photo), media_type=photo.content_type, headers=headers)
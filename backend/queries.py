@@ -0,0 +1,108 @@
+from pydantic import BaseModel
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import joinedload, load_only
+
+import models
+import schemas
+
+def columns_for(model, schema: type[BaseModel]):
+    """Mapped columns of `model` that `schema` serializes, for use with load_only()."""
+    fields = schema.model_fields
+    return [getattr(model, attr.key) for attr in model.__mapper__.column_attrs if attr.key in fields]
+
+# Keyset order per list endpoint: a timestamp, then the primary key as a tie-breaker.
+# Each has a matching composite index.
+SUPPLIER_ORDER = (models.Supplier.created_at, models.Supplier.id)
+USER_ORDER = (models.User.created_at, models.User.id)
+VEHICLE_ENTRY_ORDER = (models.VehicleEntry.arrival_time, models.VehicleEntry.id)
+LAB_TEST_ORDER = (models.LabTest.created_at, models.LabTest.id)
+
+# Loader options per response model. Many-to-one relationships are joined so a list
+# page is a single SELECT however many rows it returns.
+
+def supplier_options():
+    return [load_only(*columns_for(models.Supplier, schemas.Supplier))]
+
+def user_options():
+    return [load_only(*columns_for(models.User, schemas.User))]
+
+def vehicle_entry_options():
+    return [
+        load_only(*columns_for(models.VehicleEntry, schemas.VehicleEntry)),
+        joinedload(models.VehicleEntry.supplier).load_only(*columns_for(models.Supplier, schemas.Supplier)),
+    ]
+
+def lab_test_options():
+    return [
+        load_only(*columns_for(models.LabTest, schemas.LabTest)),
+        joinedload(models.LabTest.vehicle_entry)
+        .load_only(*columns_for(models.VehicleEntry, schemas.VehicleEntry))
+        .joinedload(models.VehicleEntry.supplier)
+        .load_only(*columns_for(models.Supplier, schemas.Supplier)),
+    ]
+
+def suppliers():
+    return select(models.Supplier).options(*supplier_options())
+
+def users():
+    return select(models.User).options(*user_options())
+
+def vehicle_entries():
+    return select(models.VehicleEntry).options(*vehicle_entry_options())
+
+def lab_tests():
+    return select(models.LabTest).options(*lab_test_options())
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def filter_vehicle_entries(query, filters: schemas.VehicleEntryFilters):
+    """Apply vehicle entry filters to a select() over vehicle_entries.
+
+    vehicle_number is a case-insensitive prefix match and search a substring match on
+    vehicle and bill numbers; on PostgreSQL both are served by indexes on upper(vehicle_number)
+    and pg_trgm GIN indexes.
+    """
+    if filters.vehicle_number:
+        prefix = _like_escape(filters.vehicle_number.strip().upper()) + "%"
+        query = query.filter(func.upper(models.VehicleEntry.vehicle_number).like(prefix, escape="\\"))
+    if filters.supplier_id is not None:
+        query = query.filter(models.VehicleEntry.supplier_id == filters.supplier_id)
+    if filters.bill_no:
+        query = query.filter(models.VehicleEntry.bill_no == filters.bill_no)
+    if filters.arrival_from:
+        query = query.filter(models.VehicleEntry.arrival_time >= filters.arrival_from)
+    if filters.arrival_to:
+        query = query.filter(models.VehicleEntry.arrival_time <= filters.arrival_to)
+    if filters.search:
+        pattern = "%" + _like_escape(filters.search.strip()) + "%"
+        query = query.filter(or_(
+            models.VehicleEntry.vehicle_number.ilike(pattern, escape="\\"),
+            models.VehicleEntry.bill_no.ilike(pattern, escape="\\"),
+        ))
+    return query
+
+_VEHICLE_FILTER_FIELDS = set(schemas.VehicleEntryFilters.model_fields)
+
+_LAB_TEST_RANGES = (
+    ("tested", models.LabTest.test_date, "from", "to"),
+    ("moisture", models.LabTest.moisture, "min", "max"),
+    ("protein_percent", models.LabTest.protein_percent, "min", "max"),
+    ("falling_number", models.LabTest.falling_number, "min", "max"),
+)
+
+def filter_lab_tests(query, filters: schemas.LabTestFilters):
+    """Apply lab test filters; vehicle entry filters match through the tested vehicle."""
+    if filters.vehicle_entry_id is not None:
+        query = query.filter(models.LabTest.vehicle_entry_id == filters.vehicle_entry_id)
+    for name, column, low, high in _LAB_TEST_RANGES:
+        lower = getattr(filters, f"{name}_{low}")
+        upper = getattr(filters, f"{name}_{high}")
+        if lower is not None:
+            query = query.filter(column >= lower)
+        if upper is not None:
+            query = query.filter(column <= upper)
+    if filters.model_dump(include=_VEHICLE_FILTER_FIELDS, exclude_none=True):
+        vehicle_ids = filter_vehicle_entries(select(models.VehicleEntry.id), filters)
+        query = query.filter(models.LabTest.vehicle_entry_id.in_(vehicle_ids))
+    return query
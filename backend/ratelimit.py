@@ -0,0 +1,165 @@
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects.postgresql import insert
+
+import models
+from cache import TTLCache
+from database import async_engine
+
+# "local" counts per process; "postgres" shares the counters between workers in rate_limit_windows
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "local")
+# Login attempts per client IP, successful or not. 0 disables the limit.
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", "60"))
+LOGIN_IP_WINDOW_SECONDS = float(os.getenv("LOGIN_IP_WINDOW_SECONDS", "60"))
+# Failed logins per username; a successful login clears them. 0 disables the limit.
+LOGIN_USERNAME_LIMIT = int(os.getenv("LOGIN_USERNAME_LIMIT", "10"))
+LOGIN_USERNAME_WINDOW_SECONDS = float(os.getenv("LOGIN_USERNAME_WINDOW_SECONDS", "300"))
+# Keys tracked per process by the local backend; the least recently used are dropped beyond this
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# (window index, count in that window, count in the window before)
+Counts = Tuple[int, int, int]
+
+def _roll(counts: Optional[Counts], window: int) -> Counts:
+    """`counts` moved forward to `window`, dropping what is now too old to matter."""
+    if counts is None or counts[0] < window - 1:
+        return (window, 0, 0)
+    if counts[0] == window - 1:
+        return (window, 0, counts[1])
+    return counts
+
+class LocalRateLimitBackend:
+    """Counters in a TTLCache: three ints per key, gone two windows after the last attempt."""
+
+    def __init__(self):
+        self._counts = TTLCache("rate_limits", maxsize=RATE_LIMIT_MAX_KEYS, ttl=3600)
+        self._lock = threading.Lock()
+
+    async def add(self, key: str, window: int, window_seconds: float, amount: int) -> Counts:
+        with self._lock:
+            counts = _roll(self._counts.get(key), window)
+            if amount:
+                counts = (window, counts[1] + amount, counts[2])
+                self._counts.set(key, counts, ttl=2 * window_seconds)
+            return counts
+
+    async def reset(self, key: str):
+        self._counts.delete(key)
+
+class PostgresRateLimitBackend:
+    """Counters shared by all workers, updated with one upsert per attempt."""
+
+    def __init__(self):
+        self._pruned_at = 0.0
+
+    async def add(self, key: str, window: int, window_seconds: float, amount: int) -> Counts:
+        table = models.RateLimitWindow.__table__
+        async with async_engine.begin() as conn:
+            if not amount:
+                row = (await conn.execute(select(table.c.window_index, table.c.current, table.c.previous).where(table.c.key == key))).first()
+                return _roll(tuple(row) if row else None, window)
+            expires_at = datetime.utcfromtimestamp((window + 2) * window_seconds)
+            stmt = insert(table).values(key=key, window_index=window, current=amount, previous=0, expires_at=expires_at)
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.key], set_={
+                "previous": case((table.c.window_index == window, table.c.previous), (table.c.window_index == window - 1, table.c.current), else_=0),
+                "current": case((table.c.window_index == window, table.c.current + amount), else_=amount),
+                "window_index": window,
+                "expires_at": expires_at,
+            })
+            current, previous = (await conn.execute(stmt.returning(table.c.current, table.c.previous))).one()
+            if time.monotonic() - self._pruned_at > 60:
+                self._pruned_at = time.monotonic()
+                await conn.execute(delete(table).where(table.c.expires_at < datetime.utcnow()))
+            return (window, current, previous)
+
+    async def reset(self, key: str):
+        table = models.RateLimitWindow.__table__
+        async with async_engine.begin() as conn:
+            await conn.execute(delete(table).where(table.c.key == key))
+
+def _make_backend(name: str):
+    if name == "local":
+        return LocalRateLimitBackend()
+    if name == "postgres":
+        return PostgresRateLimitBackend()
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+backend = _make_backend(RATE_LIMIT_BACKEND)
+
+class RateLimiter:
+    """A sliding-window limit of `limit` events per `window_seconds` for each key.
+
+    The window is approximated from the counts of the current and previous fixed windows, the
+    previous one weighted by how much of it still overlaps: constant memory per key, and within
+    a few percent of an exact log of timestamps.
+    """
+
+    def __init__(self, name: str, limit: int, window_seconds: float):
+        self.name = name
+        self.limit = limit
+        self.window_seconds = window_seconds
+
+    def _retry_after(self, counts: Counts, now: float) -> Optional[int]:
+        """Seconds until the counts, which include the attempt being made, fall within the limit."""
+        window, current, previous = counts
+        elapsed = now / self.window_seconds - window
+        if previous * (1 - elapsed) + current <= self.limit:
+            return None
+        if current <= self.limit:
+            # Allowed once enough of the previous window has slid out
+            wait = 1 - (self.limit - current) / previous - elapsed
+        else:
+            # Not before the next window, and then only once enough of this one has slid out
+            wait = 1 - elapsed + 1 - self.limit / current
+        return max(1, math.ceil(round(wait * self.window_seconds, 6)))
+
+    async def hit(self, key: str) -> Optional[int]:
+        """Count an event for `key`; the seconds to wait when it is over the limit, else None."""
+        if self.limit <= 0:
+            return None
+        now = time.time()
+        counts = await backend.add(f"{self.name}:{key}", int(now // self.window_seconds), self.window_seconds, 1)
+        return self._retry_after(counts, now)
+
+    async def check(self, key: str) -> Optional[int]:
+        """Like hit, without counting: whether one more event for `key` would be over the limit."""
+        if self.limit <= 0:
+            return None
+        now = time.time()
+        window, current, previous = await backend.add(f"{self.name}:{key}", int(now // self.window_seconds), self.window_seconds, 0)
+        return self._retry_after((window, current + 1, previous), now)
+
+    async def reset(self, key: str):
+        await backend.reset(f"{self.name}:{key}")
+
+login_ip_limiter = RateLimiter("login_ip", LOGIN_IP_LIMIT, LOGIN_IP_WINDOW_SECONDS)
+login_username_limiter = RateLimiter("login_username", LOGIN_USERNAME_LIMIT, LOGIN_USERNAME_WINDOW_SECONDS)
+
+def _too_many_attempts(retry_after: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many login attempts, please retry later",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+def _username_key(username: str) -> str:
+    return username.strip().lower()
+
+async def guard_login(client_ip: str, username: str):
+    """Raise 429 before any database or bcrypt work when the IP or username is over its limit."""
+    retry_after = await login_ip_limiter.hit(client_ip) or await login_username_limiter.check(_username_key(username))
+    if retry_after:
+        raise _too_many_attempts(retry_after)
+
+async def login_failed(username: str):
+    await login_username_limiter.hit(_username_key(username))
+
+async def login_succeeded(username: str):
+    await login_username_limiter.reset(_username_key(username))
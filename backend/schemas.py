@@ -1,6 +1,12 @@
-from pydantic import BaseModel, EmailStr
-from datetime import datetime
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from datetime import date, datetime
+from typing import Generic, List, Literal, Optional, TypeVar
+
+T = TypeVar("T")
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
 
 class SupplierBase(BaseModel):
     supplier_name: str
@@ -47,6 +53,14 @@ class VehicleEntry(VehicleEntryBase):
 class VehicleEntryWithSupplier(VehicleEntry):
     supplier: Supplier
 
+class VehicleEntryFilters(BaseModel):
+    vehicle_number: Optional[str] = None
+    supplier_id: Optional[int] = None
+    bill_no: Optional[str] = None
+    arrival_from: Optional[datetime] = None
+    arrival_to: Optional[datetime] = None
+    search: Optional[str] = None
+
 class LabTestBase(BaseModel):
     vehicle_entry_id: int
     test_date: Optional[datetime] = None
@@ -77,6 +91,10 @@ class LabTestCreate(LabTestBase):
 
 class LabTest(LabTestBase):
     id: int
+    grade: Optional[str] = None
+    deduction_percent: Optional[float] = None
+    is_rejected: Optional[bool] = None
+    rejection_reasons: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
@@ -86,6 +104,17 @@ class LabTest(LabTestBase):
 class LabTestWithVehicle(LabTest):
     vehicle_entry: VehicleEntryWithSupplier
 
+class LabTestFilters(VehicleEntryFilters):
+    vehicle_entry_id: Optional[int] = None
+    tested_from: Optional[datetime] = None
+    tested_to: Optional[datetime] = None
+    moisture_min: Optional[float] = None
+    moisture_max: Optional[float] = None
+    protein_percent_min: Optional[float] = None
+    protein_percent_max: Optional[float] = None
+    falling_number_min: Optional[int] = None
+    falling_number_max: Optional[int] = None
+
 class UserBase(BaseModel):
     username: str
     email: EmailStr
@@ -122,3 +151,122 @@ class TokenData(BaseModel):
 class LoginRequest(BaseModel):
     username: str
     password: str
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class ImportResult(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool
+    # Set when the file could not be read to the end; the rows before that point are imported
+    file_error: Optional[str] = None
+
+class DashboardQuality(BaseModel):
+    days: int
+    sample_size: int
+    moisture: Optional[float] = None
+    protein_percent: Optional[float] = None
+    falling_number: Optional[float] = None
+    total_impurities: Optional[float] = None
+    total_dockage: Optional[float] = None
+
+class RecentArrival(BaseModel):
+    id: int
+    vehicle_number: str
+    supplier_name: str
+    arrival_time: Optional[datetime] = None
+    lab_tested: bool
+
+class DashboardSummary(BaseModel):
+    suppliers: int
+    vehicle_entries: int
+    lab_tests: int
+    arrivals_today: int
+    pending_lab_tests: int
+    quality: DashboardQuality
+    recent_arrivals: List[RecentArrival]
+    generated_at: datetime
+
+class SupplierQualityRollup(BaseModel):
+    supplier_id: int
+    supplier_name: str
+    period: str
+    period_start: date
+    parameter: str
+    count: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p10: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    out_of_spec_count: int
+    out_of_spec_rate: float
+
+class GradeSpec(BaseModel):
+    grade: str
+    rank: int
+    parameter: str
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+class DeductionSpec(BaseModel):
+    parameter: str
+    direction: Literal["above", "below"] = "above"
+    tolerance: float
+    rate: float
+    reject_limit: Optional[float] = None
+
+class GradingSpecs(BaseModel):
+    grades: List[GradeSpec]
+    deductions: List[DeductionSpec]
+
+class RegradeResult(BaseModel):
+    regraded: int
+    seconds: float
+
+class BatchGet(BaseModel):
+    ids: List[int]
+
+class SyncDeletion(BaseModel):
+    entity: str
+    id: int
+    deleted_at: datetime
+
+class SyncChanges(BaseModel):
+    suppliers: List[Supplier]
+    vehicle_entries: List[VehicleEntry]
+    lab_tests: List[LabTest]
+    deletions: List[SyncDeletion]
+    next_token: str
+    has_more: bool
+    reset: bool
+
+# Client ids are stored in String(64) columns
+CLIENT_ID_MAX_LENGTH = 64
+
+class SyncVehicleEntry(VehicleEntryCreate):
+    client_id: str = Field(max_length=CLIENT_ID_MAX_LENGTH)
+
+class SyncLabTest(LabTestBase):
+    client_id: str = Field(max_length=CLIENT_ID_MAX_LENGTH)
+    # Either the server id, or the client_id of a vehicle entry recorded offline
+    vehicle_entry_id: Optional[int] = None
+    vehicle_client_id: Optional[str] = Field(None, max_length=CLIENT_ID_MAX_LENGTH)
+
+class SyncUpload(BaseModel):
+    vehicle_entries: List[SyncVehicleEntry] = []
+    lab_tests: List[SyncLabTest] = []
+
+class SyncUploadItem(BaseModel):
+    client_id: str
+    id: Optional[int] = None
+    status: Literal["created", "duplicate", "error"]
+    detail: Optional[str] = None
+
+class SyncUploadResult(BaseModel):
+    vehicle_entries: List[SyncUploadItem]
+    lab_tests: List[SyncUploadItem]
@@ -0,0 +1,51 @@
+from typing import Iterable, List, Union
+
+from fastapi.responses import ORJSONResponse
+
+import models
+import queries
+import schemas
+
+SHAPES = ("nested", "sideloaded")
+
+def _fields(model, schema) -> List[str]:
+    return [column.key for column in queries.columns_for(model, schema)]
+
+SUPPLIER_FIELDS = _fields(models.Supplier, schemas.Supplier)
+VEHICLE_ENTRY_FIELDS = _fields(models.VehicleEntry, schemas.VehicleEntry)
+LAB_TEST_FIELDS = _fields(models.LabTest, schemas.LabTest)
+
+def _row(obj, fields: List[str]) -> dict:
+    return {field: getattr(obj, field) for field in fields}
+
+def _unique(objects: Iterable, fields: List[str]) -> List[dict]:
+    seen = {}
+    for obj in objects:
+        if obj.id not in seen:
+            seen[obj.id] = _row(obj, fields)
+    return list(seen.values())
+
+def _page(result: Union[list, dict]):
+    if isinstance(result, dict):
+        return result["items"], result["next_cursor"]
+    return result, None
+
+def sideload_vehicle_entries(result: Union[list, dict]) -> ORJSONResponse:
+    """A vehicle entry page with each supplier listed once instead of nested in every row."""
+    items, next_cursor = _page(result)
+    return ORJSONResponse({
+        "items": [_row(vehicle, VEHICLE_ENTRY_FIELDS) for vehicle in items],
+        "suppliers": _unique((vehicle.supplier for vehicle in items), SUPPLIER_FIELDS),
+        "next_cursor": next_cursor,
+    })
+
+def sideload_lab_tests(result: Union[list, dict]) -> ORJSONResponse:
+    """A lab test page with each vehicle entry and supplier listed once; rows refer to them by id."""
+    items, next_cursor = _page(result)
+    vehicles = [lab_test.vehicle_entry for lab_test in items]
+    return ORJSONResponse({
+        "items": [_row(lab_test, LAB_TEST_FIELDS) for lab_test in items],
+        "vehicle_entries": _unique(vehicles, VEHICLE_ENTRY_FIELDS),
+        "suppliers": _unique((vehicle.supplier for vehicle in vehicles), SUPPLIER_FIELDS),
+        "next_cursor": next_cursor,
+    })
@@ -0,0 +1,201 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, insert, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+
+import analytics
+import grading
+import models
+import queries
+import schemas
+
+# Rows per entity in one /api/sync response; clients call again while has_more is true
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "500"))
+# Rows changed in the last few seconds wait for the next sync, so a transaction that commits
+# a little after its updated_at timestamp is not skipped by a watermark that has moved past it.
+# Bulk writers (imports, regrade) stamp each batch just before writing it and commit it right away.
+SYNC_SETTLE_SECONDS = float(os.getenv("SYNC_SETTLE_SECONDS", "2"))
+# Tombstones older than this are pruned; clients that last synced before then start over
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.getenv("SYNC_TOMBSTONE_RETENTION_DAYS", "30"))
+SYNC_UPLOAD_MAX_ITEMS = int(os.getenv("SYNC_UPLOAD_MAX_ITEMS", "500"))
+
+# Response key -> (model, schema); the key doubles as the tombstone entity name
+ENTITIES = {
+    "suppliers": (models.Supplier, schemas.Supplier),
+    "vehicle_entries": (models.VehicleEntry, schemas.VehicleEntry),
+    "lab_tests": (models.LabTest, schemas.LabTest),
+}
+DELETIONS = "deletions"
+
+Watermark = Optional[Tuple[datetime, int]]
+
+def encode_token(watermarks: Dict[str, Watermark]) -> str:
+    payload = {name: [mark[0].isoformat(), mark[1]] if mark else None for name, mark in watermarks.items()}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_token(token: Optional[str]) -> Dict[str, Watermark]:
+    names = (*ENTITIES, DELETIONS)
+    if not token:
+        return dict.fromkeys(names)
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return {
+            name: (datetime.fromisoformat(payload[name][0]), int(payload[name][1])) if payload.get(name) else None
+            for name in names
+        }
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+async def _changed_since(db: AsyncSession, stmt, columns, watermark: Watermark, horizon: datetime):
+    """Rows after `watermark` in (timestamp, id) order, up to the settle horizon, one page at most."""
+    stmt = stmt.where(columns[0] <= horizon)
+    if watermark:
+        stmt = stmt.where(tuple_(*columns) > tuple_(*watermark))
+    rows = (await db.scalars(stmt.order_by(*columns).limit(SYNC_PAGE_SIZE + 1))).all()
+    return rows[:SYNC_PAGE_SIZE], len(rows) > SYNC_PAGE_SIZE
+
+async def changes(db: AsyncSession, token: Optional[str]) -> dict:
+    """Everything created, updated or deleted since `token`, plus the token for the next call.
+
+    Each entity keeps its own (updated_at, id) watermark, so a page of lab tests never holds back
+    suppliers. A missing token, or one older than the tombstone retention, is a full resync and
+    `reset` tells the client to clear its local copy first.
+    """
+    now = datetime.utcnow()
+    watermarks = decode_token(token)
+    deletions_mark = watermarks[DELETIONS]
+    reset = not token or (
+        deletions_mark is not None and deletions_mark[0] < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    )
+    if reset:
+        watermarks = dict.fromkeys(watermarks)
+    horizon = now - timedelta(seconds=SYNC_SETTLE_SECONDS)
+
+    result = {"reset": reset, "has_more": False}
+    for name, (model, schema) in ENTITIES.items():
+        columns = (model.updated_at, model.id)
+        stmt = select(model).options(load_only(*queries.columns_for(model, schema)))
+        rows, more = await _changed_since(db, stmt, columns, watermarks[name], horizon)
+        if rows:
+            watermarks[name] = (rows[-1].updated_at, rows[-1].id)
+        result[name] = rows
+        result["has_more"] |= more
+
+    tombstone = models.SyncTombstone
+    if reset:
+        # A client starting over has nothing to delete; skip straight to the newest tombstone
+        latest = (await db.execute(
+            select(tombstone.deleted_at, tombstone.id).order_by(tombstone.deleted_at.desc(), tombstone.id.desc()).limit(1)
+        )).first()
+        rows, more = [], False
+        watermarks[DELETIONS] = tuple(latest) if latest else (now, 0)
+    else:
+        rows, more = await _changed_since(
+            db, select(tombstone), (tombstone.deleted_at, tombstone.id), watermarks[DELETIONS], horizon
+        )
+        if rows:
+            watermarks[DELETIONS] = (rows[-1].deleted_at, rows[-1].id)
+        elif watermarks[DELETIONS] is None:
+            watermarks[DELETIONS] = (now, 0)
+    result[DELETIONS] = [{"entity": row.entity, "id": row.entity_id, "deleted_at": row.deleted_at} for row in rows]
+    result["has_more"] |= more
+    result["next_token"] = encode_token(watermarks)
+    return result
+
+async def record_deletion(db: AsyncSession, entity: str, entity_id: int):
+    """Add a tombstone in the caller's transaction and prune the expired ones."""
+    now = datetime.utcnow()
+    db.add(models.SyncTombstone(entity=entity, entity_id=entity_id, deleted_at=now))
+    await db.execute(delete(models.SyncTombstone).where(
+        models.SyncTombstone.deleted_at < now - timedelta(days=SYNC_TOMBSTONE_RETENTION_DAYS)
+    ))
+
+def _existing(db: Session, column, values) -> dict:
+    """Map each value in `values` found in `column` to its row id."""
+    values = {value for value in values if value is not None}
+    if not values:
+        return {}
+    model = column.class_
+    return dict(db.execute(select(column, model.id).where(column.in_(values))).all())
+
+def _insert(db: Session, model, rows: List[dict]) -> dict:
+    """INSERT the rows in one executemany and map their client_id to the new id."""
+    if not rows:
+        return {}
+    table = model.__table__
+    return {client_id: id for id, client_id in db.execute(insert(table).returning(table.c.id, table.c.client_id), rows)}
+
+def _upload(db: Session, payload: schemas.SyncUpload) -> dict:
+    now = datetime.utcnow()
+    vehicle_results, lab_results = [], []
+
+    vehicle_ids = _existing(db, models.VehicleEntry.client_id, [v.client_id for v in payload.vehicle_entries])
+    supplier_ids = _existing(db, models.Supplier.id, [v.supplier_id for v in payload.vehicle_entries])
+    new_vehicles, seen = [], set(vehicle_ids)
+    for vehicle in payload.vehicle_entries:
+        if vehicle.client_id in seen:
+            vehicle_results.append({"client_id": vehicle.client_id, "id": vehicle_ids.get(vehicle.client_id), "status": "duplicate"})
+        elif vehicle.supplier_id not in supplier_ids:
+            vehicle_results.append({"client_id": vehicle.client_id, "status": "error", "detail": "Supplier not found"})
+        else:
+            values = vehicle.model_dump()
+            values["arrival_time"] = values["arrival_time"] or now
+            new_vehicles.append(values)
+            vehicle_results.append({"client_id": vehicle.client_id, "status": "created"})
+        seen.add(vehicle.client_id)
+    vehicle_ids.update(_insert(db, models.VehicleEntry, new_vehicles))
+
+    # Lab tests may point at a vehicle recorded offline in this or an earlier upload
+    vehicle_ids.update(_existing(db, models.VehicleEntry.client_id, [t.vehicle_client_id for t in payload.lab_tests]))
+    known_vehicles = _existing(db, models.VehicleEntry.id, [t.vehicle_entry_id for t in payload.lab_tests])
+    lab_ids = _existing(db, models.LabTest.client_id, [t.client_id for t in payload.lab_tests])
+    new_tests, seen = [], set(lab_ids)
+    for test in payload.lab_tests:
+        vehicle_id = test.vehicle_entry_id if test.vehicle_entry_id in known_vehicles else vehicle_ids.get(test.vehicle_client_id)
+        if test.client_id in seen:
+            lab_results.append({"client_id": test.client_id, "id": lab_ids.get(test.client_id), "status": "duplicate"})
+        elif vehicle_id is None:
+            lab_results.append({"client_id": test.client_id, "status": "error", "detail": "Vehicle entry not found"})
+        else:
+            values = test.model_dump(exclude={"vehicle_client_id"})
+            values["vehicle_entry_id"] = vehicle_id
+            values["test_date"] = values["test_date"] or now
+            new_tests.append(values)
+            lab_results.append({"client_id": test.client_id, "status": "created"})
+        seen.add(test.client_id)
+    grading.grade_records(new_tests, grading.load_specs(db))
+    lab_ids.update(_insert(db, models.LabTest, new_tests))
+    db.commit()
+
+    for result in vehicle_results:
+        result.setdefault("id", vehicle_ids.get(result["client_id"]) if result["status"] == "created" else None)
+    for result in lab_results:
+        result.setdefault("id", lab_ids.get(result["client_id"]) if result["status"] == "created" else None)
+    analytics.refresh_after_insert(db, [(values["vehicle_entry_id"], values["test_date"]) for values in new_tests])
+    return {"vehicle_entries": vehicle_results, "lab_tests": lab_results}
+
+async def upload(db: AsyncSession, payload: schemas.SyncUpload) -> dict:
+    """Insert entries queued on a device while offline, skipping client_ids already stored.
+
+    Retrying an upload is safe: entries that made it the first time come back as duplicates.
+    Two devices racing on the same client_id make one INSERT fail; it is retried once, by which
+    time the other device's rows are found as duplicates.
+    """
+    if len(payload.vehicle_entries) + len(payload.lab_tests) > SYNC_UPLOAD_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {SYNC_UPLOAD_MAX_ITEMS} entries per upload")
+    for attempt in range(2):
+        try:
+            # Grading and the rollup refresh are sync code; run_sync runs them on this session's connection
+            return await db.run_sync(_upload, payload)
+        except IntegrityError:
+            await db.rollback()
+            if attempt:
+                raise
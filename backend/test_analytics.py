@@ -0,0 +1,83 @@
+import io
+from datetime import date, datetime
+
+import analytics
+import imports
+import models
+from conftest import seed_vehicle
+
+def add_test(client, headers, vehicle, test_date, **results):
+    response = client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id, "test_date": test_date, **results}, headers=headers)
+    assert response.status_code == 200
+
+def rollups(client, headers, **params):
+    response = client.get("/api/analytics/supplier-quality", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_lab_tests_refresh_daily_and_weekly_rollups(client, db, admin_headers):
+    supplier, vehicle = seed_vehicle(db)
+    # 2025-10-06 is a Monday, so all three fall in one week and two days
+    add_test(client, admin_headers, vehicle, "2025-10-06T09:00:00", moisture=11.0, protein_percent=12.0)
+    add_test(client, admin_headers, vehicle, "2025-10-06T15:00:00", moisture=13.0)
+    add_test(client, admin_headers, vehicle, "2025-10-08T10:00:00", moisture=12.5)
+
+    daily = rollups(client, admin_headers, period="day", parameter="moisture")
+    assert [(row["period_start"], row["count"]) for row in daily] == [("2025-10-08", 1), ("2025-10-06", 2)]
+    assert daily[1]["mean"] == 12.0
+    assert daily[1]["out_of_spec_count"] == 1
+    assert daily[1]["out_of_spec_rate"] == 0.5
+    assert daily[1]["supplier_name"] == "ABC Traders"
+
+    [weekly] = rollups(client, admin_headers, period="week", parameter="moisture", supplier_id=supplier.id)
+    assert weekly["period_start"] == "2025-10-06"
+    assert weekly["count"] == 3
+    assert (weekly["min"], weekly["p50"], weekly["max"]) == (11.0, 12.5, 13.0)
+    assert weekly["p90"] == 12.9
+
+    protein = rollups(client, admin_headers, period="week", parameter="protein_percent")
+    assert [row["count"] for row in protein] == [1]
+
+def test_out_of_spec_follows_saved_specs(client, db, admin_headers):
+    _, vehicle = seed_vehicle(db)
+    add_test(client, admin_headers, vehicle, "2025-10-06T09:00:00", moisture=11.0)
+    add_test(client, admin_headers, vehicle, "2025-10-06T15:00:00", moisture=13.0)
+    # Deductions start above 12% moisture by default
+    [daily] = rollups(client, admin_headers, period="day", parameter="moisture")
+    assert daily["out_of_spec_count"] == 1
+
+    specs = client.get("/api/grading/specs", headers=admin_headers).json()
+    for spec in specs["deductions"]:
+        if spec["parameter"] == "moisture":
+            spec["tolerance"] = 10.5
+    assert client.put("/api/grading/specs", json=specs, headers=admin_headers).status_code == 200
+    [daily] = rollups(client, admin_headers, period="day", parameter="moisture")
+    assert daily["out_of_spec_count"] == 2
+
+def test_rollup_date_filters(client, db, admin_headers):
+    _, vehicle = seed_vehicle(db)
+    add_test(client, admin_headers, vehicle, "2025-10-06T09:00:00", moisture=11.0)
+    add_test(client, admin_headers, vehicle, "2025-10-20T09:00:00", moisture=11.0)
+    rows = rollups(client, admin_headers, period="week", date_from="2025-10-15", date_to="2025-10-31")
+    assert {row["period_start"] for row in rows} == {"2025-10-20"}
+
+def test_import_and_rebuild_match_incremental_rollups(db):
+    _, vehicle = seed_vehicle(db)
+    content = "".join(f"{vehicle.id},2025-10-0{1 + i % 7}T08:00:00,{10 + i % 5}\n" for i in range(50))
+    imports.import_file(db, "lab-tests", io.BytesIO(("vehicle_entry_id,test_date,moisture\n" + content).encode()), "csv", batch_size=7)
+
+    def snapshot():
+        return sorted(
+            (r.period, r.period_start, r.parameter, r.count, r.mean, r.p90, r.out_of_spec_count)
+            for r in db.query(models.SupplierQualityRollup)
+        )
+
+    incremental = snapshot()
+    assert sum(count for period, _, _, count, *_ in incremental if period == "day") == 50
+    analytics.rebuild(db)
+    assert snapshot() == incremental
+
+def test_percentile_interpolates():
+    assert analytics.percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert analytics.percentile([5.0], 0.9) == 5.0
+    assert analytics.period_start("week", date(2025, 10, 12)) == date(2025, 10, 6)
@@ -0,0 +1,84 @@
+import auth
+import models
+from conftest import count_statements
+
+def create_clerk(client, admin_headers):
+    response = client.post("/api/users", json={
+        "username": "clerk", "email": "clerk@gateentry.com", "full_name": "Gate Clerk", "password": "secret123",
+    }, headers=admin_headers)
+    assert response.status_code == 200
+    headers = {"Authorization": f"Bearer {auth.create_access_token(data={'sub': 'clerk'})}"}
+    return response.json(), headers
+
+def test_repeated_requests_skip_the_users_query(client, db, admin_headers):
+    client.get("/api/auth/me", headers=admin_headers)
+    with count_statements() as statements:
+        for _ in range(5):
+            assert client.get("/api/auth/me", headers=admin_headers).status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+    assert auth.user_cache.hits >= 5
+
+def test_deactivation_takes_effect_immediately(client, db, admin_headers):
+    clerk, clerk_headers = create_clerk(client, admin_headers)
+    assert client.get("/api/suppliers", headers=clerk_headers).status_code == 200
+
+    client.put(f"/api/users/{clerk['id']}", json={"is_active": False}, headers=admin_headers)
+    assert client.get("/api/suppliers", headers=clerk_headers).status_code == 400
+
+def test_role_change_and_delete_take_effect_immediately(client, db, admin_headers):
+    clerk, clerk_headers = create_clerk(client, admin_headers)
+    assert client.get("/api/users", headers=clerk_headers).status_code == 403
+
+    client.put(f"/api/users/{clerk['id']}", json={"role": "admin"}, headers=admin_headers)
+    assert client.get("/api/users", headers=clerk_headers).status_code == 200
+
+    client.delete(f"/api/users/{clerk['id']}", headers=admin_headers)
+    assert client.get("/api/suppliers", headers=clerk_headers).status_code == 401
+
+def test_cache_metrics(client, db, admin_headers):
+    client.get("/api/auth/me", headers=admin_headers)
+    stats = client.get("/api/metrics/cache", headers=admin_headers).json()["users"]
+    assert stats["hits"] >= 1
+    assert 0 < stats["hit_rate"] <= 1
+
+def login(client, username, password):
+    response = client.post("/api/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def test_claims_tokens_skip_verification_and_the_users_query(client, db, admin_headers):
+    headers = login(client, "admin", "admin123")
+    client.get("/api/users", headers=headers)
+    hits = auth.token_cache.hits
+    with count_statements() as statements:
+        for _ in range(5):
+            assert client.get("/api/metrics/cache", headers=headers).status_code == 200
+    assert statements == []
+    assert auth.token_cache.hits >= hits + 5
+
+def test_role_change_retires_claims_tokens(client, db, admin_headers):
+    clerk, _ = create_clerk(client, admin_headers)
+    clerk_headers = login(client, "clerk", "secret123")
+    assert client.get("/api/users", headers=clerk_headers).status_code == 403
+
+    client.put(f"/api/users/{clerk['id']}", json={"role": "admin"}, headers=admin_headers)
+    assert client.get("/api/users", headers=clerk_headers).status_code == 401
+    assert client.get("/api/users", headers=login(client, "clerk", "secret123")).status_code == 200
+
+def test_logout_refresh_and_logout_all(client, db, admin_headers):
+    create_clerk(client, admin_headers)
+    headers = login(client, "clerk", "secret123")
+    other_device = login(client, "clerk", "secret123")
+
+    refreshed = client.post("/api/auth/refresh", headers=headers)
+    assert refreshed.status_code == 200
+    assert client.get("/api/suppliers", headers=headers).status_code == 401
+    headers = {"Authorization": f"Bearer {refreshed.json()['access_token']}"}
+    assert client.get("/api/suppliers", headers=headers).status_code == 200
+
+    assert client.post("/api/auth/logout", headers=headers).status_code == 200
+    assert client.get("/api/suppliers", headers=headers).status_code == 401
+    assert db.query(models.RevokedToken).count() == 2
+
+    assert client.post("/api/auth/logout-all", headers=other_device).status_code == 200
+    assert client.get("/api/suppliers", headers=other_device).status_code == 401
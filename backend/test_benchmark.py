@@ -0,0 +1,22 @@
+import asyncio
+
+import benchmark
+
+def test_benchmark_seeds_and_reports_percentiles(db):
+    ids = benchmark.seed(db, suppliers=3, vehicles=20, lab_tests=10, photos=1)
+    assert len(ids["vehicle_ids"]) == 20
+    assert len(ids["lab_test_ids"]) == 10
+
+    scenarios = ["vehicles.list", "lab_tests.detail", "photos.thumb", "lab_tests.create"]
+    results = asyncio.run(benchmark.run(ids, scenarios, requests=8, concurrency=2))
+    for name in scenarios:
+        assert results[name]["requests"] == 8
+        assert results[name]["errors"] == 0
+        assert results[name]["p50_ms"] <= results[name]["p95_ms"] <= results[name]["p99_ms"] <= results[name]["max_ms"]
+
+    regrade = asyncio.run(benchmark.run(ids, ["grading.regrade"], requests=8, concurrency=2))["grading.regrade"]
+    assert (regrade["requests"], regrade["concurrency"], regrade["errors"]) == (1, 1, 0)
+
+    slower = {name: {**result, "p95_ms": result["p95_ms"] * 2} for name, result in results.items()}
+    assert benchmark.compare(results, slower) == []
+    assert len(benchmark.compare(slower, results)) == len(scenarios)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+import models
+from conftest import count_statements, seed_filter_data
+
+def test_summary_counts_and_averages(client, db, admin_headers):
+    abc, _ = seed_filter_data(db)
+    untested = models.VehicleEntry(vehicle_number="MH12ZZ0001", supplier=abc, bill_no="INV-200", arrival_time=datetime.utcnow())
+    db.add(untested)
+    db.commit()
+
+    response = client.get("/api/dashboard/summary", headers=admin_headers)
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["suppliers"] == 2
+    assert summary["vehicle_entries"] == 4
+    assert summary["lab_tests"] == 3
+    assert summary["arrivals_today"] == 1
+    assert summary["pending_lab_tests"] == 1
+    assert summary["quality"]["sample_size"] == 3
+    assert summary["quality"]["moisture"] == (11.0 + 13.5 + 12.0) / 3
+    assert summary["recent_arrivals"][0] == {
+        "id": untested.id, "vehicle_number": "MH12ZZ0001", "supplier_name": "ABC Traders",
+        "arrival_time": untested.arrival_time.isoformat(), "lab_tested": False,
+    }
+    assert [arrival["lab_tested"] for arrival in summary["recent_arrivals"]] == [False, True, True, True]
+
+def test_summary_is_cached(client, db, admin_headers):
+    seed_filter_data(db)
+    client.get("/api/dashboard/summary", headers=admin_headers)
+    with count_statements() as statements:
+        response = client.get("/api/dashboard/summary", headers=admin_headers)
+    assert response.json()["vehicle_entries"] == 3
+    assert statements == []
+
+def test_summary_of_empty_database(client, db, admin_headers):
+    summary = client.get("/api/dashboard/summary", headers=admin_headers).json()
+    assert summary["vehicle_entries"] == 0
+    assert summary["quality"]["moisture"] is None
+    assert summary["recent_arrivals"] == []
@@ -0,0 +1,56 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+import database
+import main
+
+def test_pool_metrics(client, db, admin_headers):
+    client.get("/api/suppliers", headers=admin_headers)
+    response = client.get("/api/metrics/db-pool", headers=admin_headers)
+    assert response.status_code == 200
+    metrics = response.json()
+    assert metrics["async"]["pool"] == "TimedAsyncQueuePool"
+    assert metrics["async"]["size"] == database.DB_POOL_SIZE
+    assert metrics["async"]["checkouts"] >= 1
+    assert metrics["sync"]["checked_out"] == 0
+
+def test_pools_share_the_connection_budget_between_workers():
+    assert database.pool_limits(80, 1) == (10, 20)
+    for workers in (2, 4, 8):
+        pool_size, max_overflow = database.pool_limits(80, workers)
+        assert workers * database.ENGINES_PER_WORKER * (pool_size + max_overflow) <= 80
+        assert pool_size >= 1
+    assert database.pool_limits(80, 2) == (10, 10)
+
+def test_pool_metrics_require_admin(client, db):
+    assert client.get("/api/metrics/db-pool").status_code == 401
+
+def test_checkout_timeout_is_counted(tmp_path):
+    stats = database.TimedQueuePool.stats
+    before = stats.snapshot()["timeouts"]
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=database.TimedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.05,
+    )
+    try:
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        status = database.pool_status(engine.pool)
+        assert status["timeouts"] == before + 1
+        assert status["wait_seconds_max"] >= 0.05
+    finally:
+        engine.dispose()
+
+def test_pool_exhaustion_returns_503(client, db, admin_headers):
+    async def exhausted_pool():
+        raise exc.TimeoutError("QueuePool limit reached")
+        yield
+
+    main.app.dependency_overrides[database.get_async_db] = exhausted_pool
+    try:
+        response = client.get("/api/suppliers", headers=admin_headers)
+    finally:
+        main.app.dependency_overrides.clear()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,93 @@
+import asyncio
+
+import events
+from conftest import seed_vehicle
+
+def collect(broker, since, count, types=None):
+    async def run():
+        received = []
+        async for event in broker.stream(since, types):
+            received.append(event)
+            if len(received) == count:
+                break
+        return received
+    return run()
+
+def test_broker_resumes_from_sequence_number():
+    async def run():
+        broker = events.EventBroker(events.LocalEventBackend(), buffer_size=3)
+        for number in range(5):
+            broker.publish(events.LAB_TEST_CREATED, {"id": number})
+
+        # Events 3..5 are still buffered
+        resumed = await collect(broker, 3, 2)
+        assert [event["seq"] for event in resumed] == [4, 5]
+        # Event 2 has left the buffer, so the client is told to reload instead
+        [reset] = await collect(broker, 1, 1)
+        assert reset["type"] == events.RESET
+        assert reset["seq"] == 5
+        # A sequence from before a restart is ahead of this process
+        [reset] = await collect(broker, 50, 1)
+        assert reset["type"] == events.RESET
+    asyncio.run(run())
+
+def test_broker_delivers_live_events_by_type():
+    async def run():
+        broker = events.EventBroker(events.LocalEventBackend())
+        received = asyncio.ensure_future(collect(broker, None, 1, [events.SUPPLIER_UPDATED]))
+        await asyncio.sleep(0)
+        broker.publish(events.LAB_TEST_CREATED, {"id": 1})
+        broker.publish(events.SUPPLIER_UPDATED, {"id": 2})
+        [event] = await asyncio.wait_for(received, 1)
+        assert event["type"] == events.SUPPLIER_UPDATED
+        assert event["data"] == {"id": 2}
+        assert not broker._subscribers
+    asyncio.run(run())
+
+def test_broker_delivers_out_of_order_events_in_seq_order():
+    async def run():
+        broker = events.EventBroker(events.LocalEventBackend(), gap_timeout=0.2)
+        event = lambda seq: {"seq": seq, "type": events.LAB_TEST_CREATED, "data": {"id": seq}}
+        received = asyncio.ensure_future(collect(broker, None, 4))
+        await asyncio.sleep(0)
+
+        # Two workers' notifications crossed: 2 is held back until 1 arrives
+        broker.dispatch(event(2))
+        assert broker.last_seq == 0
+        broker.dispatch(event(1))
+        assert broker.last_seq == 2
+        # 3 never arrives, so 4 is delivered once the gap times out, and a late 3 is dropped
+        broker.dispatch(event(4))
+        await asyncio.sleep(0.4)
+        broker.dispatch(event(3))
+        broker.dispatch(event(5))
+        assert [event["seq"] for event in await asyncio.wait_for(received, 1)] == [1, 2, 4, 5]
+
+        # The buffer is in seq order, so resuming from before the gap replays what came after it
+        assert [event["seq"] for event in await collect(broker, 1, 3)] == [2, 4, 5]
+    asyncio.run(run())
+
+def test_websocket_replays_handler_events(client, db, admin_headers):
+    supplier, vehicle = seed_vehicle(db)
+    since = events.broker.last_seq
+    response = client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id, "moisture": 10.5}, headers=admin_headers)
+    assert response.status_code == 200
+    response = client.put(f"/api/suppliers/{supplier.id}", json={"supplier_name": "ABC Agro", "state": "Maharashtra", "city": "Pune"}, headers=admin_headers)
+    assert response.status_code == 200
+
+    token = admin_headers["Authorization"].split()[1]
+    with client.websocket_connect(f"/api/events/ws?token={token}&since={since}") as websocket:
+        lab_test = websocket.receive_json()
+        assert lab_test["type"] == events.LAB_TEST_CREATED
+        assert lab_test["seq"] == since + 1
+        assert lab_test["data"]["vehicle_entry"]["vehicle_number"] == "MH12AB1234"
+        assert lab_test["data"]["grade"] == "A"
+        updated = websocket.receive_json()
+        assert updated["type"] == events.SUPPLIER_UPDATED
+        assert updated["data"]["supplier_name"] == "ABC Agro"
+
+        client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id}, headers=admin_headers)
+        assert websocket.receive_json()["seq"] == since + 3
+
+def test_event_stream_requires_token(client, db):
+    assert client.get("/api/events").status_code == 401
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+from openpyxl import load_workbook
+
+import exports
+from conftest import seed_filter_data
+
+def export(client, headers, path, **params):
+    response = client.get(path, params=params, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-disposition"].startswith("attachment;")
+    return response
+
+def test_lab_test_csv_export_joins_vehicle_and_supplier(client, db, admin_headers):
+    seed_filter_data(db)
+    response = export(client, admin_headers, "/api/lab-tests/export")
+    rows = list(csv.DictReader(io.StringIO(response.content.decode("utf-8-sig"))))
+    assert [row["vehicle_number"] for row in rows] == ["KA01EF9012", "MH14CD5678", "MH12AB1234"]
+    assert rows[0]["supplier_name"] == "XYZ Suppliers"
+    assert rows[0]["moisture"] == "12.0"
+    assert rows[0]["remarks"] == ""
+
+def test_exports_apply_list_filters(client, db, admin_headers):
+    abc, _ = seed_filter_data(db)
+    response = export(client, admin_headers, "/api/vehicles/export", format="ndjson", supplier_id=abc.id)
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["vehicle_number"] for record in records] == ["MH14CD5678", "MH12AB1234"]
+    assert records[0]["arrival_time"] == "2025-10-02T08:00:00"
+
+    response = export(client, admin_headers, "/api/lab-tests/export", format="ndjson", moisture_min=12)
+    assert sorted(json.loads(line)["vehicle_number"] for line in response.text.splitlines()) == ["KA01EF9012", "MH14CD5678"]
+
+def test_xlsx_export_splits_sheets_at_the_row_limit(client, db, admin_headers, monkeypatch):
+    seed_filter_data(db)
+    monkeypatch.setattr(exports, "XLSX_MAX_ROWS", 3)
+    response = export(client, admin_headers, "/api/lab-tests/export", format="xlsx")
+    workbook = load_workbook(io.BytesIO(response.content))
+    sheets = [list(sheet.values) for sheet in workbook.worksheets]
+    assert [len(rows) for rows in sheets] == [3, 2]
+    assert sheets[0][0][:3] == ("id", "vehicle_entry_id", "vehicle_number")
+
+def test_csv_export_streams_in_chunks(db, monkeypatch):
+    monkeypatch.setattr(exports, "EXPORT_ROWS_PER_CHUNK", 2)
+    chunks = list(exports.write_csv(["n"], iter([(i,) for i in range(5)])))
+    assert len(chunks) == 3
+    assert b"".join(chunks).decode("utf-8-sig").split() == ["n", "0", "1", "2", "3", "4"]
@@ -0,0 +1,38 @@
+from conftest import seed_filter_data
+
+def vehicle_numbers(client, headers, **params):
+    response = client.get("/api/vehicles", params=params, headers=headers)
+    assert response.status_code == 200
+    return sorted(row["vehicle_number"] for row in response.json())
+
+def lab_test_vehicles(client, headers, **params):
+    response = client.get("/api/lab-tests", params=params, headers=headers)
+    assert response.status_code == 200
+    return sorted(row["vehicle_entry"]["vehicle_number"] for row in response.json())
+
+def test_vehicle_filters(client, db, admin_headers):
+    abc, xyz = seed_filter_data(db)
+    assert vehicle_numbers(client, admin_headers, vehicle_number="mh1") == ["MH12AB1234", "MH14CD5678"]
+    assert vehicle_numbers(client, admin_headers, supplier_id=xyz.id) == ["KA01EF9012"]
+    assert vehicle_numbers(client, admin_headers, bill_no="INV-101") == ["MH14CD5678"]
+    assert vehicle_numbers(client, admin_headers, arrival_from="2025-10-02T00:00:00", arrival_to="2025-10-02T23:59:59") == ["MH14CD5678"]
+    assert vehicle_numbers(client, admin_headers, search="ef90") == ["KA01EF9012"]
+    assert vehicle_numbers(client, admin_headers, search="inv") == ["MH12AB1234", "MH14CD5678"]
+
+def test_search_treats_like_wildcards_literally(client, db, admin_headers):
+    seed_filter_data(db)
+    assert vehicle_numbers(client, admin_headers, search="_") == ["KA01EF9012"]
+    assert vehicle_numbers(client, admin_headers, search="%") == []
+
+def test_lab_test_parameter_ranges(client, db, admin_headers):
+    abc, xyz = seed_filter_data(db)
+    assert lab_test_vehicles(client, admin_headers, moisture_max=12.0) == ["KA01EF9012", "MH12AB1234"]
+    assert lab_test_vehicles(client, admin_headers, protein_percent_min=11.0, falling_number_min=320) == ["MH12AB1234"]
+    assert lab_test_vehicles(client, admin_headers, supplier_id=abc.id, moisture_min=12.0) == ["MH14CD5678"]
+
+def test_filters_combine_with_cursor_pages(client, db, admin_headers):
+    abc, xyz = seed_filter_data(db)
+    page = client.get("/api/vehicles", params={"supplier_id": abc.id, "cursor": "", "limit": 1}, headers=admin_headers).json()
+    second = client.get("/api/vehicles", params={"supplier_id": abc.id, "cursor": page["next_cursor"], "limit": 1}, headers=admin_headers).json()
+    assert [page["items"][0]["vehicle_number"], second["items"][0]["vehicle_number"]] == ["MH14CD5678", "MH12AB1234"]
+    assert second["next_cursor"] is None
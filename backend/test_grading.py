@@ -0,0 +1,92 @@
+import io
+
+import numpy as np
+
+import grading
+import imports
+import models
+from conftest import count_statements, seed_vehicle
+
+def create(client, headers, vehicle, **results):
+    response = client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id, **results}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_create_lab_test_is_graded_inline(client, db, admin_headers):
+    _, vehicle = seed_vehicle(db)
+    test = create(client, admin_headers, vehicle, moisture=10.5, protein_percent=12.5, falling_number=320,
+                  chaff_husk=0.25, stones=0.25, total_impurities=9.0)
+    # Totals are recomputed from their components, overriding the typed-in value
+    assert test["total_impurities"] == 0.5
+    assert test["grade"] == "A"
+    assert test["deduction_percent"] == 0
+    assert test["is_rejected"] is False
+
+    test = create(client, admin_headers, vehicle, moisture=13.0, protein_percent=11.5, total_dockage=3.0)
+    assert test["grade"] == "C"
+    assert test["deduction_percent"] == 1.0 * 1.0 + 1.0 * 0.5
+
+    test = create(client, admin_headers, vehicle, moisture=17.0, test_weight=68.0)
+    assert test["grade"] == grading.REJECTED
+    assert test["is_rejected"] is True
+    assert test["rejection_reasons"] == "moisture, test_weight"
+
+def test_spec_change_and_regrade(client, db, admin_headers):
+    _, vehicle = seed_vehicle(db)
+    test = create(client, admin_headers, vehicle, moisture=11.5, protein_percent=12.5)
+    assert test["grade"] == "B"
+
+    specs = client.get("/api/grading/specs", headers=admin_headers).json()
+    for spec in specs["grades"]:
+        if spec["grade"] == "A" and spec["parameter"] == "moisture":
+            spec["max_value"] = 12.0
+    assert client.put("/api/grading/specs", json=specs, headers=admin_headers).status_code == 200
+    assert db.query(models.GradeSpec).count() == len(specs["grades"])
+
+    response = client.post("/api/grading/regrade", headers=admin_headers)
+    assert response.json()["regraded"] == 1
+    db.expire_all()
+    assert db.get(models.LabTest, test["id"]).grade == "A"
+
+def test_specs_reject_unknown_parameters(client, db, admin_headers):
+    specs = {"grades": [{"grade": "A", "rank": 1, "parameter": "colour", "max_value": 1}], "deductions": []}
+    assert client.put("/api/grading/specs", json=specs, headers=admin_headers).status_code == 400
+
+def test_specs_reject_duplicate_rules(client, db, admin_headers):
+    moisture = {"grade": "A", "rank": 1, "parameter": "moisture", "max_value": 11}
+    specs = {"grades": [moisture, {**moisture, "max_value": 12}], "deductions": []}
+    assert client.put("/api/grading/specs", json=specs, headers=admin_headers).status_code == 400
+    deduction = {"parameter": "moisture", "direction": "above", "tolerance": 12, "rate": 1}
+    specs = {"grades": [moisture], "deductions": [deduction, {**deduction, "rate": 2}]}
+    assert client.put("/api/grading/specs", json=specs, headers=admin_headers).status_code == 400
+    assert db.query(models.GradeSpec).count() == 0
+
+def test_imported_tests_are_graded(db):
+    _, vehicle = seed_vehicle(db)
+    content = f"vehicle_entry_id,moisture,protein_percent\n{vehicle.id},10.5,12.5\n{vehicle.id},16.5,12.5\n"
+    imports.import_file(db, "lab-tests", io.BytesIO(content.encode()), "csv")
+    assert sorted(test.grade for test in db.query(models.LabTest)) == ["A", grading.REJECTED]
+
+def test_regrade_is_vectorized(db, monkeypatch):
+    _, vehicle = seed_vehicle(db)
+    rng = np.random.default_rng(0)
+    rows = [
+        {"vehicle_entry_id": vehicle.id, "moisture": m, "protein_percent": p, "chaff_husk": c}
+        for m, p, c in zip(rng.uniform(9, 17, 20000), rng.uniform(9, 14, 20000), rng.uniform(0, 3, 20000))
+    ]
+    db.execute(models.LabTest.__table__.insert(), rows)
+    db.commit()
+
+    # One executemany UPDATE per transaction, however many rows it holds
+    monkeypatch.setattr(grading, "REGRADE_CHUNK_SIZE", 10000)
+    monkeypatch.setattr(grading, "REGRADE_COMMIT_SIZE", 5000)
+    with count_statements() as statements:
+        assert grading.regrade(db) == 20000
+    assert sum(statement.startswith("UPDATE lab_tests") for statement in statements) == 4
+
+    assert db.query(models.LabTest).filter(models.LabTest.grade.is_(None)).count() == 0
+    # The vectorized grades agree with grading one record at a time
+    sample = [dict(row) for row in rows[:200]]
+    grading.grade_records(sample, grading.load_specs(db))
+    stored = db.query(models.LabTest).order_by(models.LabTest.id).limit(200).all()
+    assert [test.grade for test in stored] == [row["grade"] for row in sample]
@@ -0,0 +1,67 @@
+import json
+import os
+import runpy
+
+from sqlalchemy import text
+
+import auth
+import cache
+import health
+
+def test_liveness_and_readiness(client, db):
+    assert client.get("/health/live").json() == {"status": "alive"}
+    response = client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json() == {"ready": True, "checks": {"started": True, "database": True, "schema": True}}
+
+def test_not_ready_while_draining_or_behind_on_migrations(client, db):
+    health.state.draining = True
+    try:
+        assert client.get("/health/ready").status_code == 503
+    finally:
+        health.state.draining = False
+
+    # drop_all in the db fixture leaves tables outside the models alone
+    db.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+    db.execute(text("INSERT INTO alembic_version VALUES ('0b7d3e9a5c14')"))
+    db.commit()
+    try:
+        response = client.get("/health/ready")
+        assert response.status_code == 503
+        assert response.json()["checks"]["schema"] is False
+
+        db.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": health.alembic_head()})
+        db.commit()
+        assert client.get("/health/ready").status_code == 200
+    finally:
+        db.execute(text("DROP TABLE alembic_version"))
+        db.commit()
+
+def test_invalidations_from_other_workers_apply_locally(db):
+    invalidation = cache.PostgresInvalidation("postgresql+asyncpg://localhost/gateentry")
+    auth.user_cache.set("clerk", object())
+    auth.token_version_cache.set(7, 1)
+
+    def notify(instance, name, key):
+        invalidation._on_notify(None, 0, invalidation.channel, json.dumps(
+            {"instance": instance, "cache": name, "key": key, "all": key is None}
+        ))
+
+    notify(invalidation.instance, "users", "clerk")
+    assert auth.user_cache.get("clerk") is not None
+    notify("other-worker", "users", "clerk")
+    assert auth.user_cache.get("clerk") is None
+    notify("other-worker", "token_versions", None)
+    assert len(auth.token_version_cache) == 0
+
+def test_gunicorn_config_uses_shared_backends_with_several_workers(monkeypatch):
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://db/gateentry")
+    for name in ("EVENT_BACKEND", "RATE_LIMIT_BACKEND", "CACHE_BACKEND"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("EVENT_BACKEND", "local")
+
+    config = runpy.run_path(os.path.join(os.path.dirname(__file__), "gunicorn.conf.py"))
+    assert config["workers"] == 4
+    assert os.environ["RATE_LIMIT_BACKEND"] == os.environ["CACHE_BACKEND"] == "postgres"
+    assert os.environ["EVENT_BACKEND"] == "local"
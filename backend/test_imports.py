@@ -0,0 +1,83 @@
+import io
+import json
+
+import imports
+import models
+from conftest import count_statements
+
+def upload(client, headers, path, content, filename, **params):
+    return client.post(path, files={"file": (filename, content)}, params=params, headers=headers)
+
+def test_csv_supplier_import_reports_row_errors(client, db, admin_headers):
+    content = (
+        "supplier_name,contact_person,state,city\n"
+        "ABC Traders,Ravi,Maharashtra,Pune\n"
+        "Missing City,,Karnataka,\n"
+        "XYZ Suppliers,,Karnataka,Bangalore\n"
+    )
+    response = upload(client, admin_headers, "/api/suppliers/import", content, "suppliers.csv")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert report["failed"] == 1
+    assert report["errors"] == [{"row": 2, "errors": ["city: Field required"]}]
+    assert sorted(s.supplier_name for s in db.query(models.Supplier)) == ["ABC Traders", "XYZ Suppliers"]
+
+def test_ndjson_vehicle_import_checks_suppliers(client, db, admin_headers):
+    supplier = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    db.add(supplier)
+    db.commit()
+    lines = [
+        json.dumps({"vehicle_number": "MH12AB1234", "supplier_id": supplier.id, "bill_no": "INV-1", "arrival_time": "2025-10-01T08:00:00"}),
+        json.dumps({"vehicle_number": "MH12AB9999", "supplier_id": supplier.id + 1, "bill_no": "INV-2"}),
+        "{not json",
+        "",
+        json.dumps({"vehicle_number": "MH14CD5678", "supplier_id": supplier.id, "bill_no": "INV-3"}),
+    ]
+    response = upload(client, admin_headers, "/api/vehicles/import", "\n".join(lines), "vehicles.ndjson")
+    report = response.json()
+    assert report["inserted"] == 2
+    assert [error["row"] for error in report["errors"]] == [2, 3]
+    assert report["errors"][0]["errors"] == [f"supplier_id: {supplier.id + 1} does not exist"]
+
+    vehicles = {v.vehicle_number: v for v in db.query(models.VehicleEntry)}
+    assert vehicles["MH12AB1234"].arrival_time.isoformat() == "2025-10-01T08:00:00"
+    # A blank arrival time defaults to the import time, like the single-row endpoint
+    assert vehicles["MH14CD5678"].arrival_time is not None
+
+def test_unreadable_file_is_reported_not_raised(client, db, admin_headers):
+    header = "supplier_name,state,city\n"
+    valid = "".join(f"Supplier {n},Maharashtra,Pune\n" for n in range(3))
+    latin1 = (header + valid + "Café Traders,Maharashtra,Pune\n").encode("latin-1")
+    response = upload(client, admin_headers, "/api/suppliers/import", latin1, "suppliers.csv")
+    assert response.status_code == 200
+    report = response.json()
+    assert "not UTF-8" in report["file_error"]
+    assert report["inserted"] == db.query(models.Supplier).count()
+
+    oversized = header + valid + f"{'x' * 200_000},Maharashtra,Pune\n"
+    response = upload(client, admin_headers, "/api/suppliers/import", oversized, "suppliers.csv")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["file_error"].startswith("Stopped reading after row 3: malformed CSV")
+    assert report["inserted"] == 3
+
+def test_import_requires_admin(client, db):
+    response = upload(client, {}, "/api/lab-tests/import", "vehicle_entry_id\n1\n", "lab.csv")
+    assert response.status_code == 401
+
+def test_lab_test_import_in_batches(db):
+    supplier = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    vehicle = models.VehicleEntry(vehicle_number="MH12AB1234", supplier=supplier, bill_no="INV-1")
+    db.add(vehicle)
+    db.commit()
+    rows = "".join(f"{vehicle.id},{11 + i % 5},{12.5},{300 + i % 50}\n" for i in range(5000))
+    content = io.BytesIO(("vehicle_entry_id,moisture,protein_percent,falling_number\n" + rows).encode())
+
+    with count_statements() as statements:
+        report = imports.import_file(db, "lab-tests", content, "csv", batch_size=1000)
+
+    assert report["inserted"] == 5000 and report["failed"] == 0
+    assert db.query(models.LabTest).count() == 5000
+    # One multi-row INSERT per batch, not one per row
+    assert sum(statement.startswith("INSERT INTO lab_tests") for statement in statements) == 5
@@ -0,0 +1,51 @@
+import asyncio
+
+import loaders
+import models
+from conftest import count_statements, seed_unshared_lab_tests
+from database import AsyncSessionLocal
+
+def test_ids_return_rows_in_the_order_given(client, db, admin_headers):
+    seed_unshared_lab_tests(db, 5)
+    for url in ("/api/suppliers", "/api/vehicles", "/api/lab-tests"):
+        response = client.get(f"{url}?ids=4,999,2,4", headers=admin_headers)
+        assert response.status_code == 200
+        assert [row["id"] for row in response.json()] == [4, 2, 4]
+
+    response = client.get("/api/vehicles?ids=2&shape=sideloaded", headers=admin_headers)
+    assert [supplier["id"] for supplier in response.json()["suppliers"]] == [2]
+    assert client.get("/api/vehicles?ids=1,x", headers=admin_headers).status_code == 400
+
+def test_batch_get_is_one_query(client, db, admin_headers):
+    seed_unshared_lab_tests(db, 20)
+    client.get("/api/auth/me", headers=admin_headers)
+    for url in ("/api/suppliers/batch-get", "/api/vehicles/batch-get", "/api/lab-tests/batch-get"):
+        with count_statements() as statements:
+            response = client.post(url, json={"ids": list(range(20, 0, -1))}, headers=admin_headers)
+        assert response.status_code == 200
+        assert [row["id"] for row in response.json()] == list(range(20, 0, -1))
+        assert len(statements) == 1
+
+    response = client.post("/api/lab-tests/batch-get", json={"ids": [3]}, headers=admin_headers)
+    assert response.json()[0]["vehicle_entry"]["supplier"]["supplier_name"] == "Supplier 2"
+    too_many = client.post("/api/suppliers/batch-get", json={"ids": list(range(loaders.BATCH_MAX_IDS + 1))}, headers=admin_headers)
+    assert too_many.status_code == 413
+
+def test_loads_in_one_tick_are_coalesced_and_related_rows_primed(db):
+    seed_unshared_lab_tests(db, 3)
+
+    async def run():
+        async with AsyncSessionLocal() as session:
+            batch = loaders.Loaders(session)
+            with count_statements() as statements:
+                tests = await asyncio.gather(batch.lab_tests.load(1), batch.lab_tests.load(3), batch.lab_tests.load(1))
+                # Joined to the lab tests, so already loaded
+                supplier = await batch.suppliers.load(tests[1].vehicle_entry.supplier_id)
+                missing = await batch.vehicle_entries.load(999)
+            return tests, supplier, missing, statements
+
+    tests, supplier, missing, statements = asyncio.run(run())
+    assert [test.id for test in tests] == [1, 3, 1]
+    assert isinstance(supplier, models.Supplier) and supplier.supplier_name == "Supplier 2"
+    assert missing is None
+    assert len(statements) == 2
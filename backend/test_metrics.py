@@ -0,0 +1,40 @@
+import logging
+
+import metrics
+from conftest import seed_vehicle
+
+def sample(text, name):
+    [value] = [line.rsplit(" ", 1)[1] for line in text.splitlines() if line.rsplit(" ", 1)[0] == name]
+    return float(value)
+
+def test_metrics_record_route_templates_and_sql(client, db, admin_headers):
+    supplier, vehicle = seed_vehicle(db)
+    for _ in range(2):
+        response = client.get(f"/api/vehicles/{vehicle.id}", headers=admin_headers)
+        assert response.status_code == 200
+    assert "db;dur=" in response.headers["server-timing"]
+    client.get("/api/vehicles/999999", headers=admin_headers)
+
+    text = client.get("/metrics").text
+    route = 'method="GET",route="/api/vehicles/{vehicle_id}"'
+    assert sample(text, f'http_requests_total{{{route},status="200"}}') >= 2
+    assert sample(text, f'http_requests_total{{{route},status="404"}}') >= 1
+    assert sample(text, f"http_request_duration_seconds_count{{{route}}}") >= 3
+    # Every request ran SQL; the user lookup is cached after the first
+    assert sample(text, f'http_request_db_statements_bucket{{{route},le="0"}}') == 0
+    assert sample(text, f"http_request_db_statements_sum{{{route}}}") >= 3
+    assert f'/api/vehicles/{vehicle.id}"' not in text
+    assert 'cache_hits{cache="users"}' in text
+
+def test_metrics_token(client, db, monkeypatch):
+    monkeypatch.setattr("main.METRICS_TOKEN", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+
+def test_slow_request_log_lists_sql(client, db, admin_headers, monkeypatch, caplog):
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_SECONDS", 0)
+    seed_vehicle(db)
+    with caplog.at_level(logging.WARNING, logger="metrics"):
+        client.get("/api/lab-tests?search=MH12", headers=admin_headers)
+    [record] = [record for record in caplog.records if record.message.startswith("Slow request GET /api/lab-tests ")]
+    assert "FROM lab_tests" in record.message
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import models
+
+def seed_vehicles(db, count):
+    supplier = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    start = datetime(2025, 10, 1, 6, 0)
+    for i in range(count):
+        # Pairs of trucks share an arrival time so the id tie-breaker is exercised
+        db.add(models.VehicleEntry(
+            vehicle_number=f"MH12AB{i:04d}", supplier=supplier, bill_no=f"B{i}",
+            arrival_time=start + timedelta(minutes=i // 2),
+        ))
+    db.commit()
+
+def walk(client, headers, url, limit):
+    ids, cursor = [], ""
+    while cursor is not None:
+        page = client.get(url, params={"cursor": cursor, "limit": limit}, headers=headers).json()
+        assert len(page["items"]) <= limit
+        ids += [row["id"] for row in page["items"]]
+        cursor = page["next_cursor"]
+    return ids
+
+@pytest.mark.parametrize("limit", [1, 7, 25, 100])
+def test_cursor_pages_cover_every_row_once_newest_first(client, db, admin_headers, limit):
+    seed_vehicles(db, 25)
+    ids = walk(client, admin_headers, "/api/vehicles", limit)
+    expected = [
+        row.id for row in db.query(models.VehicleEntry).order_by(
+            models.VehicleEntry.arrival_time.desc(), models.VehicleEntry.id.desc()
+        )
+    ]
+    assert ids == expected
+
+def test_cursor_envelope_on_every_list_endpoint(client, db, admin_headers):
+    seed_vehicles(db, 3)
+    for url in ("/api/suppliers", "/api/vehicles", "/api/lab-tests", "/api/users"):
+        page = client.get(url, params={"cursor": ""}, headers=admin_headers).json()
+        assert set(page) == {"items", "next_cursor"}
+
+def test_list_without_cursor_is_still_a_plain_list(client, db, admin_headers):
+    seed_vehicles(db, 3)
+    assert len(client.get("/api/vehicles", headers=admin_headers).json()) == 3
+
+def test_invalid_cursor_is_rejected(client, db, admin_headers):
+    response = client.get("/api/vehicles", params={"cursor": "not-a-cursor"}, headers=admin_headers)
+    assert response.status_code == 400
+
+@pytest.mark.parametrize("params", [{"cursor": "", "limit": 0}, {"limit": 0}, {"limit": 100000}, {"skip": -1}])
+def test_out_of_range_paging_is_rejected(client, db, admin_headers, params):
+    seed_vehicles(db, 3)
+    assert client.get("/api/vehicles", params=params, headers=admin_headers).status_code == 422
+
+def test_cursor_pages_across_rows_without_timestamp(client, db, admin_headers):
+    seed_vehicles(db, 5)
+    supplier = db.query(models.Supplier).first()
+    for i in range(3):
+        db.add(models.VehicleEntry(vehicle_number=f"MH12ZZ{i:04d}", supplier=supplier, bill_no=f"N{i}"))
+    db.commit()
+    # Rows from before the column had a default
+    db.query(models.VehicleEntry).filter(models.VehicleEntry.vehicle_number.like("MH12ZZ%")).update({"arrival_time": None})
+    db.commit()
+
+    # Rows without an arrival time come first, then the rest newest first
+    expected = [row.id for row in db.query(models.VehicleEntry).filter(models.VehicleEntry.arrival_time.is_(None)).order_by(models.VehicleEntry.id.desc())]
+    assert len(expected) == 3
+    expected += [
+        row.id for row in db.query(models.VehicleEntry).filter(models.VehicleEntry.arrival_time.is_not(None)).order_by(
+            models.VehicleEntry.arrival_time.desc(), models.VehicleEntry.id.desc()
+        )
+    ]
+    for limit in (1, 2, 3, 4):
+        assert walk(client, admin_headers, "/api/vehicles", limit) == expected
+    legacy = client.get("/api/vehicles", params={"limit": 100}, headers=admin_headers).json()
+    assert [row["id"] for row in legacy] == expected
@@ -0,0 +1,39 @@
+import bcrypt
+
+import auth
+import models
+
+def add_user(db, password, rounds):
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=rounds)).decode("utf-8")
+    db.add(models.User(username="clerk", email="clerk@gateentry.com", full_name="Gate Clerk", hashed_password=hashed))
+    db.commit()
+    return hashed
+
+def test_login_upgrades_hash_to_current_work_factor(client, db):
+    old_hash = add_user(db, "secret123", rounds=5)
+    response = client.post("/api/auth/login", json={"username": "clerk", "password": "secret123"})
+    assert response.status_code == 200
+
+    db.expire_all()
+    new_hash = db.query(models.User.hashed_password).scalar()
+    assert new_hash != old_hash
+    assert new_hash.split("$")[2] == f"{auth.BCRYPT_ROUNDS:02d}"
+    assert client.post("/api/auth/login", json={"username": "clerk", "password": "secret123"}).status_code == 200
+
+def test_wrong_password_keeps_hash(client, db):
+    old_hash = add_user(db, "secret123", rounds=5)
+    assert client.post("/api/auth/login", json={"username": "clerk", "password": "wrong"}).status_code == 401
+    db.expire_all()
+    assert db.query(models.User.hashed_password).scalar() == old_hash
+
+def test_saturated_hash_pool_returns_503(client, db, monkeypatch):
+    add_user(db, "secret123", rounds=auth.BCRYPT_ROUNDS)
+
+    class Exhausted:
+        def acquire(self, blocking=True):
+            return False
+
+    monkeypatch.setattr(auth, "_password_slots", Exhausted())
+    response = client.post("/api/auth/login", json={"username": "clerk", "password": "secret123"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
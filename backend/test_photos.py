@@ -0,0 +1,146 @@
+import base64
+
+import pytest
+
+import models
+
+JPEG = b"\xff\xd8\xff\xe0" + bytes(range(256)) * 400
+
+def create_vehicle(client, headers, **photos):
+    supplier = client.post("/api/suppliers", json={"supplier_name": "ABC Traders", "state": "Maharashtra", "city": "Pune"}, headers=headers).json()
+    form = {"vehicle_number": "MH12AB1234", "supplier_id": supplier["id"], "bill_no": "B-1"}
+    form.update({name: base64.b64encode(data).decode() for name, data in photos.items()})
+    response = client.post("/api/vehicles", data=form, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_identical_photos_are_stored_once(client, db, admin_headers):
+    create_vehicle(client, admin_headers, supplier_bill_photo=JPEG, vehicle_photo=JPEG)
+    create_vehicle(client, admin_headers, vehicle_photo=JPEG)
+    assert db.query(models.Photo).count() == 1
+
+def test_photo_is_served_with_detected_type_and_etag(client, db, admin_headers):
+    vehicle = create_vehicle(client, admin_headers, vehicle_photo=JPEG)
+    response = client.get(f"/api/vehicles/{vehicle['id']}/vehicle_photo", headers=admin_headers)
+    assert response.status_code == 200
+    assert response.content == JPEG
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["etag"].strip('"') == db.query(models.Photo.sha256).scalar()
+    assert "max-age" in response.headers["cache-control"]
+
+def test_matching_etag_returns_304(client, db, admin_headers):
+    vehicle = create_vehicle(client, admin_headers, vehicle_photo=JPEG)
+    url = f"/api/vehicles/{vehicle['id']}/vehicle_photo"
+    etag = client.get(url, headers=admin_headers).headers["etag"]
+    response = client.get(url, headers={**admin_headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+def test_range_requests(client, db, admin_headers):
+    vehicle = create_vehicle(client, admin_headers, vehicle_photo=JPEG)
+    url = f"/api/vehicles/{vehicle['id']}/vehicle_photo"
+
+    response = client.get(url, headers={**admin_headers, "Range": "bytes=10-99"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 10-99/{len(JPEG)}"
+    assert response.content == JPEG[10:100]
+
+    response = client.get(url, headers={**admin_headers, "Range": "bytes=-16"})
+    assert response.content == JPEG[-16:]
+
+    response = client.get(url, headers={**admin_headers, "Range": f"bytes={len(JPEG)}-"})
+    assert response.status_code == 416
+
+def test_missing_photo_returns_404(client, db, admin_headers):
+    vehicle = create_vehicle(client, admin_headers)
+    response = client.get(f"/api/vehicles/{vehicle['id']}/bill_photo", headers=admin_headers)
+    assert response.status_code == 404
+
+def test_renditions_are_generated_and_served(client, db, admin_headers):
+    import io
+    from PIL import Image
+    import images
+    import photos
+
+    buffer = io.BytesIO()
+    # Noise keeps the PNG large, so the re-encoded original is worth keeping
+    Image.effect_noise((3000, 2000), 40).convert("RGB").save(buffer, format="PNG")
+    vehicle = create_vehicle(client, admin_headers)
+    source = photos.store_photo(db, buffer.getvalue())
+    db.get(models.VehicleEntry, vehicle["id"]).vehicle_photo_sha256 = source.sha256
+    db.commit()
+    for future in images.schedule_renditions(source.sha256):
+        future.result()
+
+    url = f"/api/vehicles/{vehicle['id']}/vehicle_photo"
+    sizes = {}
+    for size in ("thumb", "preview", "original"):
+        response = client.get(url, params={"size": size}, headers=admin_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/jpeg"
+        sizes[size] = max(Image.open(io.BytesIO(response.content)).size)
+    assert sizes == {"thumb": 320, "preview": 1280, "original": 2560}
+
+def test_rendition_falls_back_to_upload(client, db, admin_headers):
+    vehicle = create_vehicle(client, admin_headers, vehicle_photo=JPEG)
+    response = client.get(f"/api/vehicles/{vehicle['id']}/vehicle_photo?size=thumb", headers=admin_headers)
+    assert response.content == JPEG
+    # Revalidated, so the thumbnail is picked up once it exists
+    assert response.headers["cache-control"] == "private, no-cache"
+
+def test_kept_upload_counts_as_original_rendition(client, db, admin_headers, monkeypatch):
+    import io
+    from PIL import Image
+    import images
+    import photos
+
+    # A small, heavily compressed JPEG: re-encoding it at quality 85 only makes it larger
+    buffer = io.BytesIO()
+    Image.effect_noise((600, 400), 40).convert("RGB").save(buffer, format="JPEG", quality=30)
+    vehicle = create_vehicle(client, admin_headers)
+    source = photos.store_photo(db, buffer.getvalue())
+    db.get(models.VehicleEntry, vehicle["id"]).vehicle_photo_sha256 = source.sha256
+    db.commit()
+    for future in images.schedule_renditions(source.sha256):
+        future.result()
+
+    original = db.get(models.PhotoRendition, (source.sha256, "original"))
+    assert original.photo_sha256 == source.sha256
+    response = client.get(f"/api/vehicles/{vehicle['id']}/vehicle_photo", headers=admin_headers)
+    assert response.content == buffer.getvalue()
+    assert response.headers["cache-control"] == photos.PHOTO_CACHE_CONTROL
+
+    # Every rendition is accounted for, so scheduling again decodes nothing
+    monkeypatch.setattr(images, "render", lambda data: pytest.fail("renditions were generated again"))
+    images.generate_renditions(source.sha256)
+
+def post_vehicle_files(client, headers, **files):
+    supplier = client.post("/api/suppliers", json={"supplier_name": "ABC Traders", "state": "Maharashtra", "city": "Pune"}, headers=headers).json()
+    form = {"vehicle_number": "MH12AB1234", "supplier_id": supplier["id"], "bill_no": "B-1"}
+    return client.post(
+        "/api/vehicles",
+        data=form,
+        files={name: (f"{name}.jpg", data, "image/jpeg") for name, data in files.items()},
+        headers=headers,
+    )
+
+def test_multipart_upload(client, db, admin_headers):
+    response = post_vehicle_files(client, admin_headers, vehicle_photo=JPEG, supplier_bill_photo=JPEG)
+    assert response.status_code == 200
+    photo = client.get(f"/api/vehicles/{response.json()['id']}/bill_photo", headers=admin_headers)
+    assert photo.content == JPEG
+    assert db.query(models.Photo).count() == 1
+
+def test_oversized_upload_is_rejected(client, db, admin_headers, monkeypatch):
+    import photos
+    monkeypatch.setattr(photos, "MAX_PHOTO_BYTES", len(JPEG) - 1)
+    assert post_vehicle_files(client, admin_headers, vehicle_photo=JPEG).status_code == 413
+    assert db.query(models.VehicleEntry).count() == 0
+
+def test_non_image_upload_is_rejected(client, db, admin_headers):
+    assert post_vehicle_files(client, admin_headers, vehicle_photo=b"MZ\x90\x00 not a photo").status_code == 415
+
+def test_invalid_base64_is_rejected(client, db, admin_headers):
+    supplier = client.post("/api/suppliers", json={"supplier_name": "ABC Traders", "state": "Maharashtra", "city": "Pune"}, headers=admin_headers).json()
+    form = {"vehicle_number": "MH12AB1234", "supplier_id": supplier["id"], "bill_no": "B-1", "vehicle_photo": "data:image/jpeg;base64,@@@"}
+    assert client.post("/api/vehicles", data=form, headers=admin_headers).status_code == 400
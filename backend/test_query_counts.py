@@ -0,0 +1,35 @@
+import pytest
+
+from conftest import count_statements, seed_unshared_lab_tests
+
+def statements_for(client, headers, url):
+    with count_statements() as statements:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200
+    return statements
+
+@pytest.mark.parametrize("url", ["/api/suppliers", "/api/vehicles", "/api/lab-tests", "/api/users"])
+def test_list_statement_count_is_independent_of_page_size(client, db, admin_headers, url):
+    seed_unshared_lab_tests(db, 30)
+    # Warm the authenticated-user cache so only the list query itself is counted
+    statements_for(client, admin_headers, url)
+    counts = {
+        limit: len(statements_for(client, admin_headers, f"{url}?limit={limit}"))
+        for limit in (1, 10, 30)
+    }
+    assert len(set(counts.values())) == 1, counts
+
+def test_lab_test_list_serializes_nested_supplier(client, db, admin_headers):
+    seed_unshared_lab_tests(db, 3)
+    response = client.get("/api/lab-tests", headers=admin_headers)
+    assert [row["vehicle_entry"]["supplier"]["supplier_name"] for row in response.json()] == [
+        "Supplier 2", "Supplier 1", "Supplier 0"
+    ]
+
+def test_list_queries_skip_photo_and_password_columns(client, db, admin_headers):
+    seed_unshared_lab_tests(db, 3)
+    # The first statement of each request is the auth lookup; the list query comes last
+    vehicle_sql = statements_for(client, admin_headers, "/api/vehicles")[-1]
+    user_sql = statements_for(client, admin_headers, "/api/users")[-1]
+    assert "photo_sha256" not in vehicle_sql
+    assert "hashed_password" not in user_sql
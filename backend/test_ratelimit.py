@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+import ratelimit
+from conftest import count_statements
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(ratelimit.login_ip_limiter, "limit", 6)
+    monkeypatch.setattr(ratelimit.login_username_limiter, "limit", 3)
+
+def attempt(client, password="wrong", username="admin"):
+    return client.post("/api/auth/login", json={"username": username, "password": password})
+
+def test_failed_logins_lock_the_username_without_touching_the_database(client, db, admin_headers, limits):
+    for _ in range(3):
+        assert attempt(client).status_code == 401
+    with count_statements() as statements:
+        response = attempt(client, "admin123")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert statements == []
+    # Other usernames from the same IP are still allowed
+    assert attempt(client, username="someone").status_code == 401
+
+def test_successful_login_clears_failures(client, db, admin_headers, limits):
+    for _ in range(2):
+        attempt(client)
+    assert attempt(client, "admin123").status_code == 200
+    for _ in range(2):
+        assert attempt(client).status_code == 401
+
+def test_ip_limit_counts_every_attempt(client, db, admin_headers, limits):
+    for _ in range(6):
+        assert attempt(client, "admin123").status_code == 200
+    assert attempt(client, "admin123").status_code == 429
+
+def test_sliding_window_weights_the_previous_window(monkeypatch):
+    limiter = ratelimit.RateLimiter("test", limit=10, window_seconds=100)
+    # 10 in the last window, 25 s into this one: 7.5 of them still count
+    assert limiter._retry_after((5, 2, 10), 525) is None
+    assert limiter._retry_after((5, 3, 10), 525) == 5
+    # Over the limit within this window: wait for it to end and partly slide out
+    assert limiter._retry_after((5, 12, 0), 550) == 67
+
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+    results = [asyncio.run(limiter.hit("key")) for _ in range(11)]
+    assert results[:10] == [None] * 10 and results[10] > 0
+    now[0] += 250
+    assert asyncio.run(limiter.hit("key")) is None
@@ -0,0 +1,116 @@
+import gzip
+import json
+
+import brotli
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import models
+from compression import CompressionMiddleware
+
+DECOMPRESS = {"gzip": gzip.decompress, "br": brotli.decompress}
+
+def seed_lab_tests(db, count=30):
+    supplier = models.Supplier(supplier_name="ABC Traders", state="Maharashtra", city="Pune")
+    vehicles = [models.VehicleEntry(vehicle_number=f"MH12AB{n:04d}", supplier=supplier, bill_no=f"INV-{n}") for n in range(3)]
+    db.add_all(models.LabTest(vehicle_entry=vehicles[n % 3], moisture=11.0, remarks="ok") for n in range(count))
+    db.commit()
+    return supplier, vehicles
+
+def test_large_responses_are_compressed(client, db, admin_headers):
+    seed_lab_tests(db)
+    plain = client.get("/api/lab-tests", headers={**admin_headers, "Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    response = client.get("/api/lab-tests", headers={**admin_headers, "Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json() == plain.json()
+
+    raw = client.get("/api/lab-tests", headers={**admin_headers, "Accept-Encoding": "gzip, br"})
+    assert raw.headers["content-encoding"] == "br"
+    assert int(raw.headers["content-length"]) < len(plain.content) / 5
+    assert "Accept-Encoding" in raw.headers["vary"]
+    assert raw.json() == plain.json()
+
+def test_small_responses_are_not_compressed(client, db, admin_headers):
+    response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+
+def test_compressed_responses_round_trip(client, db, admin_headers):
+    seed_lab_tests(db)
+    plain = client.get("/api/lab-tests", headers={**admin_headers, "Accept-Encoding": "identity"})
+    for coding, decompress in DECOMPRESS.items():
+        with client.stream("GET", "/api/lab-tests", headers={**admin_headers, "Accept-Encoding": coding}) as response:
+            raw = b"".join(response.iter_raw())
+        assert response.headers["content-encoding"] == coding
+        assert int(response.headers["content-length"]) == len(raw)
+        assert json.loads(decompress(raw)) == plain.json()
+
+def test_streamed_responses_are_compressed_per_chunk():
+    chunks = [f"row {n},".encode() * 200 for n in range(5)]
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.get("/stream")(lambda: StreamingResponse(iter(chunks), media_type="text/csv"))
+    app.get("/photo")(lambda: Response(b"\xff" * 4096, media_type="image/jpeg"))
+    client = TestClient(app)
+
+    for coding, decompress in DECOMPRESS.items():
+        with client.stream("GET", "/stream", headers={"Accept-Encoding": coding}) as response:
+            raw = b"".join(response.iter_raw())
+        assert response.headers["content-encoding"] == coding
+        assert "content-length" not in response.headers
+        assert decompress(raw) == b"".join(chunks)
+
+    photo = client.get("/photo", headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in photo.headers
+    assert photo.content == b"\xff" * 4096
+
+def test_ranges_and_compressed_types_are_not_encoded():
+    body = b"%PDF-1.4 " * 1000
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.get("/bill")(lambda: Response(body, media_type="application/pdf"))
+    app.get("/part")(lambda: Response(body[:2048], status_code=206, media_type="text/plain",
+                                      headers={"Content-Range": f"bytes 0-2047/{len(body)}"}))
+    client = TestClient(app)
+
+    for path in ("/bill", "/part"):
+        response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+        assert "content-encoding" not in response.headers
+        assert body.startswith(response.content)
+
+def test_encoded_responses_get_a_weak_etag():
+    body = b"row," * 1000
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware)
+    app.get("/rows")(lambda: Response(body, media_type="text/csv", headers={"ETag": '"rows-1"'}))
+    client = TestClient(app)
+
+    assert client.get("/rows", headers={"Accept-Encoding": "gzip"}).headers["etag"] == 'W/"rows-1"'
+    assert client.get("/rows", headers={"Accept-Encoding": "identity"}).headers["etag"] == '"rows-1"'
+
+def test_sideloaded_shape_lists_related_rows_once(client, db, admin_headers):
+    supplier, vehicles = seed_lab_tests(db, count=6)
+    nested = client.get("/api/lab-tests", headers=admin_headers).json()
+    response = client.get("/api/lab-tests", params={"shape": "sideloaded"}, headers=admin_headers)
+    assert response.status_code == 200
+    sideloaded = response.json()
+
+    assert [row["id"] for row in sideloaded["items"]] == [row["id"] for row in nested]
+    assert "vehicle_entry" not in sideloaded["items"][0]
+    assert sorted(vehicle["id"] for vehicle in sideloaded["vehicle_entries"]) == sorted(vehicle.id for vehicle in vehicles)
+    assert [s["id"] for s in sideloaded["suppliers"]] == [supplier.id]
+    assert sideloaded["next_cursor"] is None
+
+    # Rows carry the same fields as the nested shape, minus the nesting
+    first = {key: value for key, value in nested[0].items() if key != "vehicle_entry"}
+    assert sideloaded["items"][0] == first
+    nested_vehicle = {key: value for key, value in nested[0]["vehicle_entry"].items() if key != "supplier"}
+    assert nested_vehicle in sideloaded["vehicle_entries"]
+
+    page = client.get("/api/vehicles", params={"shape": "sideloaded", "cursor": "", "limit": 2}, headers=admin_headers).json()
+    assert len(page["items"]) == 2
+    assert page["items"][0]["supplier_id"] == supplier.id
+    assert len(page["suppliers"]) == 1
+    assert page["next_cursor"]
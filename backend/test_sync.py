@@ -0,0 +1,111 @@
+import time
+
+import imports
+import sync
+from conftest import seed_vehicle
+
+def get_changes(client, headers, since=None):
+    response = client.get("/api/sync", params={"since": since} if since else None, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+def test_sync_returns_only_changes_since_token(client, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_SETTLE_SECONDS", 0)
+    monkeypatch.setattr(sync, "SYNC_PAGE_SIZE", 2)
+    supplier, vehicle = seed_vehicle(db)
+    for number in range(2):
+        client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id, "moisture": 11.0 + number}, headers=admin_headers)
+
+    first = get_changes(client, admin_headers)
+    assert first["reset"] and not first["has_more"]
+    assert [len(first[name]) for name in ("suppliers", "vehicle_entries", "lab_tests")] == [1, 1, 2]
+    assert first["lab_tests"][0]["grade"] == "A"
+
+    assert get_changes(client, admin_headers, first["next_token"])["lab_tests"] == []
+
+    other = client.post("/api/suppliers", json={"supplier_name": "XYZ Mills", "state": "Punjab", "city": "Ludhiana"}, headers=admin_headers).json()
+    client.put(f"/api/suppliers/{supplier.id}", json={"supplier_name": "ABC Agro", "state": "Maharashtra", "city": "Pune"}, headers=admin_headers)
+    client.delete(f"/api/suppliers/{other['id']}", headers=admin_headers)
+    for number in range(3):
+        client.post("/api/lab-tests", json={"vehicle_entry_id": vehicle.id}, headers=admin_headers)
+
+    second = get_changes(client, admin_headers, first["next_token"])
+    assert not second["reset"] and second["has_more"]
+    assert [row["supplier_name"] for row in second["suppliers"]] == ["ABC Agro"]
+    assert second["vehicle_entries"] == []
+    assert len(second["lab_tests"]) == 2
+    assert [(row["entity"], row["id"]) for row in second["deletions"]] == [("suppliers", other["id"])]
+
+    third = get_changes(client, admin_headers, second["next_token"])
+    assert not third["has_more"]
+    assert len(third["lab_tests"]) == 1
+    assert third["deletions"] == []
+
+def test_sync_holds_back_rows_inside_settle_window(client, db, admin_headers):
+    seed_vehicle(db)
+    changes = get_changes(client, admin_headers)
+    assert changes["suppliers"] == []
+    # The held-back rows arrive on a later sync with the same token
+    assert get_changes(client, admin_headers, changes["next_token"])["reset"] is False
+
+def test_slow_import_batches_are_not_skipped(client, db, admin_headers, monkeypatch):
+    monkeypatch.setattr(sync, "SYNC_SETTLE_SECONDS", 0)
+    tokens = []
+
+    def records():
+        yield {"supplier_name": "First", "state": "Punjab", "city": "Ludhiana"}, None
+        # While the import is still running, another supplier is saved and a client syncs past it
+        client.post("/api/suppliers", json={"supplier_name": "Other", "state": "Punjab", "city": "Amritsar"}, headers=admin_headers)
+        time.sleep(0.01)
+        tokens.append(get_changes(client, admin_headers)["next_token"])
+        yield {"supplier_name": "Second", "state": "Punjab", "city": "Patiala"}, None
+
+    assert imports.import_records(db, "suppliers", records(), batch_size=1)["inserted"] == 2
+    changes = get_changes(client, admin_headers, tokens[0])
+    assert [row["supplier_name"] for row in changes["suppliers"]] == ["Second"]
+
+def test_invalid_sync_token(client, db, admin_headers):
+    response = client.get("/api/sync", params={"since": "not-a-token"}, headers=admin_headers)
+    assert response.status_code == 400
+
+def test_upload_is_idempotent_and_links_offline_vehicles(client, db, admin_headers):
+    supplier, vehicle = seed_vehicle(db)
+    payload = {
+        "vehicle_entries": [
+            {"client_id": "tab1-v1", "vehicle_number": "MH14XY9999", "supplier_id": supplier.id, "bill_no": "INV-9"},
+            {"client_id": "tab1-v2", "vehicle_number": "MH14XY0000", "supplier_id": 999, "bill_no": "INV-10"},
+        ],
+        "lab_tests": [
+            {"client_id": "tab1-t1", "vehicle_client_id": "tab1-v1", "moisture": 10.5},
+            {"client_id": "tab1-t2", "vehicle_entry_id": vehicle.id, "moisture": 15.0},
+            {"client_id": "tab1-t3", "vehicle_client_id": "unknown"},
+        ],
+    }
+    response = client.post("/api/sync/upload", json=payload, headers=admin_headers)
+    assert response.status_code == 200
+    result = response.json()
+    assert [item["status"] for item in result["vehicle_entries"]] == ["created", "error"]
+    assert [item["status"] for item in result["lab_tests"]] == ["created", "created", "error"]
+    new_vehicle_id = result["vehicle_entries"][0]["id"]
+
+    lab_test = client.get(f"/api/lab-tests/{result['lab_tests'][0]['id']}", headers=admin_headers).json()
+    assert lab_test["vehicle_entry_id"] == new_vehicle_id
+    assert lab_test["grade"] == "A"
+
+    # A retry after a dropped response inserts nothing new
+    retry = client.post("/api/sync/upload", json=payload, headers=admin_headers).json()
+    assert [item["status"] for item in retry["lab_tests"]] == ["duplicate", "duplicate", "error"]
+    assert retry["vehicle_entries"][0] == {"client_id": "tab1-v1", "id": new_vehicle_id, "status": "duplicate", "detail": None}
+    assert len(client.get("/api/lab-tests", headers=admin_headers).json()) == 2
+
+def test_upload_rejects_overlong_client_ids(client, db, admin_headers):
+    supplier, _ = seed_vehicle(db)
+    too_long = "x" * 65
+    for payload in (
+        {"vehicle_entries": [{"client_id": too_long, "vehicle_number": "MH14XY9999", "supplier_id": supplier.id, "bill_no": "INV-9"}]},
+        {"lab_tests": [{"client_id": too_long, "vehicle_entry_id": 1}]},
+        {"lab_tests": [{"client_id": "tab1-t1", "vehicle_client_id": too_long}]},
+    ):
+        response = client.post("/api/sync/upload", json=payload, headers=admin_headers)
+        assert response.status_code == 422
+    assert client.get("/api/lab-tests", headers=admin_headers).json() == []
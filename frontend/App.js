@@ -8,6 +8,7 @@ import LabTestScreen from './src/screens/LabTestScreen';
 import LoginScreen from './src/screens/LoginScreen';
 import UserManagementScreen from './src/screens/UserManagementScreen';
 import AsyncStorage from '@react-native-async-storage/async-storage';
+import { authApi } from './src/api/client';
 
 const Stack = createNativeStackNavigator();
 export const AuthContext = createContext();
@@ -42,6 +43,8 @@ export default function App() {
   };
 
   const handleLogout = async () => {
+    // Revoke the token server-side; sign out locally even when offline
+    await authApi.logout().catch(() => {});
     await AsyncStorage.removeItem('auth_token');
     await AsyncStorage.removeItem('user_data');
     setUser(null);
@@ -41,14 +41,16 @@ api.interceptors.request.use(
 export const supplierApi = {
   getAll: () => api.get('/suppliers'),
   getById: (id) => api.get(`/suppliers/${id}`),
+  getByIds: (ids) => api.post('/suppliers/batch-get', { ids }),
   create: (data) => api.post('/suppliers', data),
   update: (id, data) => api.put(`/suppliers/${id}`, data),
   delete: (id) => api.delete(`/suppliers/${id}`),
 };
 
 export const vehicleApi = {
-  getAll: () => api.get('/vehicles'),
+  getAll: (params) => api.get('/vehicles', { params }),
   getById: (id) => api.get(`/vehicles/${id}`),
+  getByIds: (ids) => api.post('/vehicles/batch-get', { ids }),
   create: async (formData) => {
     const token = await AsyncStorage.getItem('auth_token');
     return axios.post(`${API_URL}/vehicles`, formData, {
@@ -61,15 +63,63 @@ export const vehicleApi = {
 };
 
 export const labTestApi = {
-  getAll: () => api.get('/lab-tests'),
+  getAll: (params) => api.get('/lab-tests', { params }),
   getById: (id) => api.get(`/lab-tests/${id}`),
+  getByIds: (ids) => api.post('/lab-tests/batch-get', { ids }),
   create: (data) => api.post('/lab-tests', data),
 };
 
+// Incremental sync for devices that go offline: pass back next_token until has_more is false,
+// and upload entries queued while offline with a client_id so retries are not duplicated
+export const syncApi = {
+  getChanges: (since) => api.get('/sync', { params: since ? { since } : undefined }),
+  upload: (entries) => api.post('/sync/upload', entries),
+};
+
+export const dashboardApi = {
+  getSummary: () => api.get('/dashboard/summary'),
+};
+
+// Live gate and lab events over a WebSocket. Reconnects with the last sequence number seen so
+// nothing is missed; a 'reset' event means the gap was too long and lists should be reloaded.
+export const subscribeToEvents = (types, onEvent) => {
+  let socket = null;
+  let lastSeq = null;
+  let closed = false;
+  let retryTimer = null;
+
+  const connect = async () => {
+    const token = await AsyncStorage.getItem('auth_token');
+    if (closed || !token) return;
+    const params = new URLSearchParams({ token, types: types.join(',') });
+    if (lastSeq !== null) params.set('since', lastSeq);
+    socket = new WebSocket(`${API_URL.replace(/^http/, 'ws')}/events/ws?${params}`);
+    socket.onmessage = (message) => {
+      const event = JSON.parse(message.data);
+      if (event.type === 'keepalive') return;
+      lastSeq = event.seq;
+      onEvent(event);
+    };
+    socket.onclose = () => {
+      if (!closed) retryTimer = setTimeout(connect, 2000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retryTimer);
+    if (socket) socket.close();
+  };
+};
+
 export const authApi = {
   login: (credentials) => api.post('/auth/login', credentials),
   register: (userData) => api.post('/auth/register', userData),
   getCurrentUser: () => api.get('/auth/me'),
+  logout: () => api.post('/auth/logout'),
+  logoutAll: () => api.post('/auth/logout-all'),
+  refresh: () => api.post('/auth/refresh'),
 };
 
 export const userApi = {
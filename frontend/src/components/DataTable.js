@@ -1,10 +1,24 @@
-import React, { useState } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { View, Text, StyleSheet, TouchableOpacity, TextInput, ScrollView } from 'react-native';
 
-export default function DataTable({ columns, data, onEdit, onDelete, onAdd, searchable = true }) {
+const SEARCH_DEBOUNCE_MS = 300;
+
+export default function DataTable({ columns, data, onEdit, onDelete, onAdd, onSearch, searchable = true }) {
   const [searchTerm, setSearchTerm] = useState('');
+  const isFirstSearch = useRef(true);
+
+  // With onSearch the server filters the rows; otherwise filter the loaded rows locally
+  useEffect(() => {
+    if (!onSearch) return undefined;
+    if (isFirstSearch.current) {
+      isFirstSearch.current = false;
+      return undefined;
+    }
+    const timer = setTimeout(() => onSearch(searchTerm.trim()), SEARCH_DEBOUNCE_MS);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
-  const filteredData = searchable
+  const filteredData = searchable && !onSearch
     ? data.filter((row) =>
         Object.values(row).some((val) =>
           String(val).toLowerCase().includes(searchTerm.toLowerCase())
@@ -1,15 +1,41 @@
-import React from 'react';
+import React, { useState, useEffect } from 'react';
 import { View, Text, StyleSheet, TouchableOpacity } from 'react-native';
 import Layout from '../components/Layout';
+import { dashboardApi } from '../api/client';
+
+const formatAverage = (value, digits = 1) => (value === null || value === undefined ? '-' : value.toFixed(digits));
 
 export default function HomeScreen({ navigation }) {
+  const [summary, setSummary] = useState(null);
+
+  useEffect(() => {
+    loadSummary();
+  }, []);
+
+  const loadSummary = async () => {
+    try {
+      const response = await dashboardApi.getSummary();
+      setSummary(response.data);
+    } catch (error) {
+      console.error('Error loading dashboard summary:', error);
+    }
+  };
+
   const stats = [
-    { title: 'Total Suppliers', value: '-', color: '#3b82f6', icon: '🏢' },
-    { title: 'Vehicle Entries', value: '-', color: '#10b981', icon: '🚛' },
-    { title: 'Lab Tests', value: '-', color: '#f59e0b', icon: '🔬' },
-    { title: 'Pending Tests', value: '-', color: '#ef4444', icon: '⏱️' },
+    { title: 'Total Suppliers', value: summary ? summary.suppliers : '-', color: '#3b82f6', icon: '🏢' },
+    { title: 'Vehicle Entries', value: summary ? summary.vehicle_entries : '-', color: '#10b981', icon: '🚛' },
+    { title: 'Lab Tests', value: summary ? summary.lab_tests : '-', color: '#f59e0b', icon: '🔬' },
+    { title: 'Pending Tests', value: summary ? summary.pending_lab_tests : '-', color: '#ef4444', icon: '⏱️' },
+    { title: 'Arrivals Today', value: summary ? summary.arrivals_today : '-', color: '#8b5cf6', icon: '📅' },
   ];
 
+  const quality = summary ? [
+    { title: 'Avg Moisture %', value: formatAverage(summary.quality.moisture) },
+    { title: 'Avg Protein %', value: formatAverage(summary.quality.protein_percent) },
+    { title: 'Avg Falling No.', value: formatAverage(summary.quality.falling_number, 0) },
+    { title: 'Avg Dockage %', value: formatAverage(summary.quality.total_dockage) },
+  ] : [];
+
   const quickActions = [
     { title: 'Add Supplier', route: 'SupplierMaster', icon: '➕', color: '#3b82f6' },
     { title: 'Vehicle Entry', route: 'VehicleEntry', icon: '🚛', color: '#10b981' },
@@ -31,6 +57,20 @@ export default function HomeScreen({ navigation }) {
           ))}
         </View>
 
+        {summary && (
+          <>
+            <Text style={styles.sectionTitle}>Quality (last {summary.quality.days} days, {summary.quality.sample_size} tests)</Text>
+            <View style={styles.statsContainer}>
+              {quality.map((item, index) => (
+                <View key={index} style={styles.qualityCard}>
+                  <Text style={styles.statTitle}>{item.title}</Text>
+                  <Text style={styles.qualityValue}>{item.value}</Text>
+                </View>
+              ))}
+            </View>
+          </>
+        )}
+
         <Text style={styles.sectionTitle}>Quick Actions</Text>
         <View style={styles.quickActions}>
           {quickActions.map((action, index) => (
@@ -47,7 +87,22 @@ export default function HomeScreen({ navigation }) {
 
         <Text style={styles.sectionTitle}>Recent Activity</Text>
         <View style={styles.activityCard}>
-          <Text style={styles.activityText}>No recent activity</Text>
+          {summary && summary.recent_arrivals.length > 0 ? (
+            summary.recent_arrivals.map((arrival) => (
+              <View key={arrival.id} style={styles.activityRow}>
+                <Text style={styles.activityVehicle}>{arrival.vehicle_number}</Text>
+                <Text style={styles.activityDetail}>{arrival.supplier_name}</Text>
+                <Text style={styles.activityDetail}>
+                  {arrival.arrival_time ? new Date(arrival.arrival_time).toLocaleString() : '-'}
+                </Text>
+                <Text style={[styles.activityStatus, { color: arrival.lab_tested ? '#10b981' : '#ef4444' }]}>
+                  {arrival.lab_tested ? 'Tested' : 'Pending'}
+                </Text>
+              </View>
+            ))
+          ) : (
+            <Text style={styles.activityText}>No recent activity</Text>
+          )}
         </View>
       </View>
     </Layout>
@@ -137,4 +192,41 @@ const styles = StyleSheet.create({
     color: '#9ca3af',
     textAlign: 'center',
   },
+  activityRow: {
+    flexDirection: 'row',
+    alignItems: 'center',
+    paddingVertical: 8,
+    borderBottomWidth: 1,
+    borderBottomColor: '#f3f4f6',
+    gap: 12,
+  },
+  activityVehicle: {
+    flex: 1,
+    fontWeight: '600',
+    color: '#1f2937',
+  },
+  activityDetail: {
+    flex: 1,
+    color: '#6b7280',
+  },
+  activityStatus: {
+    fontWeight: '600',
+  },
+  qualityCard: {
+    flex: 1,
+    minWidth: 150,
+    backgroundColor: 'white',
+    padding: 16,
+    borderRadius: 8,
+    shadowColor: '#000',
+    shadowOffset: { width: 0, height: 2 },
+    shadowOpacity: 0.1,
+    shadowRadius: 4,
+    elevation: 3,
+  },
+  qualityValue: {
+    fontSize: 22,
+    fontWeight: 'bold',
+    color: '#1f2937',
+  },
 });
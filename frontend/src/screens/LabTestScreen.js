@@ -13,7 +13,7 @@ import DateTimePicker from '@react-native-community/datetimepicker';
 import Layout from '../components/Layout';
 import DataTable from '../components/DataTable';
 import Modal from '../components/Modal';
-import { vehicleApi, labTestApi } from '../api/client';
+import { vehicleApi, labTestApi, subscribeToEvents } from '../api/client';
 
 export default function LabTestScreen({ navigation }) {
   const [labTests, setLabTests] = useState([]);
@@ -54,6 +54,20 @@ export default function LabTestScreen({ navigation }) {
     loadVehicles();
   }, []);
 
+  useEffect(() => subscribeToEvents(['lab_test.created', 'vehicle_entry.created'], (event) => {
+    const prepend = (current) => (
+      current.some((item) => item.id === event.data.id) ? current : [event.data, ...current]
+    );
+    if (event.type === 'reset') {
+      loadLabTests();
+      loadVehicles();
+    } else if (event.type === 'lab_test.created') {
+      setLabTests(prepend);
+    } else {
+      setVehicles(prepend);
+    }
+  }), []);
+
   useEffect(() => {
     calculateTotalImpurities();
   }, [
@@ -84,9 +98,9 @@ export default function LabTestScreen({ navigation }) {
     }
   };
 
-  const loadLabTests = async () => {
+  const loadLabTests = async (search) => {
     try {
-      const response = await labTestApi.getAll();
+      const response = await labTestApi.getAll(search ? { search } : undefined);
       setLabTests(response.data);
     } catch (error) {
       console.error('Error loading lab tests:', error);
@@ -311,6 +325,8 @@ export default function LabTestScreen({ navigation }) {
     { label: 'Protein %', field: 'protein_percent', width: 120 },
     { label: 'Total Impurities %', field: 'total_impurities', width: 150 },
     { label: 'Total Dockage %', field: 'total_dockage', width: 150 },
+    { label: 'Grade', field: 'grade', width: 110 },
+    { label: 'Deduction %', field: 'deduction_percent', width: 130 },
     { label: 'Tested By', field: 'tested_by', width: 150 },
     { 
       label: 'Test Date', 
@@ -328,6 +344,7 @@ export default function LabTestScreen({ navigation }) {
         onAdd={openAddModal}
         onEdit={openEditModal}
         onDelete={handleDelete}
+        onSearch={loadLabTests}
       />
 
       <Modal
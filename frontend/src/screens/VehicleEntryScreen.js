@@ -15,7 +15,7 @@ import DateTimePicker from '@react-native-community/datetimepicker';
 import Layout from '../components/Layout';
 import DataTable from '../components/DataTable';
 import Modal from '../components/Modal';
-import { supplierApi, vehicleApi } from '../api/client';
+import { supplierApi, vehicleApi, subscribeToEvents } from '../api/client';
 
 export default function VehicleEntryScreen({ navigation }) {
   const [vehicles, setVehicles] = useState([]);
@@ -42,6 +42,16 @@ export default function VehicleEntryScreen({ navigation }) {
     requestPermissions();
   }, []);
 
+  useEffect(() => subscribeToEvents(['vehicle_entry.created'], (event) => {
+    if (event.type === 'reset') {
+      loadVehicles();
+    } else {
+      setVehicles((current) => (
+        current.some((vehicle) => vehicle.id === event.data.id) ? current : [event.data, ...current]
+      ));
+    }
+  }), []);
+
   const requestPermissions = async () => {
     await ImagePicker.requestCameraPermissionsAsync();
     await ImagePicker.requestMediaLibraryPermissionsAsync();
@@ -56,9 +66,9 @@ export default function VehicleEntryScreen({ navigation }) {
     }
   };
 
-  const loadVehicles = async () => {
+  const loadVehicles = async (search) => {
     try {
-      const response = await vehicleApi.getAll();
+      const response = await vehicleApi.getAll(search ? { search } : undefined);
       setVehicles(response.data);
     } catch (error) {
       console.error('Error loading vehicles:', error);
@@ -92,7 +102,6 @@ export default function VehicleEntryScreen({ navigation }) {
       allowsEditing: true,
       aspect: [4, 3],
       quality: 0.7,
-      base64: true,
     });
 
     if (!result.canceled && result.assets[0]) {
@@ -110,7 +119,6 @@ export default function VehicleEntryScreen({ navigation }) {
       allowsEditing: true,
       aspect: [4, 3],
       quality: 0.7,
-      base64: true,
     });
 
     if (!result.canceled && result.assets[0]) {
@@ -183,6 +191,17 @@ export default function VehicleEntryScreen({ navigation }) {
     );
   };
 
+  const appendPhoto = async (submitData, field, photo) => {
+    const name = `${field}.jpg`;
+    const type = photo.mimeType || 'image/jpeg';
+    if (Platform.OS === 'web') {
+      const blob = await (await fetch(photo.uri)).blob();
+      submitData.append(field, blob, name);
+    } else {
+      submitData.append(field, { uri: photo.uri, name, type });
+    }
+  };
+
   const handleSubmit = async () => {
     if (!formData.vehicle_number || !formData.supplier_id || !formData.bill_no) {
       Alert.alert('Error', 'Please fill in all required fields');
@@ -200,12 +219,12 @@ export default function VehicleEntryScreen({ navigation }) {
       submitData.append('arrival_time', formData.arrival_time.toISOString());
       submitData.append('notes', formData.notes || '');
 
-      if (billPhoto && billPhoto.base64) {
-        submitData.append('supplier_bill_photo', `data:image/jpeg;base64,${billPhoto.base64}`);
+      if (billPhoto) {
+        await appendPhoto(submitData, 'supplier_bill_photo', billPhoto);
       }
 
-      if (vehiclePhoto && vehiclePhoto.base64) {
-        submitData.append('vehicle_photo', `data:image/jpeg;base64,${vehiclePhoto.base64}`);
+      if (vehiclePhoto) {
+        await appendPhoto(submitData, 'vehicle_photo', vehiclePhoto);
       }
 
       await vehicleApi.create(submitData);
@@ -249,6 +268,7 @@ export default function VehicleEntryScreen({ navigation }) {
         onAdd={openAddModal}
         onEdit={openEditModal}
         onDelete={handleDelete}
+        onSearch={loadVehicles}
       />
 
       <Modal